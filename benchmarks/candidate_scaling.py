@@ -0,0 +1,188 @@
+"""
+Measures how the candidate space of a node grows with the settings: for every combination of
+max_number_atom_tests, longest_atom_test_chain and the number of atom tests (the first k atom tests
+of the .s file), it reports the number of relation chains, aggregator chains and tests, and the time
+of their enumeration (generate_possible_attributes, generate_variable_configurations and
+generate_possible_aggregator_chains).
+
+Two nodes are enumerated:
+
+- root: the root of the tree,
+- child: the positive child of a node whose test is the first longest chain that the root generates,
+  i.e., the node in which the chain can be extended if it is at least longest_atom_test_chain long.
+
+If no data file is given, every constant counts as a single value (the tests are templates).
+Otherwise, the constant values are chosen as in the tree (see DecisionTree.get_constant_values).
+
+Example:
+
+    python benchmarks/candidate_scaling.py data.s --max_number_atom_tests 1 2 3 --output scaling.json
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from re3py.data.data_and_statistics import Dataset  # noqa: E402
+from re3py.learners.tree import DecisionTree  # noqa: E402
+
+
+def enumerate_candidates(tree: DecisionTree, current_var_names, parents_test,
+                         target_var_names, current_vars_per_type,
+                         count_constants):
+    """
+    Goes through all the candidates of a node, as build_helper does.
+
+    :return: (number of chains, number of aggregator chains, number of tests, time, the longest chain)
+    """
+    tree.reset_temp_var_count()
+    nb_chains = 0
+    nb_aggregator_chains = 0
+    nb_tests = 0
+    longest_chain = None
+    t0 = time.perf_counter()
+    for chain in tree.generate_possible_attributes(
+            copy.deepcopy(current_var_names), parents_test, target_var_names):
+        _, relation_chain, aggregator_chains, _ = chain
+        nb_chains += 1
+        nb_aggregators = sum(1 for _ in aggregator_chains)
+        nb_aggregator_chains += nb_aggregators
+        if count_constants:
+            nb_constant_values = tree.create_example_and_chains(
+                relation_chain, current_vars_per_type)[-1]
+        else:
+            nb_constant_values = 1
+        nb_tests += nb_aggregators * nb_constant_values
+        if longest_chain is None or len(relation_chain) > len(longest_chain):
+            longest_chain = relation_chain
+    t1 = time.perf_counter()
+    return nb_chains, nb_aggregator_chains, nb_tests, t1 - t0, longest_chain
+
+
+def parent_test_from_chain(tree: DecisionTree, relation_chain,
+                           current_var_names):
+    """
+    Converts a chain that was generated in the root into the test of the parent node and the variables
+    of its positive child: the temporary names of the fresh variables (and constants) are replaced
+    by the permanent ones, as in build_helper.
+    """
+    renamed = {}
+    parents_test = []
+    child_var_names = [dict(d) for d in current_var_names]
+    for relation_name, var_names_types in relation_chain:
+        relation = tree.descriptive_data[relation_name]
+        new_names = []
+        fresh = {}
+        for var_name, var_type in var_names_types:
+            if var_name[0] != "X":
+                if var_name not in renamed:
+                    renamed[var_name] = tree.generate_next_var_name(
+                        var_name[0])
+                    if var_type not in fresh:
+                        fresh[var_type] = set()
+                    fresh[var_type].add(renamed[var_name])
+                var_name = renamed[var_name]
+            new_names.append(var_name)
+        parents_test.append((relation, new_names, None))
+        child_var_names.append(fresh)
+    return parents_test, child_var_names
+
+
+def measure(data: Dataset, atom_tests, max_number_atom_tests,
+            longest_atom_test_chain, count_constants):
+    tree = DecisionTree(max_number_atom_tests=max_number_atom_tests,
+                        longest_atom_test_chain=longest_atom_test_chain,
+                        allowed_atom_tests=atom_tests,
+                        allowed_aggregators=data.settings.get_aggregates())
+    tree.descriptive_data = data.get_descriptive_data()
+    current_vars_per_type, target_var_names = tree.create_target_variables(
+        data.get_target_relation())
+    tree.prepare_constant_values([])
+    current_var_names = [{
+        t: {v.get_name()
+            for v in vs}
+        for t, vs in d.items()
+    } for d in current_vars_per_type]
+    results = {}
+    root = enumerate_candidates(tree, current_var_names, [], target_var_names,
+                                current_vars_per_type, count_constants)
+    results['root'] = root[:4]
+    if root[4] is not None:
+        parents_test, child_var_names = parent_test_from_chain(
+            tree, root[4], current_var_names)
+        results['child'] = enumerate_candidates(
+            tree, child_var_names, parents_test, target_var_names,
+            current_vars_per_type, count_constants)[:4]
+        results['child_parent_chain'] = len(parents_test)
+    return results
+
+
+def run(arguments):
+    data = Dataset(arguments.s_file, arguments.data_file)
+    all_atom_tests = data.settings.get_atom_tests_structured()
+    keys = sorted(all_atom_tests)
+    nb_atom_tests_options = arguments.nb_atom_tests
+    if nb_atom_tests_options is None:
+        nb_atom_tests_options = list(range(1, len(keys) + 1))
+    rows = []
+    for nb_atom_tests in nb_atom_tests_options:
+        atom_tests = {k: all_atom_tests[k] for k in keys[:nb_atom_tests]}
+        for max_number_atom_tests in arguments.max_number_atom_tests:
+            for longest_atom_test_chain in arguments.longest_atom_test_chain:
+                results = measure(data, atom_tests, max_number_atom_tests,
+                                  longest_atom_test_chain,
+                                  arguments.data_file is not None)
+                row = {
+                    'nb_atom_tests': min(nb_atom_tests, len(keys)),
+                    'max_number_atom_tests': max_number_atom_tests,
+                    'longest_atom_test_chain': longest_atom_test_chain
+                }
+                for node in ['root', 'child']:
+                    if node not in results:
+                        continue
+                    for name, value in zip([
+                            'chains', 'aggregator_chains', 'tests', 'time'
+                    ], results[node]):
+                        row['{}_{}'.format(node, name)] = value
+                rows.append(row)
+                print(", ".join("{}: {}".format(k, v) for k, v in row.items()))
+    return {
+        'settings': os.path.abspath(arguments.s_file),
+        'data': arguments.data_file,
+        'results': rows
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scaling of the candidate generation with the settings.")
+    parser.add_argument("s_file")
+    parser.add_argument("--data_file",
+                        default=None,
+                        help="descriptive data (for the constant values)")
+    parser.add_argument("--max_number_atom_tests",
+                        type=int,
+                        nargs="+",
+                        default=[1, 2, 3])
+    parser.add_argument("--longest_atom_test_chain",
+                        type=int,
+                        nargs="+",
+                        default=[4])
+    parser.add_argument("--nb_atom_tests",
+                        type=int,
+                        nargs="+",
+                        default=None,
+                        help="use the first k atom tests (default: 1, 2, ...)")
+    parser.add_argument("--output", default="candidate_scaling.json")
+    arguments = parser.parse_args()
+    results = run(arguments)
+    with open(arguments.output, "w") as f:
+        json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
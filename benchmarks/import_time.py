@@ -0,0 +1,116 @@
+"""
+Times the import of the re3py modules, each in a fresh interpreter (python -X importtime),
+and lists the heavy dependencies that the import loads. Predicting with a fitted model only needs
+the learners, so numpy, the Java bridge and the rankings should not be among them.
+
+Example:
+
+    python benchmarks/import_time.py --output imports.json
+    python benchmarks/import_time.py --output new.json --compare imports.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from run_benchmarks import compare  # noqa: E402
+
+MODULES = [
+    "re3py.data.data_and_statistics", "re3py.learners.tree",
+    "re3py.learners.random_forest", "re3py.learners.boosting",
+    "re3py.learners.model_format", "re3py.eval.evaluation",
+    "re3py.ranking.ensemble_ranking"
+]
+HEAVY_MODULES = [
+    "numpy", "py4j", "re3py.learners.core.communicate_with_java",
+    "re3py.ranking.ensemble_ranking", "re3py.eval.evaluation",
+    "multiprocessing", "concurrent.futures", "subprocess"
+]
+
+
+def import_once(module):
+    """
+    Imports the module in a new interpreter.
+
+    :return: (the cumulative import time of the module in seconds, the loaded heavy modules)
+    """
+    code = ("import sys, json, {}; "
+            "print(json.dumps([m for m in {} if m in sys.modules]))").format(
+                module, HEAVY_MODULES)
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                             cwd=ROOT,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE,
+                             check=True)
+    import_time = None
+    for line in process.stderr.decode().splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            import_time = int(fields[1]) / 10**6
+    loaded = json.loads(process.stdout.decode())
+    return import_time, [m for m in loaded if m != module]
+
+
+def run(arguments):
+    results = []
+    for module in arguments.modules:
+        times = []
+        loaded = []
+        for _ in range(arguments.repeat):
+            import_time, loaded = import_once(module)
+            times.append(import_time)
+        entry = {
+            'name': module,
+            'times': times,
+            'min': min(times),
+            'median': statistics.median(times),
+            'loaded': loaded
+        }
+        results.append(entry)
+        print("{: <35} min {:.4f}s median {:.4f}s loads {}".format(
+            module, entry['min'], entry['median'], ", ".join(loaded)
+            or "-"))
+    return {'meta': describe_run(arguments), 'results': results}
+
+
+def describe_run(arguments):
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'arguments': vars(arguments)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Times the imports of the re3py modules.")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="import_times.json")
+    parser.add_argument("--compare", default=None,
+                        help="results of a previous run")
+    arguments = parser.parse_args()
+    results = run(arguments)
+    with open(arguments.output, "w") as f:
+        json.dump(results, f, indent=1)
+    if arguments.compare is not None:
+        compare(results, arguments.compare)
+
+
+if __name__ == "__main__":
+    main()
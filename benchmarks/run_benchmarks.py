@@ -0,0 +1,202 @@
+"""
+Times the main steps of re3py on seeded synthetic data (see synthetic_data.py):
+data loading, Relation.get_all, fitting a tree, a forest and gradient boosting, and batch prediction.
+
+Example:
+
+    python benchmarks/run_benchmarks.py --size small --output results.json
+    python benchmarks/run_benchmarks.py --size small --output new.json --compare results.json
+
+The results are written as json, together with the commit, python version and the parameters,
+so that the runs from different commits can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from re3py.data.data_and_statistics import Dataset  # noqa: E402
+from re3py.learners.core.heuristic import HeuristicGini  # noqa: E402
+from re3py.learners.core.tree_node_split import TEST_VALUE_MEMO  # noqa: E402
+from re3py.learners.core.variables import VariableVariable  # noqa: E402
+from re3py.learners.tree import DecisionTree  # noqa: E402
+from re3py.learners.random_forest import RandomForest  # noqa: E402
+from re3py.learners.boosting import GradientBoosting  # noqa: E402
+from synthetic_data import SyntheticDatasetSpec, generate_dataset  # noqa: E402
+
+SIZES = {
+    "tiny": dict(nb_examples=60),
+    "small": dict(nb_examples=200),
+    "medium": dict(nb_examples=1000,
+                   nb_types=3,
+                   nb_link_relations=3,
+                   max_arity=3),
+    "large": dict(nb_examples=5000,
+                  nb_types=3,
+                  nb_link_relations=4,
+                  max_arity=3,
+                  degree_skew=1.5)
+}
+
+
+def time_it(function, repeat):
+    """
+    :return: (list of the times in seconds, the result of the last call)
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        TEST_VALUE_MEMO.clear()  # every repetition starts from scratch
+        t0 = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - t0)
+    return times, result
+
+
+def load_dataset(files):
+    return Dataset(*files)
+
+
+def get_all_everything(data: Dataset):
+    """
+    Calls get_all for every value of the first position of every link relation.
+    """
+    nb_calls = 0
+    for name, relation in sorted(data.get_descriptive_data().items()):
+        if not name.startswith("link"):
+            continue
+        variables = [
+            VariableVariable("X{}".format(i), t, None)
+            for i, t in enumerate(relation.get_types())
+        ]
+        for value in relation.get_all_values(0):
+            variables[0].set_value(value)
+            relation.get_all(variables, [0])
+            nb_calls += 1
+    return nb_calls
+
+
+def tree_parameters(data: Dataset, arguments):
+    return {
+        'heuristic': HeuristicGini(),
+        'max_number_atom_tests': arguments.max_number_atom_tests,
+        'allowed_atom_tests': data.settings.get_atom_tests_structured(),
+        'allowed_aggregators': data.settings.get_aggregates(),
+        'max_depth': arguments.max_depth
+    }
+
+
+def run(arguments):
+    spec = SyntheticDatasetSpec(random_seed=arguments.seed,
+                                **SIZES[arguments.size])
+    directory = tempfile.mkdtemp(prefix="re3py_benchmark_")
+    files = generate_dataset(directory, spec)
+    results = []
+
+    def record(name, function, repeat=arguments.repeat, **extra):
+        times, result = time_it(function, repeat)
+        entry = {
+            'name': name,
+            'times': times,
+            'min': min(times),
+            'median': statistics.median(times)
+        }
+        entry.update(extra)
+        results.append(entry)
+        print("{: <20} min {:.4f}s median {:.4f}s".format(
+            name, entry['min'], entry['median']))
+        return result
+
+    data = record("load", lambda: load_dataset(files))
+    nb_calls = get_all_everything(data)
+    record("get_all", lambda: get_all_everything(data), nb_calls=nb_calls)
+    parameters = tree_parameters(data, arguments)
+    tree = record("tree fit", lambda: fit(DecisionTree(**parameters), data))
+    forest = record(
+        "forest fit",
+        lambda: fit(RandomForest(arguments.nb_trees, **parameters), data))
+    boosting_parameters = dict(parameters)
+    boosting_parameters.pop('heuristic')
+    boosting = record(
+        "boosting fit",
+        lambda: fit(
+            GradientBoosting(arguments.nb_trees, **boosting_parameters), data))
+    target_data = data.get_target_data()
+    for name, model in [("tree", tree), ("forest", forest),
+                        ("boosting", boosting)]:
+        record("{} predict".format(name),
+               lambda: [model.predict(d) for d in target_data],
+               nb_examples=len(target_data))
+    return {
+        'meta': describe_run(arguments, spec),
+        'results': results
+    }
+
+
+def fit(model, data):
+    model.fit(data)
+    return model
+
+
+def describe_run(arguments, spec: SyntheticDatasetSpec):
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'arguments': vars(arguments),
+        'dataset': spec.to_dict()
+    }
+
+
+def compare(new, old_file):
+    """
+    Prints the ratios of the median times: new / old.
+    """
+    with open(old_file) as f:
+        old = json.load(f)
+    old_results = {r['name']: r for r in old['results']}
+    print("Compared to {} (commit {}):".format(old_file,
+                                              old['meta']['commit']))
+    for r in new['results']:
+        if r['name'] in old_results:
+            ratio = r['median'] / max(old_results[r['name']]['median'], 1e-12)
+            print("{: <20} {:.2f}x".format(r['name'], ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks re3py on synthetic relational data.")
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--nb_trees", type=int, default=5)
+    parser.add_argument("--max_depth", type=int, default=4)
+    parser.add_argument("--max_number_atom_tests", type=int, default=2)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None,
+                        help="results of a previous run")
+    arguments = parser.parse_args()
+    results = run(arguments)
+    with open(arguments.output, "w") as f:
+        json.dump(results, f, indent=1)
+    if arguments.compare is not None:
+        compare(results, arguments.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Seeded generator of synthetic relational datasets, written in the re3py format (.s, descriptive and target files).
+
+The objects have types Type0, Type1, ..., where the examples are the objects of Type0. Every type has
+a numeric and a nominal attribute, and the objects are connected by link relations of arity 2 or more.
+The first position of a link relation holds the 'subject', whose number of links (degree) is drawn around
+mean_degree, and the other positions are chosen from a Zipf-like distribution, so that degree_skew = 0 gives
+uniform degrees and larger values give a few hubs.
+
+The hidden target is a function of the example's own attribute and the mean attribute of its neighbours
+in the first link relation, discretized into classes (or kept numeric for regression), with target_noise
+controlling the proportion of random labels (or the standard deviation of added noise).
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+
+
+class SyntheticDatasetSpec:
+    def __init__(self,
+                 name="synthetic",
+                 nb_examples=200,
+                 nb_objects=None,
+                 nb_types=2,
+                 nb_link_relations=2,
+                 max_arity=2,
+                 mean_degree=3.0,
+                 degree_skew=1.0,
+                 nb_nominal_values=4,
+                 nb_classes=2,
+                 target_noise=0.1,
+                 random_seed=1234):
+        """
+        :param name: name of the dataset (and the prefix of the files)
+        :param nb_examples: number of objects of type Type0 (the examples)
+        :param nb_objects: number of objects of each of the other types (default: nb_examples)
+        :param nb_types: number of object types
+        :param nb_link_relations: number of relations that connect the objects
+        :param max_arity: maximal arity of the link relations (at least 2)
+        :param mean_degree: mean number of links of a subject
+        :param degree_skew: exponent of the Zipf-like distribution of the non-subject positions
+        :param nb_nominal_values: number of different values of the nominal attributes
+        :param nb_classes: number of classes, 0 for regression
+        :param target_noise: proportion of random labels (classification) or the standard deviation
+          of gaussian noise (regression)
+        :param random_seed: the seed; the same spec always gives the same files
+        """
+        self.name = name
+        self.nb_examples = nb_examples
+        self.nb_objects = nb_examples if nb_objects is None else nb_objects
+        self.nb_types = nb_types
+        self.nb_link_relations = nb_link_relations
+        self.max_arity = max(2, max_arity)
+        self.mean_degree = mean_degree
+        self.degree_skew = degree_skew
+        self.nb_nominal_values = nb_nominal_values
+        self.nb_classes = nb_classes
+        self.target_noise = target_noise
+        self.random_seed = random_seed
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    def nb_objects_of(self, type_index):
+        return self.nb_examples if type_index == 0 else self.nb_objects
+
+
+def object_name(type_index, i):
+    return "t{}o{}".format(type_index, i)
+
+
+def type_name(type_index):
+    return "Type{}".format(type_index)
+
+
+def zipf_cumulative_weights(n, skew):
+    weights = [(i + 1)**-skew for i in range(n)]
+    return list(itertools.accumulate(weights))
+
+
+def draw_degree(mean_degree, r: random.Random):
+    """
+    Geometric number of links with the given mean (at least 0).
+    """
+    p = 1.0 / (1.0 + mean_degree)
+    degree = 0
+    while r.random() > p:
+        degree += 1
+    return degree
+
+
+def generate_relations(spec: SyntheticDatasetSpec, r: random.Random):
+    """
+    :return: (relations, facts), where relations is a list of (name, types) and facts is a dictionary
+      {relation name: list of tuples}
+    """
+    relations = []
+    facts = {}
+    for t in range(spec.nb_types):
+        for kind, value_type in [("value", "numeric"), ("color", "nominal")]:
+            name = "{}{}".format(kind, t)
+            relations.append((name, [type_name(t), value_type]))
+            tuples = []
+            for i in range(spec.nb_objects_of(t)):
+                if kind == "value":
+                    value = round(r.gauss(0.0, 1.0), 4)
+                else:
+                    value = "v{}".format(r.randrange(spec.nb_nominal_values))
+                tuples.append((object_name(t, i), value))
+            facts[name] = tuples
+    cumulative_weights = {
+        t: zipf_cumulative_weights(spec.nb_objects_of(t), spec.degree_skew)
+        for t in range(spec.nb_types)
+    }
+    for k in range(spec.nb_link_relations):
+        arity = 2 if k == 0 else r.randint(2, spec.max_arity)
+        types = [0] + [r.randrange(spec.nb_types) for _ in range(arity - 1)]
+        name = "link{}".format(k)
+        relations.append((name, [type_name(t) for t in types]))
+        tuples = set()
+        for i in range(spec.nb_objects_of(types[0])):
+            for _ in range(draw_degree(spec.mean_degree, r)):
+                others = []
+                for t in types[1:]:
+                    weights = cumulative_weights[t]
+                    j = bisect.bisect(weights, r.random() * weights[-1])
+                    others.append(object_name(t, min(j, len(weights) - 1)))
+                tuples.add(tuple([object_name(types[0], i)] + others))
+        facts[name] = sorted(tuples)
+    return relations, facts
+
+
+def generate_targets(spec: SyntheticDatasetSpec, facts, r: random.Random):
+    values = {}  # the object names of different types differ
+    for t in range(spec.nb_types):
+        values.update(facts["value{}".format(t)])
+    neighbour_values = {}
+    for subject, neighbour in facts["link0"]:
+        neighbour_values.setdefault(subject, []).append(values[neighbour])
+    scores = []
+    for i in range(spec.nb_examples):
+        o = object_name(0, i)
+        neighbours = neighbour_values.get(o, [])
+        mean = sum(neighbours) / len(neighbours) if neighbours else -1.0
+        scores.append(values[o] + 2.0 * mean)
+    if spec.nb_classes == 0:
+        return [
+            round(s + r.gauss(0.0, spec.target_noise), 4) for s in scores
+        ]
+    sorted_scores = sorted(scores)
+    thresholds = [
+        sorted_scores[len(scores) * c // spec.nb_classes]
+        for c in range(1, spec.nb_classes)
+    ]
+    labels = []
+    for s in scores:
+        if r.random() < spec.target_noise:
+            c = r.randrange(spec.nb_classes)
+        else:
+            c = bisect.bisect(thresholds, s)
+        labels.append("c{}".format(c))
+    return labels
+
+
+def generate_dataset(directory, spec: SyntheticDatasetSpec):
+    """
+    Writes <name>.s, <name>_descriptive.txt and <name>_target.txt into the directory.
+
+    :return: (settings file, descriptive file, target file)
+    """
+    r = random.Random(spec.random_seed)
+    relations, facts = generate_relations(spec, r)
+    targets = generate_targets(spec, facts, r)
+    os.makedirs(directory, exist_ok=True)
+    files = [
+        os.path.join(directory, spec.name + extension)
+        for extension in [".s", "_descriptive.txt", "_target.txt"]
+    ]
+    target_type = "numeric" if spec.nb_classes == 0 else "nominal"
+    with open(files[0], "w") as f:
+        print("[Relations]", file=f)
+        print("label({}, {})".format(type_name(0), target_type), file=f)
+        for name, types in relations:
+            print("{}({})".format(name, ", ".join(types)), file=f)
+        print("[Aggregates]", file=f)
+        for aggregate in [
+                "count", "countUnique", "max", "mean", "min", "mode", "sum"
+        ]:
+            print(aggregate, file=f)
+        print("[AtomTests]", file=f)
+        for name, types in relations:
+            if name.startswith("color"):
+                print("{}(old, c)".format(name), file=f)
+            new_positions = ", ".join(["new"] * (len(types) - 1))
+            print("{}(old, {})".format(name, new_positions), file=f)
+    with open(files[1], "w") as f:
+        for name, _ in relations:
+            for t in facts[name]:
+                print("{}({})".format(name, ", ".join(str(x) for x in t)),
+                      file=f)
+    with open(files[2], "w") as f:
+        for i, target in enumerate(targets):
+            print("label({}, {})".format(object_name(0, i), target), file=f)
+    return tuple(files)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generates a synthetic relational dataset.")
+    parser.add_argument("directory")
+    for key, value in SyntheticDatasetSpec().to_dict().items():
+        if key == "name":
+            value_type = str
+        elif isinstance(value, float):
+            value_type = float
+        else:
+            value_type = int
+        parser.add_argument("--" + key, type=value_type, default=value)
+    arguments = vars(parser.parse_args())
+    directory = arguments.pop("directory")
+    for f in generate_dataset(directory, SyntheticDatasetSpec(**arguments)):
+        print(f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+from typing import Dict, List, Union
+from collections import Counter
+import heapq
+import json
+import os
+from ..utilities.lazy_import import LazyModule
+
+np = LazyModule("numpy")
+
+
+class RelationStatistics:
+    """
+    Statistics of a single relation:
+
+    - number of tuples,
+    - number of different values and the most frequent values, for each position,
+    - degree histograms of the indices, where the degree of a key is the number of tuples that match it,
+    - min, max and quantiles, for each numeric position.
+    """
+    quantile_levels = [i / 10 for i in range(11)]
+    nb_frequent_values = 100
+
+    def __init__(self, name: str, types: List[str], nb_tuples: int,
+                 distinct_counts: List[int],
+                 frequent_values: List[List[list]],
+                 degree_histograms: Dict[str, List[List[int]]],
+                 numeric_summaries: List[Union[None, Dict[str, object]]]):
+        """
+        :param name: relation name
+        :param types: relation types
+        :param nb_tuples: number of tuples
+        :param distinct_counts: [number of different values on position 0, ...]
+        :param frequent_values: for each position, [[value, count], ...], sorted decreasingly by count
+        (ties are resolved by values)
+        :param degree_histograms: {subset code: [[degree, number of keys], ...], ...}, where the subset code,
+        e.g., '101', tells which positions are known
+        :param numeric_summaries: for each position, None or {'min': ..., 'max': ..., 'quantiles': [...]}
+        """
+        self.name = name
+        self.types = types
+        self.nb_tuples = nb_tuples
+        self.distinct_counts = distinct_counts
+        self.frequent_values = frequent_values
+        self.degree_histograms = degree_histograms
+        self.numeric_summaries = numeric_summaries
+        self.degree_statistics = {}
+
+    def __repr__(self):
+        return "RelationStatistics({}, {} tuples, distinct: {})".format(
+            self.name, self.nb_tuples, self.distinct_counts)
+
+    @staticmethod
+    def compute(relation,
+                values_per_type: Union[None, Dict[str, set]] = None):
+        """
+        Computes the statistics in a single pass over the tuples (and the keys of the indices).
+
+        :param relation: a Relation
+        :param values_per_type: if given, the values of the relation are added to the domains of their types
+        :return: RelationStatistics
+        """
+        types = relation.get_types()
+        counters = [Counter() for _ in types]
+        for t in relation.all_tuples:
+            for counter, value in zip(counters, t):
+                counter[value] += 1
+        if values_per_type is not None:
+            for t, counter in zip(types, counters):
+                if t not in values_per_type:
+                    values_per_type[t] = set()
+                values_per_type[t].update(counter)
+        frequent_values = [
+            [[v, c] for v, c in heapq.nsmallest(
+                RelationStatistics.nb_frequent_values,
+                counter.items(),
+                key=lambda vc: (-vc[1], vc[0]))] for counter in counters
+        ]
+        degree_histograms = relation.get_degree_histograms()
+        numeric_summaries = []
+        for t, counter in zip(types, counters):
+            summary = None
+            if relation.is_numeric_type(t) and counter:
+                try:
+                    values = np.repeat(np.array(list(counter), dtype=float),
+                                       list(counter.values()))
+                    summary = {
+                        'min': float(values.min()),
+                        'max': float(values.max()),
+                        'quantiles': np.quantile(
+                            values, RelationStatistics.quantile_levels).tolist()
+                    }
+                except (ValueError, TypeError):
+                    pass  # some values are not numbers
+            numeric_summaries.append(summary)
+        return RelationStatistics(relation.get_name(), list(types),
+                                  relation.get_nb_tuples(),
+                                  [len(c) for c in counters], frequent_values,
+                                  degree_histograms, numeric_summaries)
+
+    def get_nb_tuples(self):
+        return self.nb_tuples
+
+    def get_nb_distinct(self, position):
+        return self.distinct_counts[position]
+
+    def get_frequent_values(self, position):
+        """
+        :return: [[value, count], ...] for at most nb_frequent_values most frequent values
+        """
+        return self.frequent_values[position]
+
+    def get_numeric_summary(self, position):
+        return self.numeric_summaries[position]
+
+    def get_degree_histogram(self, known_positions: List[int]):
+        code = ["0"] * len(self.types)
+        for i in known_positions:
+            code[i] = "1"
+        return self.degree_histograms.get("".join(code))
+
+    def get_degree_statistics(self, known_positions: List[int]):
+        """
+        :param known_positions: list of indices of the positions with known values, e.g., [0, 2]
+        :return: a 3-tuple (number of different keys, mean degree, size-biased mean degree). The size-biased
+          mean (sum of squared degrees / sum of degrees) is the expected degree of the key of a random tuple,
+          i.e., it accounts for the hub values that are reached through joins.
+        """
+        key = tuple(sorted(known_positions))
+        if key not in self.degree_statistics:
+            self.degree_statistics[key] = self._compute_degree_statistics(
+                key)
+        return self.degree_statistics[key]
+
+    def _compute_degree_statistics(self, known_positions):
+        n = self.nb_tuples
+        histogram = self.get_degree_histogram(known_positions)
+        if n == 0:
+            return 0, 0.0, 0.0
+        elif not known_positions:
+            return 1, float(n), float(n)
+        elif len(known_positions) == len(self.types):
+            return n, 1.0, 1.0
+        elif histogram is not None:
+            nb_keys = sum(nb for _, nb in histogram)
+            size_biased = sum(d * d * nb for d, nb in histogram) / n
+            return nb_keys, n / nb_keys, size_biased
+        else:
+            # no index: assume independent positions
+            nb_keys = 1
+            for i in known_positions:
+                nb_keys *= self.distinct_counts[i]
+            nb_keys = min(n, nb_keys)
+            return nb_keys, n / nb_keys, n / nb_keys
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'types': self.types,
+            'nb_tuples': self.nb_tuples,
+            'distinct_counts': self.distinct_counts,
+            'frequent_values': self.frequent_values,
+            'degree_histograms': self.degree_histograms,
+            'numeric_summaries': self.numeric_summaries
+        }
+
+    @staticmethod
+    def from_dict(d):
+        return RelationStatistics(d['name'], d['types'], d['nb_tuples'],
+                                  d['distinct_counts'], d['frequent_values'],
+                                  d['degree_histograms'],
+                                  d['numeric_summaries'])
+
+
+class StatisticsCatalog:
+    """
+    Statistics of all the descriptive relations of a dataset, together with the domains of the types
+    (the sorted lists of the values that appear in the relations).
+    Computed once when the data is loaded and persisted next to the data file.
+    """
+    file_extension = ".catalog.json"
+
+    def __init__(self, relation_statistics: Dict[str, RelationStatistics],
+                 domains: Dict[str, list],
+                 source: Union[None, Dict[str, object]] = None):
+        self.relation_statistics = relation_statistics
+        self.domains = domains
+        self.source = source  # describes the data file the catalog was computed from
+
+    def __repr__(self):
+        return "StatisticsCatalog({})".format(
+            list(self.relation_statistics.values()))
+
+    @staticmethod
+    def compute(relations, source=None):
+        """
+        Computes the statistics of the relations and attaches them to the relations.
+
+        :param relations: an iterable of Relation objects
+        :param source: see StatisticsCatalog.describe_source
+        :return: StatisticsCatalog
+        """
+        values_per_type = {}
+        relation_statistics = {}
+        for r in relations:
+            stats = RelationStatistics.compute(r, values_per_type)
+            r.set_statistics(stats)
+            relation_statistics[r.get_name()] = stats
+        domains = {t: sorted(vs) for t, vs in values_per_type.items()}
+        return StatisticsCatalog(relation_statistics, domains, source)
+
+    def get_relation_statistics(self, relation_name) -> RelationStatistics:
+        return self.relation_statistics[relation_name]
+
+    def get_types(self):
+        return sorted(self.domains)
+
+    def get_domain(self, value_type):
+        return self.domains.get(value_type, [])
+
+    def get_domain_size(self, value_type):
+        return len(self.get_domain(value_type))
+
+    def attach(self, relations):
+        """
+        Sets the statistics of the relations to the ones from the catalog.
+        """
+        for r in relations:
+            r.set_statistics(self.relation_statistics[r.get_name()])
+
+    def matches(self, relations, source=None):
+        """
+        Checks whether the catalog describes the given relations (and the given data file).
+        The numbers of tuples of the relations that are not loaded yet (see LazyRelation) are
+        not compared, since this would load them.
+        """
+        if source is not None and source != self.source:
+            return False
+        names = {r.get_name() for r in relations}
+        if names != set(self.relation_statistics):
+            return False
+        for r in relations:
+            stats = self.relation_statistics[r.get_name()]
+            if stats.types != list(r.get_types()):
+                return False
+            if r.is_loaded() and stats.get_nb_tuples() != r.get_nb_tuples():
+                return False
+        return True
+
+    @staticmethod
+    def describe_source(data_file):
+        info = os.stat(data_file)
+        return {
+            'file': os.path.abspath(data_file),
+            'size': info.st_size,
+            'modified': info.st_mtime
+        }
+
+    @staticmethod
+    def get_catalog_file(data_file):
+        return data_file + StatisticsCatalog.file_extension
+
+    def save(self, file_name):
+        catalog = {
+            'source': self.source,
+            'relations': [s.to_dict() for s in self.relation_statistics.values()],
+            'domains': self.domains
+        }
+        with open(file_name, "w") as f:
+            json.dump(catalog, f)
+
+    @staticmethod
+    def load(file_name):
+        with open(file_name) as f:
+            catalog = json.load(f)
+        relation_statistics = {}
+        for d in catalog['relations']:
+            relation_statistics[d['name']] = RelationStatistics.from_dict(d)
+        return StatisticsCatalog(relation_statistics, catalog['domains'],
+                                 catalog['source'])
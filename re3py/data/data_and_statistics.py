@@ -1,11 +1,18 @@
-from typing import Dict
+from typing import Dict, Iterable, Union
 from .relation import *
 from .task_settings import Settings
+from .catalog import StatisticsCatalog
+from .sqlite_relation import SQLiteRelation
+from ..learners.core.tree_node_split import forget_test_values
 import random
 from ..utilities.my_utils import arg_max
 import copy
-import numpy as np
+from ..utilities.lazy_import import LazyModule
 import os
+import logging
+
+np = LazyModule("numpy")
+logger = logging.getLogger(__name__)
 
 
 class Datum:
@@ -36,6 +43,9 @@ class Datum:
 
 
 class Dataset:
+    relation_shard_extension = ".txt"
+    relation_database_extensions = (".sqlite", ".db")
+
     def __init__(self,
                  s_file=None,
                  data_file=None,
@@ -45,7 +55,20 @@ class Dataset:
                  target_data=None,
                  statistics=None,
                  nb_target_instances=float('inf'),
-                 target_type=None):
+                 target_type=None,
+                 catalog=None,
+                 target_sample_size=None,
+                 stratified_sample=False,
+                 sample_random_seed=25061991,
+                 persist_catalog=False):
+        """
+        :param target_sample_size: if not None, only a sample of this size is read from the target
+            file (see TargetStream.reservoir_sample), so that the file is never held in memory
+        :param stratified_sample: whether the sample is stratified (see TargetStream.stratified_sample)
+        :param sample_random_seed: the seed for sampling the target examples
+        :param persist_catalog: whether the catalog that is computed for the data file is saved
+            next to it (see load_or_compute_catalog), so that the next load can reuse it
+        """
         self.settings = settings
         self.descriptive_relations = descriptive_relations  # type: Dict[str, Relation]
         self.target_data = [] if target_data is None else target_data  # type: List['Datum']
@@ -55,6 +78,8 @@ class Dataset:
             data_file) if data_file is not None else None
         self.target_file = os.path.abspath(
             target_file) if target_file is not None else None
+        self.catalog = catalog  # type: Union[StatisticsCatalog, None]
+        self.persist_catalog = persist_catalog
 
         # settings i.e., meta data
         if s_file is not None:
@@ -71,14 +96,28 @@ class Dataset:
             if target_type is not None:
                 assert self.target_type == target_type
         # data
-        all_relations_empty = not any(
-            r.all_tuples for r in self.descriptive_relations.values())
+        all_relations_empty = all(
+            r.is_empty() for r in self.descriptive_relations.values())
         if data_file is not None and all_relations_empty:
-            self.read_relations_from_file(data_file)
+            if os.path.isdir(data_file):
+                self.use_relation_shards(data_file)
+            elif data_file.endswith(Dataset.relation_database_extensions):
+                self.use_relation_database(data_file)
+            else:
+                self.read_relations_from_file(data_file)
+                self.load_or_compute_catalog()
         if target_file is not None and all_relations_empty:
             self.target_data = []
-            self.read_target_from_file(target_file,
-                                       self.get_target_relation().get_name())
+            if target_sample_size is None:
+                self.read_target_from_file(
+                    target_file,
+                    self.get_target_relation().get_name())
+            elif stratified_sample:
+                self.add_examples(self.get_target_stream().stratified_sample(
+                    target_sample_size, sample_random_seed))
+            else:
+                self.add_examples(self.get_target_stream().reservoir_sample(
+                    target_sample_size, sample_random_seed))
         # statistics
 
         if len(self.target_data) > 0:
@@ -103,6 +142,42 @@ class Dataset:
     def get_target_relation(self):
         return self.settings.get_relations()[0]
 
+    def get_catalog(self) -> StatisticsCatalog:
+        """
+        Statistics of the descriptive relations, see StatisticsCatalog. If the dataset was not
+        loaded from a file and no catalog was given, the catalog is computed on the first call.
+        """
+        if self.catalog is None:
+            self.catalog = StatisticsCatalog.compute(
+                self.descriptive_relations.values())
+        return self.catalog
+
+    def load_or_compute_catalog(self):
+        """
+        Loads the catalog from the file next to the data file if it is up to date,
+        otherwise computes it (and saves it if self.persist_catalog).
+        """
+        relations = list(self.descriptive_relations.values())
+        source = StatisticsCatalog.describe_source(self.data_file)
+        catalog_file = StatisticsCatalog.get_catalog_file(self.data_file)
+        if os.path.exists(catalog_file):
+            try:
+                catalog = StatisticsCatalog.load(catalog_file)
+                if catalog.matches(relations, source):
+                    catalog.attach(relations)
+                    self.catalog = catalog
+                    return
+            except (ValueError, KeyError, OSError) as e:
+                logger.warning("Could not load catalog %s: %s", catalog_file,
+                               e)
+        self.catalog = StatisticsCatalog.compute(relations, source)
+        if self.persist_catalog:
+            try:
+                self.catalog.save(catalog_file)
+            except OSError as e:
+                logger.warning("Could not save catalog %s: %s", catalog_file,
+                               e)
+
     def get_copy_statistics(self):
         return self.statistics.get_copy()
 
@@ -128,29 +203,160 @@ class Dataset:
                     r = self.descriptive_relations[r_name]
                     r.try_add_tuple(line)
 
-    def read_target_from_file(self, file, target_relation_name):
-        added = 0
-        with open(file) as f:
-            for line_raw in f:
-                i = line_raw.find('//')
-                if i >= 0:
-                    line = line_raw[:i]
-                else:
-                    line = line_raw.strip()
-                if line:
+    def add_facts(self, facts: Iterable[str]):
+        """
+        Adds the facts to the descriptive relations. The indices and the statistics of the changed
+        relations are updated, and the memoized test values that use them are forgotten.
+
+        :param facts: e.g., ['friend(ana, bob)', 'age(ana, 25)']
+        :return: {relation name: the number of the added facts that were not known}
+        """
+        return self.change_facts(facts, True)
+
+    def remove_facts(self, facts: Iterable[str]):
+        """
+        Removes the facts from the descriptive relations (the unknown facts are ignored).
+        See add_facts.
+
+        :param facts: e.g., ['friend(ana, bob)']
+        :return: {relation name: the number of the removed facts}
+        """
+        return self.change_facts(facts, False)
+
+    def change_facts(self, facts: Iterable[str], add: bool):
+        tuples_per_relation = {}
+        for fact in facts:
+            try:
+                r_name = parse_relation_name(fact)
+                arguments = parse_relation_arguments(fact, r_name)
+            except AttributeError:
+                raise ValueError("Cannot parse the fact {}".format(fact))
+            if r_name not in self.descriptive_relations:
+                raise ValueError("Unknown relation {} in the fact {}".format(
+                    r_name, fact))
+            relation = self.descriptive_relations[r_name]
+            if len(arguments) != relation.arity:
+                raise ValueError("The relation {} has arity {}: {}".format(
+                    r_name, relation.arity, fact))
+            if r_name not in tuples_per_relation:
+                tuples_per_relation[r_name] = []
+            tuples_per_relation[r_name].append(relation.parse_tuple(fact))
+        counts = {}
+        for r_name, tuples in tuples_per_relation.items():
+            relation = self.descriptive_relations[r_name]
+            if add:
+                changed = relation.add_tuples(tuples)
+            else:
+                changed = relation.remove_tuples(tuples)
+            counts[r_name] = len(changed)
+        changed_relations = {name for name, n in counts.items() if n > 0}
+        if changed_relations:
+            # the domains of the types may have changed
+            self.catalog = None
+            forget_test_values(changed_relations)
+        return counts
+
+    def use_relation_shards(self, directory):
+        """
+        Replaces the descriptive relations by the lazy ones (see LazyRelation) that read their tuples
+        from the files of the directory (see write_relation_shards) when they are first used.
+        The catalog is not computed in advance, since this would read all the relations.
+        """
+        self.descriptive_relations = {
+            name: LazyRelation(name,
+                               Dataset.get_relation_shard_file(directory, name),
+                               r.get_types())
+            for name, r in self.descriptive_relations.items()
+        }
+
+    def use_relation_database(self, database_file):
+        """
+        Replaces the descriptive relations by the ones that keep their tuples in the tables of the
+        SQLite database (see SQLiteRelation and write_relation_database), so that they need not fit
+        into memory. As for the shards, the catalog is not computed in advance.
+        """
+        self.descriptive_relations = {
+            name: SQLiteRelation(name, database_file, r.get_types())
+            for name, r in self.descriptive_relations.items()
+        }
+
+    @staticmethod
+    def get_relation_shard_file(directory, relation_name):
+        return os.path.join(directory,
+                            relation_name + Dataset.relation_shard_extension)
+
+    @staticmethod
+    def write_relation_shards(data_file, directory):
+        """
+        Splits the descriptive data into one file per relation, so that a Dataset
+        whose data_file is the directory reads only the relations that are used.
+        The data file is read line by line.
+
+        :param data_file: the file with the facts of all the relations
+        :param directory: the directory of the relation files (created if needed)
+        :return: {relation name: number of facts}
+        """
+        os.makedirs(directory, exist_ok=True)
+        shards = {}
+        counts = {}
+        try:
+            with open(data_file) as f:
+                for line_raw in f:
+                    i = line_raw.find('//')
+                    if i >= 0:
+                        line = line_raw[:i]
+                    else:
+                        line = line_raw.strip()
+                    if not line:
+                        continue
                     r_name = parse_relation_name(line)
-                    assert r_name == target_relation_name
-                    target_type = self.descriptive_relations[
-                        target_relation_name].types[-1]
-                    example_target = parse_relation_arguments(line, r_name)
-                    example, target = example_target[:-1], example_target[-1]
-                    self.add_example(
-                        Datum(tuple(example),
-                              Relation.intelligent_parse(target_type, target),
-                              1, added))
-                    added += 1
-                    if added == self.number_target_instances:
-                        break
+                    if r_name not in shards:
+                        shards[r_name] = open(
+                            Dataset.get_relation_shard_file(
+                                directory, r_name), "w")
+                        counts[r_name] = 0
+                    shards[r_name].write(line.strip() + "\n")
+                    counts[r_name] += 1
+        finally:
+            for shard in shards.values():
+                shard.close()
+        return counts
+
+    def read_target_from_file(self, file, target_relation_name):
+        target_type = self.descriptive_relations[target_relation_name].types[
+            -1]
+        stream = TargetStream(file, target_relation_name, target_type,
+                              self.number_target_instances)
+        for datum in stream:
+            self.add_example(datum)
+
+    def get_target_stream(self, target_file=None):
+        """
+        Streams the target examples from the file, without reading them into memory.
+        :param target_file: the file with the target examples, if None, the target file of the dataset
+        :return: TargetStream
+        """
+        if target_file is None:
+            target_file = self.target_file
+        if target_file is None:
+            raise ValueError("The dataset has no target file.")
+        target_relation = self.get_target_relation()
+        return TargetStream(target_file, target_relation.get_name(),
+                            target_relation.types[-1],
+                            self.number_target_instances)
+
+    def with_target_data(self, target_data: List['Datum']):
+        """
+        A dataset with the same settings and descriptive data, but with the given target examples,
+        e.g., a sample of a TargetStream. The statistics are computed from the new examples.
+        """
+        return Dataset(settings=self.settings,
+                       data_file=self.data_file,
+                       descriptive_relations=self.descriptive_relations,
+                       target_data=target_data,
+                       statistics=None if self.statistics is None else
+                       self.get_copy_statistics(),
+                       catalog=self.catalog)
 
     def bootstrap_replicate(self, random_seed=25061991, per_class=False):
         r = random.Random(random_seed)
@@ -186,7 +392,8 @@ class Dataset:
                        data_file=self.data_file,
                        descriptive_relations=self.descriptive_relations,
                        target_data=new_target_data,
-                       statistics=self.get_copy_statistics())
+                       statistics=self.get_copy_statistics(),
+                       catalog=self.catalog)
 
     @staticmethod
     def _bootstrap_replicate_one_class(indices, random_generator):
@@ -211,6 +418,163 @@ class Dataset:
         self.set_statistics(s.compute_stats(self.get_target_data()))
 
 
+class TargetStream:
+    """
+    The target examples of a file, read line by line when iterated, so that the file is never
+    held in memory. The identifier of an example is its position among the examples of the file,
+    as in Dataset.read_target_from_file.
+
+    Large files can be sampled while reading (reservoir_sample, stratified_sample), and predicted or
+    evaluated in chunks (chunks).
+    """
+    def __init__(self,
+                 target_file,
+                 target_relation_name,
+                 target_type,
+                 nb_target_instances=float('inf')):
+        self.target_file = os.path.abspath(target_file)
+        self.target_relation_name = target_relation_name
+        self.target_type = target_type
+        self.number_target_instances = nb_target_instances
+
+    def __iter__(self):
+        added = 0
+        with open(self.target_file) as f:
+            for line_raw in f:
+                i = line_raw.find('//')
+                if i >= 0:
+                    line = line_raw[:i]
+                else:
+                    line = line_raw.strip()
+                if line:
+                    r_name = parse_relation_name(line)
+                    assert r_name == self.target_relation_name
+                    example_target = parse_relation_arguments(line, r_name)
+                    example, target = example_target[:-1], example_target[-1]
+                    yield Datum(
+                        tuple(example),
+                        Relation.intelligent_parse(self.target_type, target),
+                        1, added)
+                    added += 1
+                    if added == self.number_target_instances:
+                        break
+
+    def chunks(self, chunk_size):
+        """
+        :param chunk_size: the number of examples in a chunk (the last one may be smaller)
+        :return: generator of lists of examples
+        """
+        if chunk_size < 1:
+            raise ValueError(
+                "chunk_size must be positive, but is {}".format(chunk_size))
+        chunk = []
+        for datum in self:
+            chunk.append(datum)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def reservoir_sample(self, sample_size, random_seed=25061991):
+        """
+        Uniform sample without replacement, chosen in a single pass (reservoir sampling),
+        so that only the sample is held in memory.
+        :param sample_size: the number of the examples in the sample
+        :param random_seed: the seed of the random generator
+        :return: list of examples, in the order of the file
+        """
+        if sample_size < 0:
+            raise ValueError("sample_size must be non-negative, "
+                             "but is {}".format(sample_size))
+        r = random.Random(random_seed)
+        return TargetStream._reservoir_sample(iter(self), sample_size, r)
+
+    def stratified_sample(self,
+                          sample_size,
+                          random_seed=25061991,
+                          per_class=False):
+        """
+        Sample without replacement, chosen per class, so that the class distribution of the sample
+        is the one of the file. Applicable to the nominal targets only.
+
+        :param sample_size: the number of the examples in the sample. If per_class, the number of the
+            examples of every class, or a dictionary {class: number of the examples}.
+        :param random_seed: the seed of the random generator
+        :param per_class: if False, the examples of the file are first counted (one pass that does not
+            keep the examples), and the sample size is split among the classes proportionally to their
+            frequencies. In both cases, the examples are then chosen in a single pass.
+        :return: list of examples, in the order of the file
+        """
+        if not Relation.is_nominal_type(self.target_type):
+            raise ValueError(
+                "Stratified sampling needs a nominal target, but the target "
+                "type is {}".format(self.target_type))
+        if per_class:
+            if isinstance(sample_size, dict):
+                sizes = sample_size
+            else:
+                sizes = None
+        else:
+            counts = {}
+            for datum in self:
+                t = datum.get_target()
+                counts[t] = counts.get(t, 0) + 1
+            sizes = TargetStream._proportional_sizes(counts, sample_size)
+        reservoirs = {}
+        seen = {}
+        r = random.Random(random_seed)
+        for datum in self:
+            t = datum.get_target()
+            size = sample_size if sizes is None else sizes.get(t, 0)
+            if t not in reservoirs:
+                reservoirs[t] = []
+                seen[t] = 0
+            seen[t] += 1
+            TargetStream._add_to_reservoir(reservoirs[t], datum, seen[t], size,
+                                           r)
+        sample = [d for reservoir in reservoirs.values() for d in reservoir]
+        sample.sort(key=lambda d: d.identifier)
+        return sample
+
+    @staticmethod
+    def _proportional_sizes(counts, sample_size):
+        """
+        Splits the sample size among the classes proportionally to their counts
+        (largest remainder method, ties broken by the class names).
+        """
+        n = sum(counts.values())
+        if n <= sample_size:
+            return dict(counts)
+        exact = {c: sample_size * counts[c] / n for c in counts}
+        sizes = {c: int(exact[c]) for c in counts}
+        remaining = sample_size - sum(sizes.values())
+        by_remainder = sorted(counts,
+                              key=lambda c: (sizes[c] - exact[c], str(c)))
+        for c in by_remainder[:remaining]:
+            sizes[c] += 1
+        return sizes
+
+    @staticmethod
+    def _add_to_reservoir(reservoir, datum, nb_seen, sample_size,
+                          random_generator):
+        if len(reservoir) < sample_size:
+            reservoir.append(datum)
+        else:
+            j = int(nb_seen * random_generator.random())
+            if j < sample_size:
+                reservoir[j] = datum
+
+    @staticmethod
+    def _reservoir_sample(data, sample_size, random_generator):
+        reservoir = []
+        for i, datum in enumerate(data):
+            TargetStream._add_to_reservoir(reservoir, datum, i + 1, sample_size,
+                                           random_generator)
+        reservoir.sort(key=lambda d: d.identifier)
+        return reservoir
+
+
 def compute_all_values_of_types(relations):
     # From descriptive data only
     values_per_type = {}
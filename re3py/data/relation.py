@@ -1,9 +1,17 @@
-from typing import Set, Tuple, List, Union
+from typing import Set, Tuple, List, Union, Dict, Iterable
+from collections import Counter
+import heapq
+import os
 import re
 from ..utilities.my_utils import *
 from ..learners.core.variables import Variable
 from ..utilities.my_exceptions import WrongValueException
-import numpy as np
+from .catalog import RelationStatistics
+from ..utilities.lazy_import import LazyModule
+import logging
+
+np = LazyModule("numpy")
+logger = logging.getLogger(__name__)
 
 
 class Relation:
@@ -17,6 +25,8 @@ class Relation:
     # constant_type = "constant"
     tuple_pattern = "{{}}\\(([{} ,]+)\\)".format(allowed_chars)
     time_efficient_search_bound = 3
+    # whether prefetch does anything, i.e., whether the lookups are cheaper in batches
+    supports_prefetch = False
 
     def __init__(self, name: str, related_objects: Union[Set[Tuple[str]],
                                                          None],
@@ -24,9 +34,11 @@ class Relation:
         self.name = name
         self.all_tuples = set()
         self.types = types
-        self.different_values = [-1] * len(self.types)
         self.arity = len(self.types)
         self.all_tuples_by_subsets = {}
+        self.statistics = None  # type: Union[RelationStatistics, None]
+        self.all_values = {}  # position: sorted values
+        self.sorted_columns = {}  # position: sorted values, with repetitions
         self.init_all_tuples_by_subsets()
         self.file = file
         p1 = related_objects is None
@@ -40,7 +52,9 @@ class Relation:
                         self.try_add_tuple(line)
         else:
             self.all_tuples = related_objects
-            # TODO: This does not update tuples by subsets?
+            if self.should_use_tuples_by_subsets():
+                for t in related_objects:
+                    self.try_add_one_to_tuples_by_subsets(t)
 
     def __repr__(self):
         set_part = []
@@ -76,17 +90,67 @@ class Relation:
 
         :param line: a string of form <relation name>(obj1, obj2, ...)
         """
+        self.add_parsed_tuple(self.parse_tuple(line))
+
+    def parse_tuple(self, line: str):
+        """
+        Converts 'r(x,y)' to (x, y), where the values are parsed according to the types.
+        """
         related_list = parse_relation_arguments(line, self.name)
-        relation_tuple = tuple(
+        return tuple(
             Relation.intelligent_parse(v_type, v_value)
             for v_type, v_value in zip(self.types, related_list))
-        self.add_parsed_tuple(relation_tuple)
 
     def add_parsed_tuple(self, t):
+        """
+        Adds a tuple while the data is loaded: a repeated tuple is indexed again
+        (add_tuples skips the known tuples).
+        """
         self.all_tuples.add(t)
+        self.reset_statistics()
         if self.should_use_tuples_by_subsets():
             self.try_add_one_to_tuples_by_subsets(t)
 
+    def add_tuples(self, tuples: Iterable[Tuple]) -> List[Tuple]:
+        """
+        Adds the tuples that are not in the relation yet and updates the indices.
+        The statistics are recomputed when they are needed next.
+
+        :param tuples: parsed tuples (see parse_tuple), e.g., [('a', 'b'), ('a', 'c')]
+        :return: the list of the added tuples
+        """
+        added = []
+        for t in tuples:
+            t = tuple(t)
+            if t not in self.all_tuples:
+                self.all_tuples.add(t)
+                if self.should_use_tuples_by_subsets():
+                    self.try_add_one_to_tuples_by_subsets(t)
+                added.append(t)
+        if added:
+            self.reset_statistics()
+        return added
+
+    def remove_tuples(self, tuples: Iterable[Tuple]) -> List[Tuple]:
+        """
+        Removes the tuples that are in the relation and updates the indices.
+        The statistics are recomputed when they are needed next.
+
+        :param tuples: parsed tuples (see parse_tuple)
+        :return: the list of the removed tuples
+        """
+        removed = []
+        for t in tuples:
+            t = tuple(t)
+            if t in self.all_tuples:
+                self.all_tuples.remove(t)
+                removed.append(t)
+        if removed:
+            if self.should_use_tuples_by_subsets():
+                self.remove_from_tuples_by_subsets(removed)
+            self.reset_statistics()
+        return removed
+
     def try_add_one_to_tuples_by_subsets_old(self, relation_tuple):
         pattern = "{{:0>{}b}}".format(self.arity)
         subset_codes = [pattern.format(i) for i in range(1, 2**self.arity - 1)]
@@ -126,6 +190,31 @@ class Relation:
             # subset_dict[key_part].add(value_part)
             subset_dict[key_part].append(value_part)
 
+    def remove_from_tuples_by_subsets(self, relation_tuples: List[Tuple]):
+        """
+        Removes the tuples from the indices. The tuples are grouped by their keys, and the list of
+        every affected key is rebuilt once, so that removing many tuples with the same key does not
+        scan its list once per tuple.
+        """
+        removed = set(relation_tuples)
+        pattern = "{{:0>{}b}}".format(self.arity)
+        for i in range(1, 2**self.arity - 1):
+            subset_code = pattern.format(i)
+            subset_dict = self.all_tuples_by_subsets[subset_code]
+            keys = {
+                tuple(c for c, code in zip(relation_tuple, subset_code)
+                      if code == "1")
+                for relation_tuple in removed
+            }
+            for key_part in keys:
+                related = [
+                    t for t in subset_dict[key_part] if t not in removed
+                ]
+                if related:
+                    subset_dict[key_part] = related
+                else:
+                    del subset_dict[key_part]
+
     def get_all_old(self, variables: List[Variable],
                     known_values: List[int]) -> List[Tuple[Variable]]:
         """
@@ -208,14 +297,125 @@ class Relation:
                 else:
                     return []
 
+    def prefetch(self, known_values: List[int], keys):
+        """
+        Announces the lookups get_all(variables, known_values) for the given values of the known
+        positions, so that a relation with an external storage can answer them in batches.
+        The in-memory relations do nothing.
+
+        :param known_values: list of the indices of the known positions, e.g., [0, 2]
+        :param keys: iterable of tuples of the values on the known positions
+        """
+        pass
+
+    def get_degree_histograms(self):
+        """
+        :return: {subset code: [[degree, number of keys], ...]} for the indices of the tuples by subsets
+        """
+        degree_histograms = {}
+        if self.should_use_tuples_by_subsets():
+            for subset_code, index in self.all_tuples_by_subsets.items():
+                histogram = Counter(len(related) for related in index.values())
+                degree_histograms[subset_code] = [
+                    [d, n] for d, n in sorted(histogram.items())
+                ]
+        return degree_histograms
+
     def get_all_values(self, position):
-        return sorted({t[position] for t in self.all_tuples})
+        if position not in self.all_values:
+            self.all_values[position] = sorted(
+                {t[position]
+                 for t in self.all_tuples})
+        return self.all_values[position]
 
     def get_nb_all_values(self, position):
-        if self.different_values[position] < 0:
-            self.different_values[position] = len(
-                self.get_all_values(position))
-        return self.different_values[position]
+        return self.get_statistics().get_nb_distinct(position)
+
+    def get_most_frequent_values(self, position, k):
+        """
+        :return: sorted list of (at most) k most frequent values on the given position
+        (ties are resolved by values)
+        """
+        frequent = self.get_statistics().get_frequent_values(position)
+        if k <= len(frequent):
+            return sorted(v for v, _ in frequent[:k])
+        counts = self.count_values(position)
+        return select_most_frequent(counts, k)
+
+    def get_quantile_values(self, position, k):
+        """
+        :return: sorted list of the different values among the k evenly spaced quantiles
+        of the values on the given position
+        """
+        if position not in self.sorted_columns:
+            self.sorted_columns[position] = sorted(t[position]
+                                                   for t in self.all_tuples)
+        column = self.sorted_columns[position]
+        n = len(column)
+        if n == 0 or k < 1:
+            return []
+        elif k == 1:
+            return [column[(n - 1) // 2]]
+        chosen = {column[round(i * (n - 1) / (k - 1))] for i in range(k)}
+        return sorted(chosen)
+
+    def count_values(self, position, related_values=None):
+        """
+        Counts the values on the given position.
+
+        :param position: index of the position
+        :param related_values: None or {type: set of values}. If given, only the tuples that contain at least
+        one of the values (on some other position of the same type) are taken into account.
+        :return: Counter of the values
+        """
+        if related_values is None:
+            return Counter(t[position] for t in self.all_tuples)
+        related_tuples = set()
+        for i, t in enumerate(self.types):
+            if i == position or t not in related_values:
+                continue
+            values = related_values[t]
+            if self.should_use_tuples_by_subsets() and self.arity > 1:
+                code = ["0"] * self.arity
+                code[i] = "1"
+                index = self.all_tuples_by_subsets["".join(code)]
+                for v in values:
+                    related_tuples.update(index.get((v, ), []))
+            else:
+                related_tuples.update(r for r in self.all_tuples
+                                      if r[i] in values)
+        return Counter(r[position] for r in related_tuples)
+
+    def get_nb_tuples(self):
+        return len(self.all_tuples)
+
+    def is_empty(self):
+        return not self.all_tuples
+
+    def is_loaded(self):
+        """
+        :return: whether the tuples are available without reading them first (see LazyRelation)
+        """
+        return True
+
+    def get_statistics(self) -> RelationStatistics:
+        if self.statistics is None:
+            self.statistics = RelationStatistics.compute(self)
+        return self.statistics
+
+    def set_statistics(self, statistics: RelationStatistics):
+        self.statistics = statistics
+
+    def reset_statistics(self):
+        self.statistics = None
+        self.all_values = {}
+        self.sorted_columns = {}
+
+    def get_degree_statistics(self, known_positions: List[int]):
+        """
+        See RelationStatistics.get_degree_statistics.
+        """
+        return self.get_statistics().get_degree_statistics(known_positions)
 
     def get_name(self):
         return self.name
@@ -288,21 +488,92 @@ class Relation:
                     message.format(t, Relation.relation_type_constant))
 
 
+class LazyRelation(Relation):
+    """
+    A relation whose tuples are stored in its own file (see Dataset.write_relation_shards), and are
+    read and indexed only when they are first needed (e.g., on the first get_all). Thus, the relations
+    that a model does not use are never loaded.
+    """
+    def __init__(self, name: str, file: str, types):
+        self.loaded = True  # nothing to load while the empty relation is initialized
+        super().__init__(name, set(), None, types)
+        self.file = file
+        self.loaded = False
+
+    @property
+    def all_tuples(self):
+        if not self.loaded:
+            self.load()
+        return self._all_tuples
+
+    @all_tuples.setter
+    def all_tuples(self, tuples):
+        self._all_tuples = tuples
+
+    @property
+    def all_tuples_by_subsets(self):
+        if not self.loaded:
+            self.load()
+        return self._all_tuples_by_subsets
+
+    @all_tuples_by_subsets.setter
+    def all_tuples_by_subsets(self, index):
+        self._all_tuples_by_subsets = index
+
+    def load(self):
+        """
+        Reads the tuples from the file (a missing file means an empty relation).
+        """
+        self.loaded = True
+        if not os.path.exists(self.file):
+            logger.debug("No file %s for the relation %s", self.file,
+                         self.name)
+            return
+        logger.debug("Loading the relation %s from %s", self.name, self.file)
+        with open(self.file) as f:
+            for line_raw in f:
+                i = line_raw.find('//')
+                if i >= 0:
+                    line = line_raw[:i]
+                else:
+                    line = line_raw.strip()
+                if line:
+                    self.try_add_tuple(line)
+
+    def is_loaded(self):
+        return self.loaded
+
+    def is_empty(self):
+        if self.loaded:
+            return super().is_empty()
+        return not os.path.exists(self.file) or os.path.getsize(self.file) == 0
+
+
+def select_most_frequent(counts: Dict[object, int], k):
+    """
+    :return: sorted list of (at most) k most frequent keys, ties are resolved by keys
+    """
+    if k >= len(counts):
+        return sorted(counts)
+    chosen = heapq.nsmallest(k, counts.items(), key=lambda vc: (-vc[1], vc[0]))
+    return sorted(v for v, _ in chosen)
+
+
 def parse_relation_arguments(line: str, relation_name: str):
     assert line.startswith(relation_name)
     tuple_pattern = Relation.tuple_pattern.format(relation_name)
     try:
         related_str = re.search(tuple_pattern, line).group(1).strip()
     except AttributeError:
-        print("Relation {}: tuple {} does not match pattern {}".format(
-            relation_name, line, tuple_pattern))
+        logger.error("Relation %s: tuple %s does not match pattern %s",
+                     relation_name, line, tuple_pattern)
         raise
     related_list = intelligent_split(related_str)
     object_name = "^[{}]+$".format(Relation.allowed_chars)
     for o in related_list:
         if re.match(object_name, o) is None:
             if o == "":
-                print("Empty string detected in {}".format(line))
+                logger.warning("Empty string detected in %s", line)
             else:
                 raise WrongValueException(
                     "{} in {} contains forbidden characters or is empty.".
@@ -339,7 +610,7 @@ def parse_relation_name(line):
     try:
         return re.match(name_pattern, line).group(1)
     except AttributeError:
-        print(f"Pattern {name_pattern} did not match {line}")
+        logger.error("Pattern %s did not match %s", name_pattern, line)
         raise
 
 
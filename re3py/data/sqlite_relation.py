@@ -0,0 +1,362 @@
+from typing import Dict, Iterable, List, Tuple, Union
+from collections import Counter, OrderedDict
+import sqlite3
+from .relation import Relation, parse_relation_name
+from ..learners.core.variables import Variable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteTuples:
+    """
+    A read-only view of the tuples of a SQLiteRelation that behaves as the set Relation.all_tuples
+    (iteration, len, in), without holding the tuples in memory.
+    """
+    def __init__(self, relation: 'SQLiteRelation'):
+        self.relation = relation
+
+    def __iter__(self):
+        yield from self.relation.execute("SELECT * FROM {} ORDER BY rowid".format(
+            self.relation.table))
+
+    def __len__(self):
+        return self.relation.execute("SELECT COUNT(*) FROM {}".format(
+            self.relation.table)).fetchone()[0]
+
+    def __bool__(self):
+        return self.relation.execute("SELECT 1 FROM {} LIMIT 1".format(
+            self.relation.table)).fetchone() is not None
+
+    def __contains__(self, t):
+        if len(t) != self.relation.arity:
+            return False
+        query = "SELECT 1 FROM {} WHERE {} LIMIT 1".format(
+            self.relation.table,
+            self.relation.where_equal(range(self.relation.arity)))
+        return self.relation.execute(query, tuple(t)).fetchone() is not None
+
+
+class SQLiteRelation(Relation):
+    """
+    A relation whose tuples are stored in a table of a SQLite database, so that the relations
+    do not have to fit into memory. The table has a column c<i> for every position i.
+
+    The lookups of get_all use the indices on the known positions (created on the first lookup
+    with the given positions) and are cached in a LRU cache of cache_size keys. Many lookups can be
+    answered by a few IN (...) queries (see prefetch), which is what DecisionTree does for the
+    examples of a node.
+    """
+    supports_prefetch = True
+    # the number of parameters of a query is below SQLite's limit
+    max_query_parameters = 999
+
+    def __init__(self,
+                 name: str,
+                 database_file: str,
+                 types,
+                 cache_size=100000):
+        self.database_file = database_file
+        self.table = SQLiteRelation.quote(name)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (known positions, key): tuples
+        self.indexed_positions = set()
+        self.connection = None  # type: Union[sqlite3.Connection, None]
+        self.nb_tuples = None  # cached COUNT(*), see get_nb_tuples
+        self.arity = len(types)
+        self.execute("CREATE TABLE IF NOT EXISTS {} ({})".format(
+            self.table, ", ".join("c{}".format(i) for i in range(self.arity))))
+        self.execute("CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ({})".format(
+            SQLiteRelation.quote("{}_all".format(name)), self.table,
+            ", ".join("c{}".format(i) for i in range(self.arity))))
+        super().__init__(name, set(), None, types)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['connection'] = None
+        state['cache'] = OrderedDict()
+        return state
+
+    @property
+    def all_tuples(self):
+        return SQLiteTuples(self)
+
+    @all_tuples.setter
+    def all_tuples(self, tuples):
+        if tuples:
+            self.add_parsed_tuples(tuples)
+
+    @staticmethod
+    def quote(name):
+        return '"{}"'.format(name.replace('"', '""'))
+
+    def execute(self, query, parameters=()):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.database_file)
+        return self.connection.execute(query, parameters)
+
+    @staticmethod
+    def where_equal(positions):
+        return " AND ".join("c{} = ?".format(i) for i in positions)
+
+    def add_parsed_tuple(self, t):
+        self.add_parsed_tuples([t])
+
+    def add_parsed_tuples(self, tuples: Iterable[Tuple]):
+        """
+        Inserts the tuples (the duplicates are ignored) in a single transaction.
+        """
+        self.execute("SELECT 1")  # connects
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO {} VALUES ({})".format(
+                    self.table, ", ".join(["?"] * self.arity)),
+                (tuple(t) for t in tuples))
+        self.cache.clear()
+        self.reset_statistics()
+
+    def add_tuples(self, tuples: Iterable[Tuple]) -> List[Tuple]:
+        """
+        See Relation.add_tuples. Only the cached lookups that contain the added tuples are
+        invalidated.
+        """
+        query = "INSERT OR IGNORE INTO {} VALUES ({})".format(
+            self.table, ", ".join(["?"] * self.arity))
+        return self.change_tuples(query, tuples)
+
+    def remove_tuples(self, tuples: Iterable[Tuple]) -> List[Tuple]:
+        """
+        See Relation.remove_tuples. Only the cached lookups that contain the removed tuples are
+        invalidated.
+        """
+        query = "DELETE FROM {} WHERE {}".format(
+            self.table, SQLiteRelation.where_equal(range(self.arity)))
+        return self.change_tuples(query, tuples)
+
+    def change_tuples(self, query, tuples: Iterable[Tuple]):
+        """
+        Executes the insertion or deletion query for every tuple in a single transaction.
+        :return: the list of the tuples that were inserted or deleted
+        """
+        changed = []
+        self.execute("SELECT 1")  # connects
+        with self.connection:
+            for t in tuples:
+                t = tuple(t)
+                if self.connection.execute(query, t).rowcount > 0:
+                    changed.append(t)
+        if changed:
+            self.forget_cached(changed)
+            self.reset_statistics()
+        return changed
+
+    def forget_cached(self, tuples: List[Tuple]):
+        """
+        Removes the cached results of get_all that contain any of the tuples, i.e., the ones whose
+        key is the projection of a tuple to the known positions.
+        """
+        known_positions = {known_values for known_values, _ in self.cache}
+        for t in tuples:
+            for known_values in known_positions:
+                key = tuple(t[i] for i in known_values)
+                self.cache.pop((known_values, key), None)
+
+    def ensure_index(self, known_values: Tuple[int]):
+        if known_values in self.indexed_positions:
+            return
+        if 0 < len(known_values) < self.arity:
+            code = "".join("1" if i in known_values else "0"
+                           for i in range(self.arity))
+            self.execute("CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                SQLiteRelation.quote("{}_{}".format(self.name, code)),
+                self.table, ", ".join("c{}".format(i) for i in known_values)))
+        self.indexed_positions.add(known_values)
+
+    def get_all(self, variables: List[Variable],
+                known_values: List[int]) -> List[Tuple]:
+        """
+        See Relation.get_all.
+        """
+        if not known_values:
+            return list(self.all_tuples)
+        known_values = tuple(known_values)
+        key = tuple(variables[i].get_value() for i in known_values)
+        cache_key = (known_values, key)
+        if cache_key in self.cache:
+            self.cache.move_to_end(cache_key)
+            return self.cache[cache_key]
+        self.ensure_index(known_values)
+        query = "SELECT * FROM {} WHERE {} ORDER BY rowid".format(
+            self.table, SQLiteRelation.where_equal(known_values))
+        related = self.execute(query, key).fetchall()
+        self.add_to_cache(cache_key, related)
+        return related
+
+    def add_to_cache(self, cache_key, related):
+        self.cache[cache_key] = related
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def prefetch(self, known_values: List[int], keys):
+        """
+        Looks up the keys that are not cached with IN (...) queries, and caches the results.
+        See Relation.prefetch.
+        """
+        known_values = tuple(known_values)
+        if not known_values:
+            return
+        missing = [
+            key for key in set(keys) if (known_values, key) not in self.cache
+        ]
+        # more than cache_size keys would evict each other
+        missing = missing[:self.cache_size]
+        if not missing:
+            return
+        self.ensure_index(known_values)
+        keys_per_query = max(1, self.max_query_parameters // len(known_values))
+        columns = ", ".join("c{}".format(i) for i in known_values)
+        for start in range(0, len(missing), keys_per_query):
+            chunk = missing[start:start + keys_per_query]
+            if len(known_values) == 1:
+                condition = "{} IN ({})".format(columns,
+                                                ", ".join(["?"] * len(chunk)))
+                parameters = [key[0] for key in chunk]
+            else:
+                row = "({})".format(", ".join(["?"] * len(known_values)))
+                condition = "({}) IN (VALUES {})".format(
+                    columns, ", ".join([row] * len(chunk)))
+                parameters = [value for key in chunk for value in key]
+            related = {key: [] for key in chunk}
+            query = "SELECT * FROM {} WHERE {} ORDER BY rowid".format(
+                self.table, condition)
+            for t in self.execute(query, parameters):
+                key = tuple(t[i] for i in known_values)
+                if key in related:
+                    related[key].append(t)
+            for key in chunk:
+                self.add_to_cache((known_values, key), related[key])
+
+    def get_nb_tuples(self):
+        if self.nb_tuples is None:
+            self.nb_tuples = len(self.all_tuples)
+        return self.nb_tuples
+
+    def reset_statistics(self):
+        super().reset_statistics()
+        self.nb_tuples = None
+
+    def is_empty(self):
+        return not self.all_tuples
+
+    def get_all_values(self, position):
+        if position not in self.all_values:
+            self.all_values[position] = sorted(
+                v for v, in self.execute("SELECT DISTINCT c{} FROM {}".format(
+                    position, self.table)))
+        return self.all_values[position]
+
+    def get_quantile_values(self, position, k):
+        """
+        See Relation.get_quantile_values.
+        """
+        n = self.get_nb_tuples()
+        if n == 0 or k < 1:
+            return []
+        elif k == 1:
+            indices = [(n - 1) // 2]
+        else:
+            indices = {round(i * (n - 1) / (k - 1)) for i in range(k)}
+        # the values are read from the index instead of sorting the table for every quantile
+        self.ensure_index((position, ))
+        query = "SELECT c{0} FROM {1} ORDER BY c{0} LIMIT 1 OFFSET ?".format(
+            position, self.table)
+        return sorted({self.execute(query, (i, )).fetchone()[0]
+                       for i in indices})
+
+    def count_values(self, position, related_values=None):
+        """
+        See Relation.count_values.
+        """
+        if related_values is None:
+            query = "SELECT c{0}, COUNT(*) FROM {1} GROUP BY c{0}".format(
+                position, self.table)
+            return Counter(dict(self.execute(query).fetchall()))
+        related_tuples = set()
+        for i, t in enumerate(self.types):
+            if i == position or t not in related_values:
+                continue
+            values = list(related_values[t])
+            self.ensure_index((i, ))
+            for start in range(0, len(values), self.max_query_parameters):
+                chunk = values[start:start + self.max_query_parameters]
+                query = "SELECT * FROM {} WHERE c{} IN ({})".format(
+                    self.table, i, ", ".join(["?"] * len(chunk)))
+                related_tuples.update(self.execute(query, chunk))
+        return Counter(r[position] for r in related_tuples)
+
+    def get_degree_histograms(self):
+        """
+        See Relation.get_degree_histograms: computed by the database for the same subsets as
+        in the in-memory relations.
+        """
+        degree_histograms = {}
+        if not self.should_use_tuples_by_subsets():
+            return degree_histograms
+        pattern = "{{:0>{}b}}".format(self.arity)
+        for i in range(1, 2**self.arity - 1):
+            subset_code = pattern.format(i)
+            columns = ", ".join("c{}".format(j)
+                                for j, c in enumerate(subset_code) if c == "1")
+            query = ("SELECT degree, COUNT(*) FROM (SELECT COUNT(*) AS degree "
+                     "FROM {} GROUP BY {}) GROUP BY degree ORDER BY degree")
+            degree_histograms[subset_code] = [
+                list(row)
+                for row in self.execute(query.format(self.table, columns))
+            ]
+        return degree_histograms
+
+    def init_all_tuples_by_subsets(self):
+        pass  # the database has the indices
+
+    def try_add_one_to_tuples_by_subsets(self, relation_tuple):
+        pass
+
+
+def write_relation_database(data_file, database_file,
+                            relations: Dict[str, Relation],
+                            batch_size=100000):
+    """
+    Copies the facts of the data file to the tables of the database. The file is read line by line,
+    and the facts are inserted in batches.
+
+    :param data_file: the file with the facts
+    :param database_file: the SQLite database (created if needed)
+    :param relations: {relation name: relation}, e.g., the descriptive relations of the settings,
+        which give the types of the relations
+    :param batch_size: the number of facts that are inserted at once
+    :return: {relation name: SQLiteRelation}
+    """
+    database_relations = {
+        name: SQLiteRelation(name, database_file, r.get_types())
+        for name, r in relations.items()
+    }
+    batches = {name: [] for name in relations}
+    with open(data_file) as f:
+        for line_raw in f:
+            i = line_raw.find('//')
+            if i >= 0:
+                line = line_raw[:i]
+            else:
+                line = line_raw.strip()
+            if not line:
+                continue
+            r_name = parse_relation_name(line)
+            relation = database_relations[r_name]
+            batches[r_name].append(relation.parse_tuple(line))
+            if len(batches[r_name]) == batch_size:
+                relation.add_parsed_tuples(batches[r_name])
+                batches[r_name] = []
+    for name, batch in batches.items():
+        if batch:
+            database_relations[name].add_parsed_tuples(batch)
+    return database_relations
@@ -4,6 +4,9 @@ from ..learners.core.aggregators import ALL_AGGREGATORS
 from typing import List
 from ..utilities.my_utils import try_convert_to_number
 from ..utilities.my_exceptions import *
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Settings:
     sec_relations = "Relations"
@@ -109,9 +112,9 @@ class Settings:
                 if new_relation not in self.relations:
                     self.relations.append(new_relation)
                 else:
-                    print(
-                        "Warning: relation {} was listed more than once. Ignoring duplicates."
-                        .format(new_relation))
+                    logger.warning(
+                        "Relation %s was listed more than once. Ignoring duplicates.",
+                        new_relation)
         elif sec_name == Settings.sec_aggregates:
             for line in data:
                 if line not in Settings.allowed_aggregators:
@@ -121,9 +124,9 @@ class Settings:
                 if line not in self.aggregates:
                     self.aggregates.append(line)
                 else:
-                    print(
-                        "Warning: aggregate {} was listed more than once. Ignoring duplicates."
-                        .format(line))
+                    logger.warning(
+                        "Aggregate %s was listed more than once. Ignoring duplicates.",
+                        line)
         elif sec_name == Settings.sec_atom_tests:
             for line in data:
                 relation_name = line[:line.find("(")]
@@ -139,9 +142,9 @@ class Settings:
                 if new_test not in self.atom_tests:
                     self.atom_tests.append(new_test)
                 else:
-                    print(
-                        "Warning: test {} was listed more than once. Ignoring duplicates."
-                        .format(new_test))
+                    logger.warning(
+                        "Test %s was listed more than once. Ignoring duplicates.",
+                        new_test)
         elif sec_name == Settings.sec_tree_params:
             for line in data:
                 key_value = re.match("([A-Za-z]+) *= *(.+)", line)
@@ -156,9 +159,9 @@ class Settings:
                     raise WrongValueException(
                         message.format(key, list(self.tree_parameters.keys())))
                 if self.tree_parameters[key] is not None:
-                    print(
-                        "Warning! Tha value for {} is already defined. Will be overridden."
-                        .format(key))
+                    logger.warning(
+                        "The value for %s is already defined. Will be overridden.",
+                        key)
                 self.tree_parameters[key] = value
             for k, v in self.tree_parameters.items():
                 if v is None:
@@ -197,7 +200,7 @@ class Settings:
                         message.format(i + 1, len(target_types), help_string,
                                        Relation.relation_type_constant, t))
         if len(self.atom_tests) == 0:
-            print(
+            logger.warning(
                 "No atom tests specified, all possible options will be considered."
             )
         # atom test should contain known relation name, and has the same number
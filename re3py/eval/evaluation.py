@@ -18,6 +18,14 @@ class Evaluator:
         for t, p, w in zip(true_values, predictions, weights):
             self.add_one(t, p, w)
 
+    def add_examples(self, data, predictions):
+        """
+        Adds the true values and the weights of the examples (Datum objects), e.g.,
+        a chunk of a TargetStream, together with their predictions.
+        """
+        self.add_many([d.get_target() for d in data], predictions,
+                      [d.get_weight() for d in data])
+
 
 class RegressionEvaluator(Evaluator):
     def __init__(self):
@@ -1,9 +1,20 @@
 from re3py.learners.tree import DecisionTree, create_constant_tree
-from re3py.learners.predictive_model import TreeEnsemble
+from re3py.learners.predictive_model import TreeEnsemble, dumps_sharing_relations, loads_sharing_relations
 from re3py.learners.core.heuristic import *
 from math import exp, log
-from re3py.ranking.ensemble_ranking import EnsembleRanking
+from typing import List, Union
+from re3py.utilities.progress import ProgressEvent, ProgressCallback
+import logging
+import time
 from re3py.data.data_and_statistics import get_all_target_values
+from re3py.utilities.lazy_import import LazyModule
+
+np = LazyModule("numpy")
+# only needed for fitting in parallel and for the rankings
+multiprocessing = LazyModule("multiprocessing")
+futures = LazyModule("concurrent.futures")
+ensemble_ranking = LazyModule("re3py.ranking.ensemble_ranking")
+logger = logging.getLogger(__name__)
 
 
 class GradientBoostingTask:
@@ -17,6 +28,21 @@ class GradientBoostingTask:
     def minus_partial_derivative(true_values, predictions):
         raise NotImplementedError("This should be implemented by a subclass.")
 
+    @staticmethod
+    def loss(true_values, predictions, weights=None):
+        """
+        The loss whose minus partial derivative is minus_partial_derivative, i.e., the squared error,
+        averaged over the examples (and summed over the classes).
+        :param true_values: numpy array of shape (N, ) or (N, K)
+        :param predictions: numpy array of the same shape
+        :param weights: None or numpy array of shape (N, )
+        :return: float
+        """
+        errors = (np.asarray(true_values) - np.asarray(predictions))**2
+        if errors.ndim > 1:
+            errors = errors.sum(axis=1)
+        return float(np.average(errors, weights=weights))
+
     @staticmethod
     def modify_tree(shrinkage, step, optimize_step, tree: DecisionTree):
         """
@@ -63,7 +89,7 @@ class GradientBoostingRegression(GradientBoostingTask):
 
     @staticmethod
     def minus_partial_derivative(true_values, predictions):
-        return [t - p for t, p in zip(true_values, predictions)]
+        return np.asarray(true_values) - np.asarray(predictions)
 
     @staticmethod
     def is_regression():
@@ -99,13 +125,19 @@ class GradientBoostingBinaryClassification(GradientBoostingTask):
 
     @staticmethod
     def minus_partial_derivative_friedman(true_values, predictions):
-        ans = []
-        for t, p in zip(true_values, predictions):
-            try:
-                ans.append(2 * t / (1 + exp(2 * t * p)))
-            except OverflowError:
-                ans.append(t * 10**-10)  # t * float('inf')) TODO: ?
-        return ans
+        t = np.asarray(true_values, dtype=float)
+        with np.errstate(over='ignore'):
+            exponents = np.exp(2 * t * np.asarray(predictions))
+        return np.where(np.isinf(exponents), t * 10**-10,
+                        2 * t / (1 + exponents))  # t * float('inf')) TODO: ?
+
+    @staticmethod
+    def loss_friedman(true_values, predictions, weights=None):
+        """
+        Binomial deviance log(1 + exp(-2 y F)), where the targets y are +-1.
+        """
+        margins = -2 * np.asarray(true_values) * np.asarray(predictions)
+        return float(np.average(np.logaddexp(0.0, margins), weights=weights))
 
     @staticmethod
     def minus_partial_derivative(true_values, predictions):
@@ -137,28 +169,48 @@ class GradientBoostingMulticlassClassification(GradientBoostingTask):
     def create_default_model(data: Dataset):
         return GradientBoostingRegression.create_default_model(data)
 
+    @staticmethod
+    def softmax(predictions):
+        """
+        :param predictions: numpy array of shape (N, K)
+        :return: class probabilities, numpy array of shape (N, K)
+        """
+        predictions_exp = np.exp(predictions -
+                                 predictions.max(axis=1, keepdims=True))
+        return predictions_exp / predictions_exp.sum(axis=1, keepdims=True)
+
     @staticmethod
     def minus_partial_derivative_friedman(true_values, predictions):
-        examples = len(predictions[0])
-        classes = len(predictions)
-        predictions_exp = [[exp(p) for p in ps]
-                           for ps in predictions]  # TODO: numpy? :)
-        normalizers = [
-            sum(predictions_exp[k][i] for k in range(classes))
-            for i in range(examples)
-        ]
-        prob = [[
-            predictions_exp[k][i] / normalizers[i] for i in range(examples)
-        ] for k in range(classes)]
-        return [[true_values[k][i] - prob[k][i] for i in range(examples)]
-                for k in range(classes)]
+        """
+        :param true_values: one-hot encoded targets, numpy array of shape (N, K)
+        :param predictions: numpy array of shape (N, K)
+        :return: numpy array of shape (N, K)
+        """
+        prob = GradientBoostingMulticlassClassification.softmax(
+            np.asarray(predictions, dtype=float))
+        return np.asarray(true_values) - prob
+
+    @staticmethod
+    def loss_friedman(true_values, predictions, weights=None):
+        """
+        Cross-entropy of the softmax of the predictions.
+        """
+        predictions = np.asarray(predictions, dtype=float)
+        shifted = predictions - predictions.max(axis=1, keepdims=True)
+        log_prob = shifted - np.log(
+            np.exp(shifted).sum(axis=1, keepdims=True))
+        losses = -(np.asarray(true_values) * log_prob).sum(axis=1)
+        return float(np.average(losses, weights=weights))
 
     @staticmethod
     def minus_partial_derivative(true_values, predictions):
-        return [
-            GradientBoostingRegression.minus_partial_derivative(t, p)
-            for t, p in zip(true_values, predictions)
-        ]
+        """
+        :param true_values: one-hot encoded targets, numpy array of shape (N, K)
+        :param predictions: numpy array of shape (N, K)
+        :return: numpy array of shape (N, K)
+        """
+        return GradientBoostingRegression.minus_partial_derivative(
+            true_values, predictions)
 
     @staticmethod
     def is_classification():
@@ -182,6 +234,9 @@ class GradientBoosting(TreeEnsemble):
                  step_size=1.0,
                  chosen_examples=1.0,
                  random_seed=112,
+                 nb_processes=1,
+                 patience=float("inf"),
+                 progress_callback: ProgressCallback = None,
                  **tree_parameters):
         self.nb_trees = nb_trees_to_build
         self.shrinkage = shrinkage
@@ -190,6 +245,16 @@ class GradientBoosting(TreeEnsemble):
         self.chosen_examples = chosen_examples
         self.ensemble_random = EnsembleRandomGenerator(random_seed)
         self.tree_parameters = tree_parameters
+        self.nb_processes = nb_processes  # for the trees of different classes
+        self.progress_callback = progress_callback  # also passed to the trees
+        if self.nb_processes > 1 and tree_parameters.get(
+                'java_port') is not None:
+            raise WrongValueException(
+                "Trees cannot be fitted in parallel when using java.")
+        # early stopping: number of iterations without improvement of the validation loss
+        self.patience = patience
+        # [loss of the default model, loss after the first tree, ...]
+        self.validation_losses = []  # type: List[float]
         self.task = None
         self.alphas = 0
         self.trees = []  # type: List[DecisionTree]
@@ -202,6 +267,17 @@ class GradientBoosting(TreeEnsemble):
         except TypeError:
             return [step_size] * self.nb_trees
 
+    def get_task_function(self, name):
+        """
+        :param name: e.g., loss
+        :return: the function of the task with the given name, or its friedman variant
+          (e.g., loss_friedman) if GradientBoosting.friedman and the task has one, so that the
+          gradients, the default model and the validation loss belong to the same loss function
+        """
+        if GradientBoosting.friedman and hasattr(self.task, name + "_friedman"):
+            return getattr(self.task, name + "_friedman")
+        return getattr(self.task, name)
+
     @staticmethod
     def find_task(target_data: List[Datum]):
         data_type = type(target_data[0].get_target())
@@ -220,86 +296,266 @@ class GradientBoosting(TreeEnsemble):
             raise WrongValueException(
                 "Wrong target type: {}".format(data_type))
 
-    def fit(self, input_data: Dataset):
+    def fit(self,
+            input_data: Dataset,
+            validation_data: Union[None, Dataset] = None):
+        """
+        Builds the trees. If validation data is given, its loss is tracked after each iteration,
+        the building stops after patience iterations without improvement, and the ensemble is
+        truncated to the iteration with the lowest validation loss.
+        :param input_data: training data
+        :param validation_data: None or data with the same target relation and descriptive relations
+        :return: None
+        """
         # find task
         self.task = GradientBoosting.find_task(input_data.get_target_data())
+        self.validation_losses = []
         if self.task in [
                 GradientBoosting.binary_classification,
                 GradientBoosting.regression
         ]:
-            self.build_helper1(input_data)
+            self.build_helper1(input_data, validation_data)
         elif self.task in [GradientBoosting.multi_class_classification]:
-            self.build_helper2(input_data)
-
-    def build_helper1(self, input_data: Dataset):
+            self.build_helper2(input_data, validation_data)
+        if validation_data is not None:
+            self.truncate_to_best_iteration()
+
+    def build_helper1(self, input_data: Dataset,
+                      validation_data: Union[None, Dataset]):
+        create_default_model = self.get_task_function("create_default_model")
+        minus_partial_derivative = self.get_task_function(
+            "minus_partial_derivative")
+        loss = self.get_task_function("loss")
         # preprocess data
         data, class_dictionary = self.preprocess(input_data)
-        true_values = [datum.get_target() for datum in data.get_target_data()]
+        true_values = np.array(
+            [datum.get_target() for datum in data.get_target_data()],
+            dtype=float)
         self.class_dictionary = class_dictionary
         # build default model
-        self.trees.append(self.task.create_default_model(data))
-        current_predictions = self.trees[-1].predict_all(
-            data.get_target_data())
+        self.trees.append(create_default_model(data))
+        current_predictions = np.array(
+            self.trees[-1].predict_all(data.get_target_data()), dtype=float)
+        if validation_data is not None:
+            validation_targets = self.encode_validation_targets(
+                validation_data)
+            validation_predictions = np.array(
+                self.trees[-1].predict_all(validation_data.get_target_data()),
+                dtype=float)
+            self.validation_losses.append(
+                loss(validation_targets, validation_predictions))
         # build boosted trees
         for t in range(self.nb_trees):
-            ys = self.task.minus_partial_derivative(true_values,
-                                                    current_predictions)
-            modified_data = self.modify_dataset(data, ys)
-            print("Building tree {}".format(t + 1))
-            self.tree_parameters[
-                'random_seed'] = self.ensemble_random.next_tree_seed()
-            self.tree_parameters['heuristic'] = HeuristicVariance()
-            self.trees.append(DecisionTree(**self.tree_parameters))
+            t0 = time.time()
+            self.notify(ProgressEvent.iteration_started, iteration=t)
+            ys = minus_partial_derivative(true_values, current_predictions)
+            chosen_indices = self.choose_examples(len(ys))
+            modified_data = self.modify_dataset(data, ys, chosen_indices)
+            logger.info("Building tree %d", t + 1)
+            self.trees.append(self.create_tree())
             self.trees[-1].fit(modified_data)
             self.task.modify_tree(self.shrinkage, self.step_sizes[t],
                                   self.optimize_step_size, self.trees[-1])
             GradientBoosting.update_current_predictions(
-                self.trees[-1], current_predictions, data.get_target_data())
-
-    def build_helper2(self, input_data: Dataset):
+                self.trees[-1], current_predictions, data.get_target_data(),
+                chosen_indices)
+            should_stop = False
+            if validation_data is not None:
+                validation_predictions += self.trees[-1].predict_all(
+                    validation_data.get_target_data())
+                should_stop = self.should_stop(
+                    loss(validation_targets, validation_predictions))
+            self.notify_iteration_finished(t, t0)
+            if should_stop:
+                break
+
+    def build_helper2(self, input_data: Dataset,
+                      validation_data: Union[None, Dataset]):
+        create_default_model = self.get_task_function("create_default_model")
+        minus_partial_derivative = self.get_task_function(
+            "minus_partial_derivative")
+        loss = self.get_task_function("loss")
         # preprocess data
         datasets, class_dictionary = self.preprocess(input_data)
         k = len(datasets)
-        true_values = [[
-            datum.get_target() for datum in data.get_target_data()
-        ] for data in datasets]
+        # the state is kept in arrays of shape (number of examples, number of classes)
+        true_values = np.array(
+            [[datum.get_target() for datum in data.get_target_data()]
+             for data in datasets],
+            dtype=float).T
         self.class_dictionary = class_dictionary
         # build default model, for each class
         self.trees_per_class.append([])
-        current_predictions = []
+        current_predictions = np.zeros(true_values.shape)
         for i in range(k):
-            self.trees_per_class[-1].append(
-                self.task.create_default_model(datasets[i]))
-            current_predictions.append(self.trees_per_class[-1][i].predict_all(
-                datasets[i].get_target_data()))
+            self.trees_per_class[-1].append(create_default_model(datasets[i]))
+            current_predictions[:, i] = self.trees_per_class[-1][
+                i].predict_all(datasets[i].get_target_data())
+        if validation_data is not None:
+            validation_targets = self.encode_validation_targets(
+                validation_data)
+            validation_predictions = np.zeros(validation_targets.shape)
+            for i, tree in enumerate(self.trees_per_class[-1]):
+                validation_predictions[:, i] = tree.predict_all(
+                    validation_data.get_target_data())
+            self.validation_losses.append(
+                loss(validation_targets, validation_predictions))
         # build boosted trees, for each class
         for t in range(self.nb_trees):
-            ys = self.task.minus_partial_derivative(true_values,
-                                                    current_predictions)
+            t0 = time.time()
+            self.notify(ProgressEvent.iteration_started, iteration=t)
+            ys = minus_partial_derivative(true_values, current_predictions)
+            # the random seeds are drawn in the same order, regardless of nb_processes
+            chosen_per_class = []
             modified_datasets = []
-            self.trees_per_class.append([])
+            trees = []
             for i in range(k):
+                chosen_per_class.append(self.choose_examples(len(ys)))
                 modified_datasets.append(
-                    self.modify_dataset(datasets[i], ys[i]))
-                print("Building tree {} for class {}".format(t + 1, i + 1))
-                self.tree_parameters[
-                    'random_seed'] = self.ensemble_random.next_tree_seed()
-                self.tree_parameters['heuristic'] = HeuristicVariance()
-                self.trees_per_class[-1].append(
-                    DecisionTree(**self.tree_parameters))
-                self.trees_per_class[-1][i].fit(modified_datasets[i])
+                    self.modify_dataset(datasets[i], ys[:, i],
+                                        chosen_per_class[-1]))
+                trees.append(self.create_tree())
+            self.trees_per_class.append(
+                self.fit_class_trees(trees, modified_datasets, t))
+            for i, chosen_indices in enumerate(chosen_per_class):
                 self.task.modify_tree(self.shrinkage, self.step_sizes[t],
                                       self.optimize_step_size,
                                       self.trees_per_class[-1][i])
                 GradientBoosting.update_current_predictions(
-                    self.trees_per_class[-1][i], current_predictions[i],
-                    datasets[i].get_target_data())
+                    self.trees_per_class[-1][i], current_predictions[:, i],
+                    datasets[i].get_target_data(), chosen_indices)
+            should_stop = False
+            if validation_data is not None:
+                for i, tree in enumerate(self.trees_per_class[-1]):
+                    validation_predictions[:, i] += tree.predict_all(
+                        validation_data.get_target_data())
+                should_stop = self.should_stop(
+                    loss(validation_targets, validation_predictions))
+            self.notify_iteration_finished(t, t0)
+            if should_stop:
+                break
+
+    def notify(self, kind, **details):
+        if self.progress_callback is not None:
+            self.progress_callback(ProgressEvent(kind, self, **details))
+
+    def notify_iteration_finished(self, iteration, start_time):
+        details = {'iteration': iteration, 'time': time.time() - start_time}
+        if self.validation_losses:
+            details['validation_loss'] = self.validation_losses[-1]
+        self.notify(ProgressEvent.iteration_finished, **details)
+
+    def encode_validation_targets(self, validation_data: Dataset):
+        """
+        Converts the targets of the validation data in the same way as preprocess converts the training ones.
+        :return: numpy array of shape (N, ), or (N, K) for multiclass classification
+        """
+        targets = [d.get_target() for d in validation_data.get_target_data()]
+        if self.task.is_regression():
+            return np.array(targets, dtype=float)
+        encoding = {y: x for x, y in self.class_dictionary.items()}
+        unknown = set(targets) - set(encoding)
+        if unknown:
+            raise WrongValueException(
+                "Unknown classes in the validation data: {}".format(unknown))
+        codes = np.array([encoding[t] for t in targets], dtype=int)
+        if self.task.is_binary_classification():
+            return codes.astype(float)
+        one_hot = np.zeros((len(codes), len(encoding)))
+        one_hot[np.arange(len(codes)), codes] = 1.0
+        return one_hot
+
+    def should_stop(self, validation_loss):
+        """
+        Records the validation loss of the last iteration.
+        :return: True if the loss has not improved for patience iterations
+        """
+        self.validation_losses.append(validation_loss)
+        best_iteration = int(np.argmin(self.validation_losses))
+        return len(self.validation_losses) - 1 - best_iteration >= self.patience
+
+    def truncate_to_best_iteration(self):
+        """
+        Keeps the trees up to the iteration with the lowest validation loss.
+        """
+        best_iteration = int(np.argmin(self.validation_losses))
+        logger.info("Best validation loss %s after %d trees",
+                    self.validation_losses[best_iteration], best_iteration)
+        self.nb_trees = best_iteration
+        self.trees = self.trees[:best_iteration + 1]
+        self.trees_per_class = self.trees_per_class[:best_iteration + 1]
+
+    def fit_class_trees(self, trees: List[DecisionTree],
+                        datasets: List[Dataset], iteration):
+        """
+        Fits the trees of the given iteration (one for each class). If nb_processes > 1, the trees are fitted
+        in a process pool. The workers inherit the descriptive relations when processes are forked, and
+        the fitted trees are sent back without them, so they end up referencing the relations of this process.
+        :return: list of fitted trees
+        """
+        if self.nb_processes <= 1 or len(trees) == 1:
+            for i, (tree, data) in enumerate(zip(trees, datasets)):
+                logger.info("Building tree %d for class %d", iteration + 1,
+                            i + 1)
+                tree.fit(data)
+            return trees
+        logger.info("Building trees %d for %d classes in parallel",
+                    iteration + 1, len(trees))
+        # the events of the workers would not reach the callback of this process
+        for tree in trees:
+            tree.progress_callback = None
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        with futures.ProcessPoolExecutor(
+                max_workers=min(self.nb_processes, len(trees)),
+                mp_context=context,
+                initializer=_initialize_worker,
+                initargs=(trees, datasets)) as executor:
+            fitted = list(executor.map(_fit_tree_in_worker,
+                                       range(len(trees))))
+        relations = datasets[0].get_descriptive_data()
+        fitted = [loads_sharing_relations(tree, relations) for tree in fitted]
+        for tree in fitted:
+            tree.progress_callback = self.progress_callback
+        return fitted
+
+    def create_tree(self):
+        self.tree_parameters[
+            'random_seed'] = self.ensemble_random.next_tree_seed()
+        self.tree_parameters['heuristic'] = HeuristicVariance()
+        # the leaf membership is only needed by update_current_predictions
+        return DecisionTree(progress_callback=self.progress_callback,
+                            **dict(self.tree_parameters,
+                                   store_leaf_membership=True))
 
     @staticmethod
-    def update_current_predictions(tree, current_predictions,
-                                   data: List[Datum]):
-        for i, datum in enumerate(data):
-            current_predictions[i] += tree.predict(datum)
+    def update_current_predictions(tree: DecisionTree, current_predictions,
+                                   data: List[Datum], chosen_indices=None):
+        """
+        Adds the predictions of the tree to the current predictions. The examples that the tree was built
+        from are mapped to their leaves via the leaf membership that was recorded during fit, only
+        the remaining ones (if the tree was built from a subsample) are sent through the tree.
+        Afterwards, the tree forgets the leaf membership.
+        :param tree: fitted tree that stores leaf membership
+        :param current_predictions: numpy array of shape (N, ), updated in place
+        :param data: the N examples
+        :param chosen_indices: None or numpy array that maps the examples of the tree to the data
+        :return: None
+        """
+        leaf_predictions = np.array(
+            [leaf.get_stats().get_prediction() for leaf in tree.get_leaves()])
+        updates = leaf_predictions[tree.get_training_leaf_ids()]
+        tree.forget_leaf_membership()
+        if chosen_indices is None:
+            current_predictions += updates
+        else:
+            current_predictions[chosen_indices] += updates
+            left_out = np.ones(len(data), dtype=bool)
+            left_out[chosen_indices] = False
+            for i in np.flatnonzero(left_out):
+                current_predictions[i] += tree.predict(data[i])
 
     def preprocess(self, data: Dataset):
         """
@@ -334,7 +590,8 @@ class GradientBoosting(TreeEnsemble):
                            data_file=data.data_file,
                            descriptive_relations=data.get_descriptive_data(),
                            target_data=new_target_values,
-                           statistics=new_statistics), {
+                           statistics=new_statistics,
+                           catalog=data.catalog), {
                                y: x
                                for x, y in dictionary.items()
                            }
@@ -363,7 +620,8 @@ class GradientBoosting(TreeEnsemble):
             dataset_params = {
                 'settings': data.settings,
                 'descriptive_relations': data.get_descriptive_data(),
-                'statistics': new_statistics
+                'statistics': new_statistics,
+                'catalog': data.catalog
             }
             datasets = []
             for i in range(k):
@@ -384,33 +642,52 @@ class GradientBoosting(TreeEnsemble):
                            data_file=data.data_file,
                            descriptive_relations=data.get_descriptive_data(),
                            target_data=data.get_target_data(),
-                           statistics=new_statistics), None
+                           statistics=new_statistics,
+                           catalog=data.catalog), None
         else:
             raise WrongValueException("Wrong task: {}".format(self.task))
 
-    def modify_dataset(self, data: Dataset, ys):
+    def choose_examples(self, n):
+        """
+        :param n: number of examples
+        :return: None if all the examples are used for the next tree, otherwise the numpy array
+          of the indices of the chosen ones
+        """
+        if self.chosen_examples < 1.0:
+            k = int(n * self.chosen_examples)
+            random.seed(self.ensemble_random.next_sample_rows_seed())
+            return np.array(random.sample(range(n), k=k), dtype=int)
+        return None
+
+    def modify_dataset(self, data: Dataset, ys, chosen_indices=None):
         # update targets
         new_target_data = []
-        for datum, y in zip(data.get_target_data(), ys):
+        for datum, y in zip(data.get_target_data(), ys.tolist()):
             new_datum = Datum(datum.get_descriptive(), y, datum.get_weight(),
                               datum.identifier)
             assert new_datum.get_weight() == 1
             new_target_data.append(new_datum)
         # subsample
-        if self.chosen_examples < 1.0:
-            n = len(new_target_data)
-            k = int(n * self.chosen_examples)
-            random.seed(self.ensemble_random.next_sample_rows_seed())
-            chosen_indices = random.sample(range(n), k=k)
+        if chosen_indices is not None:
             new_target_data = [new_target_data[i] for i in chosen_indices]
         return Dataset(settings=data.settings,
                        data_file=data.data_file,
                        descriptive_relations=data.get_descriptive_data(),
                        target_data=new_target_data,
-                       statistics=data.get_copy_statistics())
+                       statistics=data.get_copy_statistics(),
+                       catalog=data.catalog)
+
+    def get_trees(self):
+        """
+        :return: all the trees (including the default models), in the order of building
+        """
+        return self.trees + [
+            tree for trees in self.trees_per_class for tree in trees
+        ]
 
     def compute_ranking(self, ranking_type):
-        feature_ranking = EnsembleRanking({}, {}, ranking_type, self.nb_trees)
+        feature_ranking = ensemble_ranking.EnsembleRanking(
+            {}, {}, ranking_type, self.nb_trees)
         for i in range(self.nb_trees):
             if self.task in [
                     GradientBoosting.binary_classification,
@@ -531,3 +808,18 @@ class GradientBoosting(TreeEnsemble):
                     print(str(tree), file=f)
                     print("", file=f)
         f.close()
+
+
+_WORKER_STATE = {}
+
+
+def _initialize_worker(trees: List[DecisionTree], datasets: List[Dataset]):
+    _WORKER_STATE['trees'] = trees
+    _WORKER_STATE['datasets'] = datasets
+
+
+def _fit_tree_in_worker(i):
+    tree = _WORKER_STATE['trees'][i]
+    data = _WORKER_STATE['datasets'][i]
+    tree.fit(data)
+    return dumps_sharing_relations(tree, data.get_descriptive_data())
@@ -1,6 +1,11 @@
 from typing import List
+from collections import Counter
 import statistics as st
 import itertools
+from ...utilities.lazy_import import LazyModule
+from .segments import Segments
+
+np = LazyModule("numpy")
 
 MODE_OF_EMPTY_LIST = "Nothing to see here"
 TYPE_NUMERIC = "numeric"
@@ -8,6 +13,8 @@ TYPE_NOMINAL = "nominal"
 TYPE_TYPE = "type"
 TYPE_TUPLE = "tuple"
 TYPE_SAME_AS_INPUT = "as input"
+# batches with fewer values are aggregated in pure python
+NUMPY_BATCH_THRESHOLD = 256
 
 
 class Aggregator:
@@ -29,6 +36,12 @@ class Aggregator:
     def aggregate(self, ls):
         return [self.aggregate_flat(a_list) for a_list in ls]
 
+    def aggregate_segments(self, segments: Segments):
+        """
+        Same as aggregate, but the groups are given in the CSR form.
+        """
+        return self.aggregate(segments.groups())
+
     def __eq__(self, other):
         return self.name == other.name
 
@@ -130,6 +143,9 @@ class Flatten(Aggregator):
     def aggregate(self, ls):
         return list(itertools.chain.from_iterable(ls))
 
+    def aggregate_segments(self, segments: Segments):
+        return list(segments.values)
+
     def aggregate_flat(self, a_list):
         return a_list
 
@@ -143,6 +159,9 @@ class FlattenUnique(Aggregator):
     def aggregate(self, ls):
         return list(set(itertools.chain.from_iterable(ls)))
 
+    def aggregate_segments(self, segments: Segments):
+        return list(set(segments.values))
+
     def aggregate_flat(self, a_list):
         return a_list
 
@@ -163,6 +182,13 @@ class Project(Aggregator):
         return self.aggregator.aggregate_flat(
             [e[self.component] for e in a_list])
 
+    def aggregate_segments(self, segments: Segments):
+        projected = segments.project(self.component)
+        if isinstance(self.aggregator, (Flatten, FlattenUnique)):
+            # their aggregate_flat keeps the groups as they are
+            return projected.groups()
+        return self.aggregator.aggregate_segments(projected)
+
 
 class Project0(Project):
     def __init__(self, aggregator):
@@ -204,6 +230,107 @@ class Project7(Project):
         super().__init__(7, aggregator)
 
 
+def reduce_segments(segments: Segments, ufunc, empty_value):
+    """
+    Segmented numpy reduction of large batches, None if the batch is small or not numeric.
+    """
+    if segments.get_total_size() < NUMPY_BATCH_THRESHOLD:
+        return None
+    try:
+        return segments.reduce(ufunc, empty_value)
+    except (ValueError, TypeError):
+        return None
+
+
+class FastCount(Count):
+    def aggregate(self, ls):
+        return [len(a_list) for a_list in ls]
+
+    def aggregate_segments(self, segments: Segments):
+        return segments.lengths()
+
+
+class FastCountUnique(CountUnique):
+    def aggregate(self, ls):
+        return [len(set(a_list)) for a_list in ls]
+
+
+class FastMin(Min):
+    def aggregate(self, ls):
+        return [min(a_list) if a_list else float("inf") for a_list in ls]
+
+    def aggregate_segments(self, segments: Segments):
+        reduced = reduce_segments(segments, np.minimum, float("inf"))
+        return self.aggregate(
+            segments.groups()) if reduced is None else reduced
+
+
+class FastMax(Max):
+    def aggregate(self, ls):
+        return [max(a_list) if a_list else float("-inf") for a_list in ls]
+
+    def aggregate_segments(self, segments: Segments):
+        reduced = reduce_segments(segments, np.maximum, float("-inf"))
+        return self.aggregate(
+            segments.groups()) if reduced is None else reduced
+
+
+class FastMean(Mean):
+    """
+    Float-accumulator mean: the same values as Mean (up to rounding),
+    without the exact fraction arithmetic of statistics.mean.
+    """
+    def aggregate_flat(self, a_list):
+        return sum(a_list) / len(a_list) if a_list else float("inf")
+
+    def aggregate(self, ls):
+        lengths = [len(a_list) for a_list in ls]
+        total = sum(lengths)
+        if total < NUMPY_BATCH_THRESHOLD:
+            return [self.aggregate_flat(a_list) for a_list in ls]
+        values = np.fromiter(itertools.chain.from_iterable(ls),
+                             dtype=float,
+                             count=total)
+        groups = np.repeat(np.arange(len(ls)), lengths)
+        sums = np.bincount(groups, weights=values, minlength=len(ls))
+        return [
+            s / n if n else float("inf")
+            for s, n in zip(sums.tolist(), lengths)
+        ]
+
+    def aggregate_segments(self, segments: Segments):
+        sums = reduce_segments(segments, np.add, 0.0)
+        if sums is None:
+            return self.aggregate(segments.groups())
+        return [
+            s / n if n else float("inf")
+            for s, n in zip(sums, segments.lengths())
+        ]
+
+
+class FastSum(Sum):
+    def aggregate(self, ls):
+        return [sum(a_list) for a_list in ls]
+
+    def aggregate_segments(self, segments: Segments):
+        reduced = reduce_segments(segments, np.add, 0)
+        return self.aggregate(
+            segments.groups()) if reduced is None else reduced
+
+
+class FastMode(Mode):
+    def aggregate_flat(self, a_list):
+        if not a_list:
+            return MODE_OF_EMPTY_LIST
+        counts = Counter(a_list)
+        best = max(counts.values())
+        # ties are resolved as in Mode: the smallest of the most frequent
+        return min(x for x, c in counts.items() if c == best)
+
+    def aggregate(self, ls):
+        return [self.aggregate_flat(a_list) for a_list in ls]
+
+
 FLATTEN = Flatten()
 FLATTEN_UNIQUE = FlattenUnique()
 COUNT = Count()
@@ -234,3 +361,29 @@ COMPLEX_ENOUGH_AGGREGATORS = [
     a for a in ALL_AGGREGATORS if TYPE_TUPLE in a.input_types
 ]
 CRITICAL_VALUES = [float("inf"), float("-inf"), MODE_OF_EMPTY_LIST]
+
+# performance tier: same names (and results) as their counterparts above
+FAST_AGGREGATORS = [
+    FastCount(),
+    FastCountUnique(),
+    FastMin(),
+    FastMax(),
+    FastMean(),
+    FastSum(),
+    FastMode()
+]  # type: List['Aggregator']
+_FAST_BY_NAME = {a.get_name(): a for a in FAST_AGGREGATORS}
+
+
+def get_fast_aggregator(aggregator: Aggregator) -> Aggregator:
+    """
+    Returns the performance-tier counterpart of the aggregator. Projections are rebuilt around
+    the fast counterpart of their inner aggregator. Aggregators without a faster implementation
+    (e.g., flatten) are returned as they are.
+    """
+    if aggregator.is_projection:
+        inner = aggregator.aggregator
+        if inner is None:
+            return aggregator
+        return aggregator.__class__(get_fast_aggregator(inner))
+    return _FAST_BY_NAME.get(aggregator.get_name(), aggregator)
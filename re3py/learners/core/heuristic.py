@@ -1,6 +1,9 @@
 from ...data.data_and_statistics import *
 from typing import List
-import numpy as np
+from ...utilities.lazy_import import LazyModule
+
+np = LazyModule("numpy")
+
 
 class Heuristic:
     def compute_variability(self, tree_node_stat):
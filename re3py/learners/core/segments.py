@@ -0,0 +1,94 @@
+from typing import List
+import itertools
+from ...utilities.lazy_import import LazyModule
+
+np = LazyModule("numpy")
+
+
+class Segments:
+    """
+    CSR-style representation of a list of groups: the values of all the groups are stored
+    in one flat array, and the i-th group is values[offsets[i]:offsets[i + 1]].
+    Used for the neighbour groups that are passed between the steps of a relation chain.
+
+    The flat arrays are built once, on the first call that needs them, so that the segments can be
+    shared by all the aggregators of a chain step. Small batches are aggregated group by group
+    (see groups), and their flat arrays are never built.
+    """
+    def __init__(self, groups=None):
+        self.group_list = [] if groups is None else groups  # type: List[List]
+        self.total_size = sum(len(group) for group in self.group_list)
+        self.flat_values = None  # type: List
+        self.flat_offsets = None  # type: List[int]
+        self.numeric_values = None  # numpy array of the flat values
+
+    def __len__(self):
+        return len(self.group_list)
+
+    def __repr__(self):
+        return "Segments({}, {})".format(self.values, self.offsets)
+
+    @staticmethod
+    def from_lists(ls):
+        return Segments(list(ls))
+
+    def append(self, group):
+        self.group_list.append(group)
+        self.total_size += len(group)
+        self.flat_values = None
+        self.flat_offsets = None
+        self.numeric_values = None
+
+    @property
+    def values(self):
+        if self.flat_values is None:
+            self.flat_values = list(
+                itertools.chain.from_iterable(self.group_list))
+        return self.flat_values
+
+    @property
+    def offsets(self):
+        if self.flat_offsets is None:
+            self.flat_offsets = [0] + list(itertools.accumulate(
+                self.lengths()))
+        return self.flat_offsets
+
+    def get_total_size(self):
+        return self.total_size
+
+    def lengths(self):
+        return [len(group) for group in self.group_list]
+
+    def groups(self):
+        """
+        :return: the groups (not copied, so they must not be changed)
+        """
+        return self.group_list
+
+    def project(self, component):
+        return Segments([[t[component] for t in group]
+                         for group in self.group_list])
+
+    def reduce(self, ufunc, empty_value):
+        """
+        Segmented reduction, e.g., reduce(np.add, 0.0) gives the sums of the groups.
+        Raises ValueError or TypeError if the values are not numeric.
+
+        :param ufunc: a binary numpy ufunc, such as np.add or np.minimum
+        :param empty_value: the result for the empty groups
+        :return: list of the reduced values, one for each group
+        """
+        if self.numeric_values is None:
+            self.numeric_values = np.fromiter(self.values,
+                                              dtype=float,
+                                              count=self.total_size)
+        values = self.numeric_values
+        offsets = np.asarray(self.offsets)
+        lengths = np.diff(offsets)
+        result = np.full(len(lengths), empty_value, dtype=float)
+        non_empty = lengths > 0
+        if values.size > 0:
+            # empty groups are skipped, so that the starts are strictly increasing
+            result[non_empty] = ufunc.reduceat(values,
+                                               offsets[:-1][non_empty])
+        return result.tolist()
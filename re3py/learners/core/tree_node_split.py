@@ -3,14 +3,34 @@ from ...data.relation import Relation
 from .comparators import Comparator
 from .variables import Variable
 from .aggregators import Aggregator, CRITICAL_VALUES
+from .segments import Segments
+from ...utilities.profiling import add_to_counters
 
 # from my_exceptions import WrongValueException
-# from my_memo import used_comp_memo
 
 # tree node split memo
 TEST_VALUE_MEMO = {}
 
 
+def forget_test_values(relation_names: Set[str]):
+    """
+    Removes the memoized test values that were computed from any of the given relations,
+    e.g., after their facts have changed.
+    :param relation_names: the names of the relations
+    :return: the number of the removed relation chains
+    """
+    removed = 0
+    for values_per_chain in TEST_VALUE_MEMO.values():
+        outdated = [
+            relation_key for relation_key in values_per_chain
+            if any(part[0] in relation_names for part in relation_key)
+        ]
+        for relation_key in outdated:
+            del values_per_chain[relation_key]
+        removed += len(outdated)
+    return removed
+
+
 class BinarySplit:
     use_memo = True
     worst_split_score = float('inf')
@@ -28,6 +48,8 @@ class BinarySplit:
         self.fresh_variables = {}  # type: Dict[str, Variable]
         self.is_variable_free = is_variable_free
         self.used_for_relation_computation = False
+        # the sizes of the joins of the current get_test_values call, see add_to_counters
+        self.join_sizes = None  # type: Union[List[int], None]
 
     def __str__(self, var_dict=None):
         tests_str = []
@@ -90,6 +112,7 @@ class BinarySplit:
         values = [None] * n_as
         should_memo = BinarySplit.use_memo and relation_key is not None
         d1 = None
+        memo_hits = 0
         if should_memo:
             filtered_chains_aggregators = []
             filtered_aggregator_keys = []
@@ -103,20 +126,24 @@ class BinarySplit:
                 a_key = aggregator_keys[i]
                 if a_key in d1:
                     values[i] = d1[a_key]
-                    # used_comp_memo[0] += 1
+                    memo_hits += 1
                 else:
                     filtered_chains_aggregators.append(chain_aggregators)
                     filtered_aggregator_keys.append(a_key)
-                    # used_comp_memo[1] += 1
         else:
             filtered_chains_aggregators = chains_aggregators
             filtered_aggregator_keys = [None] * len(chains_aggregators)
+        self.join_sizes = []
         if filtered_chains_aggregators:
             values_partial_all = self.get_test_value_helper(
                 example, chain_relations, filtered_chains_aggregators,
                 nb_fresh_vars, fresh_indices, known_unknown)
         else:
             values_partial_all = []
+        add_to_counters(memo_hits,
+                        len(filtered_chains_aggregators) if should_memo else 0,
+                        self.join_sizes)
+        self.join_sizes = None
         where_to = 0
         for agg_key, chain_aggregators, values_partial in zip(
                 filtered_aggregator_keys, filtered_chains_aggregators,
@@ -169,6 +196,7 @@ class BinarySplit:
             known_unknown = known_unknown_list[depth - 1]
         known, unknown = known_unknown
         related = relation.get_all(rel_variables, known)
+        self.join_sizes.append(len(related))
         if len(chain_relations) == depth:
             if nb_fresh_vars < 0:
                 fresh_indices = [
@@ -197,13 +225,23 @@ class BinarySplit:
         else:
             next_aggregators = [chain[depth] for chain in chains_aggregators
                                 ]  # type: List[Aggregator]
-            to_aggregate = []
-            for res in results_generator(related):
-                to_aggregate.append(res)
+            # the groups of the neighbours are kept in the CSR form, one for each aggregator
+            if depth + 1 == len(chain_relations):
+                # the last step gives the same groups to all the aggregators, so they share them
+                shared = Segments(
+                    [res[0] for res in results_generator(related)])
+                to_aggregate = [shared for _ in next_aggregators]
+            else:
+                to_aggregate = [Segments() for _ in next_aggregators]
+                for res in results_generator(related):
+                    for segments, neigh in zip(to_aggregate, res):
+                        segments.append(neigh)
             answer = []
-            for a_ind, a in enumerate(next_aggregators):
-                ls = [neigh[a_ind] for neigh in to_aggregate]
-                out = [x for x in a.aggregate(ls) if should_keep_value(x)]
+            for a, segments in zip(next_aggregators, to_aggregate):
+                out = [
+                    x for x in a.aggregate_segments(segments)
+                    if should_keep_value(x)
+                ]
                 answer.append(out)
             return answer
 
@@ -0,0 +1,435 @@
+"""
+A compact file format of the fitted models (trees and tree ensembles) that, unlike dump_to_bin,
+stores neither the descriptive data nor the fields that are only needed during fit.
+
+A tree is stored as its structure, its splits and its leaves:
+
+- nodes: int32 array with a row [positive child, negative child, split, leaf] for every node
+  (in the order of DecisionTree.__iter__, -1 when not applicable),
+- thresholds: float64 array with the numeric thresholds of the splits (nan for the others),
+- leaves: float64 array with a row of the statistics of every leaf (see leaf_layout),
+- the tests of the splits (relation names, variable names and aggregators), the non-numeric thresholds
+  and the constants, in the json header.
+
+The rest of a model (e.g., the weights of the trees in gradient boosting) is pickled, where the trees and
+the relations are replaced by their indices and names. The file is
+
+    MAGIC, length of the header (8 bytes), header (json), arrays (each aligned to 8 bytes)
+
+and the trees are rebuilt from the arrays when the model is loaded. The relations are bound to
+the ones of the dataset that is given to load_model.
+
+Example:
+
+    dump_model(forest, "forest.re3py")
+    forest = load_model("forest.re3py", Dataset("data.s", "data.txt"))
+"""
+from typing import Dict, List
+import io
+import json
+import math
+import pickle
+import struct
+import numpy as np
+from ..data import data_and_statistics
+from ..data.data_and_statistics import Dataset, NodeStatistics
+from ..data.relation import Relation
+from .core import aggregators
+from .core.aggregators import Aggregator, PROJECTIONS, Project
+from .core.comparators import ALL_COMPARATORS
+from .core.tree_node_split import BinarySplit
+from .tree import DecisionTree, TreeNode, create_new_variable
+
+MAGIC = b"re3py model\n"
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+
+# the numeric fields of the statistics that the leaves need for (ensemble) predictions
+LEAF_FIELDS = [
+    "total_nb_examples", "sum1", "sum2", "sum_abs1", "nb_examples_per_class",
+    "per_class_probabilities", "prediction"
+]
+# the arguments of the constructors of the statistics
+LEAF_PARAMETERS = ["class_names", "nb_targets", "nb_classes"]
+
+
+class _ShellPickler(pickle.Pickler):
+    """
+    Pickles a model without its trees and relations: they are replaced by (tree, index)
+    and (relation, name).
+    """
+    def __init__(self, file, trees: List[DecisionTree]):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.trees = trees
+        self.tree_indices = {}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, DecisionTree):
+            if id(obj) not in self.tree_indices:
+                self.tree_indices[id(obj)] = len(self.trees)
+                self.trees.append(obj)
+            return "tree", self.tree_indices[id(obj)]
+        elif isinstance(obj, Relation):
+            return "relation", obj.get_name()
+        return None
+
+
+class _ShellUnpickler(pickle.Unpickler):
+    def __init__(self, file, trees: List[DecisionTree],
+                 relations: Dict[str, Relation]):
+        super().__init__(file)
+        self.trees = trees
+        self.relations = relations
+
+    def persistent_load(self, pid):
+        kind, key = pid
+        if kind == "tree":
+            return self.trees[key]
+        return get_relation(self.relations, key)
+
+
+def get_relation(relations: Dict[str, Relation], name):
+    if name not in relations:
+        raise ValueError(
+            "The model uses the relation {}, which is not in the data.".format(
+                name))
+    return relations[name]
+
+
+def dump_model(model, file_name):
+    """
+    Writes the model in the compact format.
+    :param model: a DecisionTree or an ensemble of them (e.g., RandomForest or GradientBoosting)
+    :param file_name: the output file
+    """
+    trees = []
+    f = io.BytesIO()
+    _ShellPickler(f, trees).dump(model)
+    arrays = {"shell": np.frombuffer(f.getvalue(), dtype=np.uint8)}
+    tree_headers = [
+        encode_tree(tree, "tree{}".format(i), arrays)
+        for i, tree in enumerate(trees)
+    ]
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        table[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset
+        }
+        offset = aligned(offset + array.nbytes)
+    header = json.dumps({
+        'version': FORMAT_VERSION,
+        'arrays': table,
+        'trees': tree_headers
+    }).encode("utf-8")
+    data_start = aligned(len(MAGIC) + 8 + len(header))
+    with open(file_name, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.write(b"\0" * (data_start + table[name]['offset'] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+
+
+def load_model(file_name, data: Dataset):
+    """
+    Reads a model that was written by dump_model.
+    :param file_name: the file of the model
+    :param data: the dataset whose descriptive relations are used by the model
+    :return: the model
+    """
+    with open(file_name, "rb") as f:
+        buffer = f.read()
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError("{} is not a re3py model.".format(file_name))
+    header_length, = struct.unpack_from("<Q", buffer, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    header = json.loads(
+        buffer[header_start:header_start + header_length].decode("utf-8"))
+    if header['version'] != FORMAT_VERSION:
+        raise ValueError("Unknown version of the model format: {}".format(
+            header['version']))
+    data_start = aligned(header_start + header_length)
+    arrays = {}
+    for name, description in header['arrays'].items():
+        shape = tuple(description['shape'])
+        dtype = np.dtype(description['dtype'])
+        size = int(np.prod(shape))
+        if size == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.frombuffer(buffer,
+                                         dtype=dtype,
+                                         count=size,
+                                         offset=data_start +
+                                         description['offset']).reshape(shape)
+    relations = data.get_descriptive_data()
+    trees = [
+        decode_tree(tree_header, "tree{}".format(i), arrays, relations)
+        for i, tree_header in enumerate(header['trees'])
+    ]
+    shell = arrays['shell'].tobytes()
+    return _ShellUnpickler(io.BytesIO(shell), trees, relations).load()
+
+
+def aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def encode_tree(tree: DecisionTree, prefix, arrays: Dict[str, np.ndarray]):
+    """
+    Adds the arrays of the tree to arrays (their names start with the prefix).
+    :return: the json part of the tree
+    """
+    nodes = list(tree)
+    node_indices = {id(node): i for i, node in enumerate(nodes)}
+    node_rows = []
+    splits = []
+    thresholds = []
+    leaves = []
+    for node in nodes:
+        if node.is_leaf():
+            node_rows.append([-1, -1, -1, len(leaves)])
+            leaves.append(node.get_stats())
+        else:
+            positive, negative = node.get_children()
+            node_rows.append([
+                node_indices[id(positive)], node_indices[id(negative)],
+                len(splits), -1
+            ])
+            split, threshold = encode_split(node.get_split())
+            splits.append(split)
+            thresholds.append(threshold)
+    leaf_layout = get_leaf_layout(leaves)
+    arrays[prefix + ".nodes"] = np.array(node_rows,
+                                         dtype=np.int32).reshape(-1, 4)
+    arrays[prefix + ".thresholds"] = np.array(thresholds, dtype=np.float64)
+    arrays[prefix + ".leaves"] = np.array(
+        [encode_leaf(stats, leaf_layout) for stats in leaves],
+        dtype=np.float64).reshape(len(leaves), -1)
+    return {
+        'target_relation_description':
+        tree.target_relation_description,
+        'target_variables':
+        [[v.get_name(), v.value_type] for v in tree.target_relation_variables],
+        'splits':
+        splits,
+        'leaf_layout':
+        leaf_layout
+    }
+
+
+def decode_tree(tree_header, prefix, arrays: Dict[str, np.ndarray],
+                relations: Dict[str, Relation]):
+    tree = DecisionTree()
+    tree.descriptive_data = relations
+    tree.target_relation_description = tree_header[
+        'target_relation_description']
+    tree.target_relation_variables = [
+        create_new_variable(name, value_type)
+        for name, value_type in tree_header['target_variables']
+    ]
+    for v in tree.target_relation_variables:
+        tree.all_variables[v.get_name()] = v
+    node_rows = arrays[prefix + ".nodes"].tolist()
+    thresholds = arrays[prefix + ".thresholds"].tolist()
+    leaf_rows = arrays[prefix + ".leaves"].tolist()
+    leaf_layout = tree_header['leaf_layout']
+    nodes = [None] * len(node_rows)  # type: List[TreeNode]
+    nodes[0] = TreeNode(DecisionTree.root_indicator, None, [], None, None,
+                        DecisionTree.root_node_depth)
+    for i, (positive, negative, split_index, leaf_index) in enumerate(node_rows):
+        node = nodes[i]
+        if leaf_index >= 0:
+            node.set_stats(decode_leaf(leaf_rows[leaf_index], leaf_layout))
+            continue
+        split = decode_split(tree_header['splits'][split_index],
+                             thresholds[split_index], relations)
+        tree.all_variables.update(split.get_fresh_variables())
+        node.set_split(split)
+        for branch, child_index in enumerate([positive, negative]):
+            child = TreeNode(node.description + ".{}".format(branch), node, [],
+                             None, None,
+                             node.get_depth() + 1)
+            node.add_child(child)
+            nodes[child_index] = child
+    tree.root_node = nodes[0]
+    return tree
+
+
+def encode_aggregator(aggregator: Aggregator):
+    if aggregator is None:
+        return None
+    elif aggregator.is_projection:
+        return {
+            'projection': aggregator.component,
+            'inner': encode_aggregator(aggregator.aggregator)
+        }
+    return aggregator.__class__.__name__
+
+
+def decode_aggregator(code):
+    if code is None:
+        return None
+    elif isinstance(code, dict):
+        component = code['projection']
+        inner = decode_aggregator(code['inner'])
+        if isinstance(component, int) and component < len(PROJECTIONS):
+            return PROJECTIONS[component](inner)
+        return Project(component, inner)
+    aggregator_class = getattr(aggregators, code)
+    assert issubclass(aggregator_class, Aggregator)
+    return aggregator_class()
+
+
+def encode_split(split: BinarySplit):
+    """
+    :return: (the json part of the split, the numeric threshold or nan)
+    """
+    threshold = split.threshold
+    if isinstance(threshold, (set, frozenset)):
+        encoded_threshold = {'set': to_json_value(sorted(threshold))}
+        numeric_threshold = float("nan")
+    elif isinstance(threshold, str):
+        encoded_threshold = {'value': threshold}
+        numeric_threshold = float("nan")
+    else:
+        encoded_threshold = None
+        numeric_threshold = float(threshold)
+    fresh_variables = [[name, v.value_type,
+                        to_json_value(v.get_value())]
+                       for name, v in sorted(split.get_fresh_variables().items())]
+    return {
+        'test': [[r.get_name(), list(var_names),
+                  encode_aggregator(a)] for r, var_names, a in split.test],
+        'comparator': split.comparator.name,
+        'threshold': encoded_threshold,
+        'ignore_critical_values': split.ignore_critical_values,
+        'is_variable_free': split.is_variable_free,
+        'fresh_variables': fresh_variables
+    }, numeric_threshold
+
+
+def decode_split(code, numeric_threshold, relations: Dict[str, Relation]):
+    comparators = {c.name: c for c in ALL_COMPARATORS}
+    encoded_threshold = code['threshold']
+    if encoded_threshold is None:
+        threshold = numeric_threshold
+    elif 'set' in encoded_threshold:
+        threshold = set(encoded_threshold['set'])
+    else:
+        threshold = encoded_threshold['value']
+    test = [(get_relation(relations, relation_name), var_names,
+             decode_aggregator(a)) for relation_name, var_names, a in code['test']]
+    split = BinarySplit(test, comparators[code['comparator']], threshold,
+                        code['ignore_critical_values'],
+                        code['is_variable_free'])
+    split.add_fresh_variables({
+        name: create_new_variable(name, value_type, value)
+        for name, value_type, value in code['fresh_variables']
+    })
+    return split
+
+
+def get_leaf_layout(leaves: List[NodeStatistics]):
+    """
+    The statistics of the leaves are stored as rows of numbers: the layout gives the class of
+    the statistics, the arguments of its constructor and [name, kind, length] for every field
+    from LEAF_FIELDS, where kind is one of int, float, class (the index of the predicted class),
+    list, int list, array, none.
+    """
+    if not leaves:
+        return None
+    first = leaves[0]
+    layout = {
+        'class': first.__class__.__name__,
+        'parameters': {
+            p: to_json_value(getattr(first, p))
+            for p in LEAF_PARAMETERS if hasattr(first, p)
+        },
+        'fields': []
+    }
+    for field in LEAF_FIELDS:
+        if not hasattr(first, field):
+            continue
+        kinds = {leaf_field_kind(getattr(stats, field)) for stats in leaves}
+        for integer_kind, kind in [("int", "float"), ("int list", "list")]:
+            # some integer, some not: all are stored as floats
+            if len({k for k, _ in kinds}) > 1 and all(
+                    k in [integer_kind, kind] for k, _ in kinds):
+                kinds = {(kind, length) for _, length in kinds}
+        if len(kinds) > 1:
+            raise ValueError(
+                "The leaves have different shapes of {}: {}".format(
+                    field, kinds))
+        kind, length = kinds.pop()
+        layout['fields'].append([field, kind, length])
+    return layout
+
+
+def leaf_field_kind(value):
+    if value is None:
+        return "none", 0
+    elif isinstance(value, str):
+        return "class", 1
+    elif isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return "int", 1
+    elif isinstance(value, (float, np.floating)):
+        return "float", 1
+    elif isinstance(value, np.ndarray):
+        return "array", len(value)
+    elif isinstance(value, list):
+        if all(isinstance(v, int) and not isinstance(v, bool) for v in value):
+            return "int list", len(value)
+        return "list", len(value)
+    raise ValueError("Cannot store the value {} of a leaf.".format(value))
+
+
+def to_json_value(value):
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    elif isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    return value
+
+
+def encode_leaf(stats: NodeStatistics, layout):
+    row = []
+    for field, kind, _ in layout['fields']:
+        value = getattr(stats, field)
+        if kind == "class":
+            row.append(stats.class_names.index(value))
+        elif kind in ["list", "int list", "array"]:
+            row.extend(float(v) for v in value)
+        elif kind != "none":
+            row.append(float(value))
+    return row
+
+
+def decode_leaf(row, layout):
+    statistics_class = getattr(data_and_statistics, layout['class'])
+    assert issubclass(statistics_class, NodeStatistics)
+    stats = statistics_class(**layout['parameters'])
+    position = 0
+    for field, kind, length in layout['fields']:
+        values = row[position:position + length]
+        position += length
+        if kind == "none":
+            value = None
+        elif kind == "class":
+            value = stats.class_names[int(values[0])]
+        elif kind == "int":
+            value = int(values[0]) if math.isfinite(values[0]) else values[0]
+        elif kind == "float":
+            value = values[0]
+        elif kind == "list":
+            value = values
+        elif kind == "int list":
+            value = [int(v) for v in values]
+        else:
+            value = np.array(values)
+        setattr(stats, field, value)
+    return stats
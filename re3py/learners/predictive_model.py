@@ -1,14 +1,41 @@
 from ..data.data_and_statistics import Datum
+from ..data.relation import Relation
+from ..utilities.profiling import ProfilingReport
+from typing import Dict, Iterable, List
+import io
 import pickle
 
 
 class PredictiveModel:
+    # not pickled (e.g., callbacks may be lambdas)
+    transient_attributes = ["progress_callback"]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self.transient_attributes:
+            if name in state:
+                state[name] = None
+        return state
+
     def fit(self, *args):
         raise NotImplementedError("This should be implemented by a subclass.")
 
     def predict(self, d: Datum):
         raise NotImplementedError("This should be implemented by a subclass.")
 
+    def predict_all(self, ds: List[Datum]):
+        return [self.predict(d) for d in ds]
+
+    def predict_chunks(self, chunks: Iterable[List[Datum]]):
+        """
+        Predicts the examples chunk by chunk, e.g., the chunks of a TargetStream, so that only
+        one chunk is held in memory.
+        :param chunks: iterable of lists of examples
+        :return: generator of pairs (chunk, list of predictions)
+        """
+        for chunk in chunks:
+            yield chunk, self.predict_all(chunk)
+
     def dump_to_text(self, file_name):
         raise NotImplementedError("This should be implemented by a subclass.")
 
@@ -24,3 +51,76 @@ class PredictiveModel:
 class TreeEnsemble(PredictiveModel):
     def compute_ranking(self, ranking_type):
         raise NotImplementedError("This should be implemented by a subclass.")
+
+    def get_trees(self):
+        raise NotImplementedError("This should be implemented by a subclass.")
+
+    def get_profiling_report(self):
+        """
+        :return: ProfilingReport that aggregates the records of all the fitted trees
+        """
+        return ProfilingReport([
+            tree.profile for tree in self.get_trees()
+            if tree.profile is not None
+        ])
+
+
+class _RelationSharingPickler(pickle.Pickler):
+    def __init__(self, file, relations: Dict[str, Relation]):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.relations = relations
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Relation) and self.relations.get(
+                obj.get_name()) is obj:
+            return obj.get_name()
+        return None
+
+
+class _RelationBindingPickler(_RelationSharingPickler):
+    def persistent_id(self, obj):
+        if isinstance(obj, Relation) and obj.get_name() in self.relations:
+            return obj.get_name()
+        return None
+
+
+class _RelationSharingUnpickler(pickle.Unpickler):
+    def __init__(self, file, relations: Dict[str, Relation]):
+        super().__init__(file)
+        self.relations = relations
+
+    def persistent_load(self, pid):
+        return self.relations[pid]
+
+
+def dumps_sharing_relations(obj, relations: Dict[str, Relation]):
+    """
+    Pickles the object, but stores only the names of the given relations, so that a (fitted) model can be
+    sent between processes that have the same descriptive data.
+    :param obj: the object, e.g., a DecisionTree
+    :param relations: {relation name: relation, ...}
+    :return: bytes
+    """
+    f = io.BytesIO()
+    _RelationSharingPickler(f, relations).dump(obj)
+    return f.getvalue()
+
+
+def loads_sharing_relations(data: bytes, relations: Dict[str, Relation]):
+    """
+    Inverse of dumps_sharing_relations: the names of the relations are replaced by the given relations.
+    """
+    return _RelationSharingUnpickler(io.BytesIO(data), relations).load()
+
+
+def bind_relations(obj, relations: Dict[str, Relation]):
+    """
+    Copies the object, where every relation is replaced by the given relation with the same name,
+    e.g., a loaded model by the model that uses the relations of a (new) dataset.
+    :param obj: the object, e.g., a DecisionTree
+    :param relations: {relation name: relation, ...}
+    :return: the copy
+    """
+    f = io.BytesIO()
+    _RelationBindingPickler(f, relations).dump(obj)
+    return loads_sharing_relations(f.getvalue(), relations)
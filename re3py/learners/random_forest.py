@@ -1,8 +1,14 @@
 from .tree import DecisionTree
 from ..data.data_and_statistics import *
 from .predictive_model import TreeEnsemble
-from ..ranking.ensemble_ranking import EnsembleRanking
+from ..utilities.progress import ProgressEvent, ProgressCallback
+from ..utilities.lazy_import import LazyModule
 from typing import List
+import logging
+import time
+
+ensemble_ranking = LazyModule("..ranking.ensemble_ranking", __package__)
+logger = logging.getLogger(__name__)
 
 
 class RandomForest(TreeEnsemble):
@@ -14,12 +20,14 @@ class RandomForest(TreeEnsemble):
                  nb_trees_to_build=100,
                  votes_aggregator=proportions_aggregator,
                  random_seed=314159,
+                 progress_callback: ProgressCallback = None,
                  **tree_parameters):
         self.trees = []  # type: List[DecisionTree]
         self.nb_trees = nb_trees_to_build
         self.votes_aggregator = votes_aggregator
         self.ensemble_random = EnsembleRandomGenerator(random_seed)
         self.tree_parameters = tree_parameters
+        self.progress_callback = progress_callback  # also passed to the trees
         self.sanity_check()
 
     def sanity_check(self):
@@ -31,17 +39,35 @@ class RandomForest(TreeEnsemble):
 
     def fit(self, data: Dataset):
         for t in range(self.nb_trees):
-            print("Building tree {}".format(t + 1))
+            t0 = time.time()
+            logger.info("Building tree %d", t + 1)
+            if self.progress_callback is not None:
+                self.progress_callback(
+                    ProgressEvent(ProgressEvent.iteration_started,
+                                  self,
+                                  iteration=t))
             self.tree_parameters[
                 'random_seed'] = self.ensemble_random.next_tree_seed()
-            self.trees.append(DecisionTree(**self.tree_parameters))
+            self.trees.append(
+                DecisionTree(progress_callback=self.progress_callback,
+                             **self.tree_parameters))
             tree_data = data.bootstrap_replicate(
                 self.ensemble_random.next_bootstrap_seed(),
                 per_class=self.trees[-1].per_class_bootstrap)
             self.trees[-1].fit(tree_data)
+            if self.progress_callback is not None:
+                self.progress_callback(
+                    ProgressEvent(ProgressEvent.iteration_finished,
+                                  self,
+                                  iteration=t,
+                                  time=time.time() - t0))
+
+    def get_trees(self):
+        return self.trees
 
     def compute_ranking(self, ranking_type):
-        feature_ranking = EnsembleRanking({}, {}, ranking_type, self.nb_trees)
+        feature_ranking = ensemble_ranking.EnsembleRanking(
+            {}, {}, ranking_type, self.nb_trees)
         for i, tree in enumerate(self.trees):
             attribute_scores, aggregate_scores = feature_ranking.compute_tree_contribution(
                 tree)
@@ -56,6 +82,42 @@ class RandomForest(TreeEnsemble):
         predictions_stats = []  # type: List[NodeStatistics]
         for tree in self.trees[:nb_trees]:
             predictions_stats.append(tree.predict(d, True))
+        return self.aggregate_predictions(predictions_stats)
+
+    def predict_training(self, data: Dataset, out_of_bag=False):
+        """
+        Predictions for the examples of the data that the forest was fitted on. The trees must be fitted with
+        store_leaf_membership=True: the in-bag examples of a tree are mapped to their leaves, and only the
+        out-of-bag examples are sent through the tree.
+        :param data: the training data
+        :param out_of_bag: if True, each example is predicted only by the trees that were not fitted on it
+        :return: list of predictions, None for the examples that are in-bag for all the trees
+        """
+        target_data = data.get_target_data()
+        positions = {d.identifier: i for i, d in enumerate(target_data)}
+        predictions_stats = [[] for _ in target_data
+                             ]  # type: List[List[NodeStatistics]]
+        for tree in self.trees:
+            identifiers = tree.get_training_identifiers()
+            if identifiers is None:
+                raise ValueError("Training predictions need trees that were "
+                                 "fitted with store_leaf_membership=True.")
+            in_bag = [False] * len(target_data)
+            for identifier, stats in zip(identifiers,
+                                         tree.predict_training(True)):
+                i = positions[identifier]
+                in_bag[i] = True
+                if not out_of_bag:
+                    predictions_stats[i].append(stats)
+            for i, datum in enumerate(target_data):
+                if not in_bag[i]:
+                    predictions_stats[i].append(tree.predict(datum, True))
+        return [
+            self.aggregate_predictions(stats) if stats else None
+            for stats in predictions_stats
+        ]
+
+    def aggregate_predictions(self, predictions_stats: List[NodeStatistics]):
         statistics_class = predictions_stats[0].__class__
         ensemble_stats = statistics_class.construct_from_parent(
             predictions_stats[0])
@@ -6,20 +6,28 @@ from .core.heuristic import Heuristic
 from ..data.data_and_statistics import *
 from ..data.task_settings import Settings
 from .core.variables import *
-from ..data.relation import Relation
+from ..data.relation import Relation, select_most_frequent
 from ..utilities.my_exceptions import WrongValueException
 from ..utilities.my_utils import *
+from ..utilities.profiling import TreeProfile, ProfilingReport, snapshot_counters, counters_since
+from ..utilities.progress import ProgressEvent, ProgressCallback
+import heapq
 import itertools
 import random
 from .predictive_model import PredictiveModel
 import time
 import math
 import copy
+import logging
 from .core.tree_node_split import TEST_VALUE_MEMO
-# from my_memo import used_comp_memo
-import subprocess
-from .core.communicate_with_java import send_data, send_variables, compute_test_values
-from py4j.java_gateway import JavaGateway, GatewayParameters
+from ..utilities.lazy_import import LazyModule
+
+np = LazyModule("numpy")
+# the Java bridge is only needed when the test values are computed in java
+java_bridge = LazyModule(".core.communicate_with_java", __package__)
+java_gateway = LazyModule("py4j.java_gateway")
+
+logger = logging.getLogger(__name__)
 
 
 class TreeNode:
@@ -35,6 +43,7 @@ class TreeNode:
         self.split = binary_split  # type: BinarySplit
         self.stats = stats  # type: NodeStatistics
         self.depth = depth
+        self.leaf_id = None  # type: Union[int, None]
 
     def get_parent(self) -> 'TreeNode':
         return self.parent
@@ -84,11 +93,28 @@ class DecisionTree(PredictiveModel):
     left_child_indicator = "0"
     right_child_indicator = "1"
     root_indicator = "root"
+    print_times_after_fit = False
+    # reuse the enumerated candidates of the nodes with the same variable signature, see generate_chains
+    use_candidate_templates = True
+    # do not generate the chains that cannot be linked, see generate_possible_attributes_helper_all_steps
+    prune_unlinked_chains = True
 
     square_root = "sqrt"
     log2 = "log"
     allowed_n_tests = [square_root, log2]
 
+    constants_frequent = "frequent"
+    constants_quantiles = "quantiles"
+    constants_examples = "examples"
+    allowed_constant_selections = [
+        constants_frequent, constants_quantiles, constants_examples
+    ]
+
+    growth_depth_first = "depth"
+    growth_level_wise = "level"
+    growth_best_first = "best"
+    allowed_growths = [growth_depth_first, growth_level_wise, growth_best_first]
+
     def __init__(
             self,
             heuristic=None,
@@ -110,7 +136,19 @@ class DecisionTree(PredictiveModel):
             class_weights: Union[None, Dict[str, float]] = None,
             per_class_bootstrap=False,
             only_existential=False,
-            minimal_impurity=10**-16):
+            minimal_impurity=10**-16,
+            fast_aggregators=True,
+            order_chains_by_cost=False,
+            max_chain_cost=float("inf"),
+            constant_selection=constants_frequent,
+            max_number_constants=float("inf"),
+            store_leaf_membership=False,
+            progress_callback: ProgressCallback = None,
+            growth=growth_depth_first,
+            approximate_split_search=False,
+            approximate_split_tolerance=0.05,
+            approximate_split_confidence=0.95,
+            approximate_split_top_k=10):
         self.heuristic = Heuristic() if heuristic is None else heuristic
         self.target_data_stat = statistics
         self.max_number_internal_nodes = max_number_internal_nodes
@@ -132,6 +170,25 @@ class DecisionTree(PredictiveModel):
         self.only_existential = only_existential
         self.update_allowed_aggregates()
         self.minimal_impurity = minimal_impurity  # relative
+        self.fast_aggregators = fast_aggregators
+        self.order_chains_by_cost = order_chains_by_cost
+        self.max_chain_cost = max_chain_cost
+        self.chain_cost_sanity_check()
+        self.constant_selection = constant_selection
+        self.max_number_constants = max_number_constants
+        self.constant_selection_sanity_check()
+        self.store_leaf_membership = store_leaf_membership
+        self.progress_callback = progress_callback  # receives ProgressEvents
+        self.growth = growth
+        if self.growth not in DecisionTree.allowed_growths:
+            raise ValueError("Wrong growth: {}. Allowed: {}".format(
+                self.growth, DecisionTree.allowed_growths))
+        # candidates of large nodes are first scored on a sample, see choose_split_search_sample
+        self.approximate_split_search = approximate_split_search
+        self.approximate_split_tolerance = approximate_split_tolerance
+        self.approximate_split_confidence = approximate_split_confidence
+        self.approximate_split_top_k = approximate_split_top_k
+        self.approximate_split_sanity_check()
 
         self.root_node = root_node  # type: Union['TreeNode', None]
         self.target_relation_description = None
@@ -142,6 +199,14 @@ class DecisionTree(PredictiveModel):
         self.temp_var_count = 0
         self.current_number_internal_nodes = 0
         self.all_variables = {}
+        # leaf membership of the training examples, see store_leaf_membership: one leaf id
+        # and one identifier per training example, kept after fit (and pickled with the tree),
+        # since RandomForest.predict_training needs them
+        self.leaves = []  # type: List[TreeNode]
+        self.training_leaf_ids = None  # type: Union[np.ndarray, None]
+        self.training_identifiers = None  # type: Union[List, None]
+        self.constant_values = {}  # (relation name, position): values, for the current node
+        self.node_example_values = {}  # type: Dict[str, Set]
         self.induce_tree_time = 0.0
         self.statistics_time = 0.0
         self.get_test_value_time = 0.0
@@ -152,29 +217,42 @@ class DecisionTree(PredictiveModel):
         self.nominal_tests_time = 0
         self.numeric_tests = 0
         self.numeric_tests_time = 0
+        self.profile = None  # type: Union[TreeProfile, None]
+        # signature: chains of atom tests or aggregator chains, see generate_chains
+        self.candidate_templates = {}
+        self.atom_test_links = None  # type: Union[None, Dict[str, Set]]
+        self.temp_var_name_counts = {}  # see count_temp_var_names
 
         self.p = None
         self.wrapper = None
         self.client = None
         self.gateway = None
 
+    def get_times(self):
+        return {
+            "induce": self.induce_tree_time,
+            "statistics": self.statistics_time,
+            "test value": self.get_test_value_time,
+            "eval split": self.split_eval_time,
+            "example values": self.set_example_values_time,
+            "find values": self.find_values_time,
+            "nominal tests": self.nominal_tests,
+            "nom. t. time": self.nominal_tests_time,
+            "numeric tests": self.numeric_tests,
+            "num t. time": self.numeric_tests_time
+        }
+
     def print_times(self):
-        times = [
-            self.induce_tree_time, self.statistics_time,
-            self.get_test_value_time, self.split_eval_time,
-            self.set_example_values_time, self.find_values_time,
-            self.nominal_tests, self.nominal_tests_time, self.numeric_tests,
-            self.numeric_tests_time
-        ]
-        names = [
-            "induce", "statistics", "test value", "eval split",
-            "example values", "find values", "nominal tests", "nom. t. time",
-            "numeric tests", "num t. time"
-        ]
-        for time, name in zip(times, names):
+        for name, time in self.get_times().items():
             print("{: <14}:".format(name), time)
         print()
 
+    def get_profiling_report(self):
+        """
+        :return: ProfilingReport with a record for every node of the tree, see fit
+        """
+        return ProfilingReport([self.profile])
+
     def __str__(self):
         def helper(node: TreeNode):
             branches_names = ["YES", "NO"]
@@ -248,29 +326,145 @@ class DecisionTree(PredictiveModel):
             raise ValueError(
                 "Relative number of tests should be string or float.")
 
+    def chain_cost_sanity_check(self):
+        if isinstance(self.max_chain_cost, bool) or not isinstance(
+                self.max_chain_cost, (int, float)):
+            raise ValueError(
+                "Wrong maximal chain cost: {}. It should be a number.".format(
+                    self.max_chain_cost))
+        if self.max_chain_cost <= 0:
+            raise ValueError("Maximal chain cost should be positive.")
+
+    def constant_selection_sanity_check(self):
+        if self.constant_selection not in DecisionTree.allowed_constant_selections:
+            message = "Wrong constant selection: {}. Allowed: {}"
+            raise ValueError(
+                message.format(self.constant_selection,
+                               DecisionTree.allowed_constant_selections))
+        if self.max_number_constants < 1:
+            raise ValueError("Maximal number of constants should be positive.")
+
+    def approximate_split_sanity_check(self):
+        if not self.approximate_split_search:
+            return
+        if self.java_port is not None:
+            raise WrongValueException(
+                "Approximate split search is not supported when using java.")
+        if not 0.0 < self.approximate_split_confidence < 1.0:
+            raise ValueError(
+                "Confidence of the approximate split search should be in (0, 1)."
+            )
+        if self.approximate_split_tolerance <= 0.0:
+            raise ValueError(
+                "Tolerance of the approximate split search should be positive.")
+        if self.approximate_split_top_k < 1:
+            raise ValueError(
+                "At least one candidate should be re-evaluated on all examples.")
+
+    def get_split_search_sample_size(self):
+        """
+        Hoeffding bound: for a score with values in [0, 1] (as the heuristic scores relative to the
+        variability of the node), the mean of n = ln(2 / delta) / (2 tolerance^2) examples is closer than
+        the tolerance to the true mean with probability 1 - delta, where delta = 1 - confidence.
+        """
+        delta = 1.0 - self.approximate_split_confidence
+        return int(
+            math.ceil(
+                math.log(2.0 / delta) /
+                (2.0 * self.approximate_split_tolerance**2)))
+
+    def choose_split_search_sample(self, current_node: TreeNode,
+                                   target_data: List[Datum]):
+        """
+        If approximate_split_search and the node has more than twice as many examples as the
+        sample size (see get_split_search_sample_size), the candidates of the node are scored on a random
+        sample of its examples, and only approximate_split_top_k best of them on all the examples.
+
+        :return: None (all examples are used) or (sample, a node with the statistics of the sample)
+        """
+        if not self.approximate_split_search:
+            return None
+        sample_size = self.get_split_search_sample_size()
+        if 2 * sample_size >= len(target_data):
+            return None
+        r = random.Random("{} {}".format(self.random_seed,
+                                         current_node.description))
+        indices = sorted(r.sample(range(len(target_data)), sample_size))
+        sample = [target_data[i] for i in indices]
+        sample_node = TreeNode(current_node.description,
+                               current_node.get_parent(), [], None, None,
+                               current_node.get_depth())
+        self.initialize_statistics(sample_node, sample)
+        return sample, sample_node
+
+    def evaluate_on_all_examples(self, candidate, current_node: TreeNode,
+                                 target_data: List[Datum],
+                                 target_relation_vars, variables_per_type):
+        """
+        Evaluates a candidate that was chosen on a sample (see find_best_splits) on all examples of the node.
+        :return: (score, best configuration of the candidate)
+        """
+        example, rc_modified, c_var_names, c_vs, agg_chain, output_type, nb_fresh_vars, fresh_indices, \
+            starting_index = candidate
+        bs = BinarySplit([], None, None, True, None)
+        for c_name, c_v in zip(c_var_names, c_vs):
+            example[c_name].set_value(c_v)
+        for init_var_name in target_relation_vars:
+            example[init_var_name].unset_value()
+        r_key, a_keys, known_unknown = DecisionTree.test_values_memo_keys(
+            example, rc_modified, [agg_chain])
+        t0 = time.time()
+        test_values = []
+        for datum in target_data:
+            for init_var_name, train_value in zip(target_relation_vars,
+                                                  datum.get_descriptive()):
+                example[init_var_name].set_value(train_value)
+            test_values.append(
+                bs.get_test_values(example, rc_modified, [agg_chain], r_key,
+                                   a_keys, datum.identifier, nb_fresh_vars,
+                                   fresh_indices, known_unknown))
+        t1 = time.time()
+        self.get_test_value_time += t1 - t0
+        for name in list(c_var_names) + list(target_relation_vars):
+            example[name].unset_value()
+        score, configuration = self.evaluate_candidate_splits(
+            current_node, test_values, target_data, variables_per_type,
+            [output_type])
+        self.split_eval_time += time.time() - t1
+        if configuration is None:
+            return score, None
+        _, comparator, theta, partition, is_variable_free = configuration
+        return score, (rc_modified, agg_chain, c_vs, c_var_names, comparator,
+                       theta, partition, is_variable_free, starting_index)
+
     def chosen_tests(self, tests_generator, current_vars_per_type):
+        nb_tests, nb_chains = self.count_tests(tests_generator,
+                                               current_vars_per_type)
+        return self.sample_tests(nb_tests), nb_tests, nb_chains
+
+    def count_tests(self, tests_generator, current_vars_per_type):
         nb_tests = 0
         nb_chains = 0
-        for jj, chain in enumerate(tests_generator):
-            # if jj % 10**2 == 0:
-            #     print("-", end="")
-            # if jj % 10**4 == 0:
-            #     print()
+        for chain in tests_generator:
             nb_chains += 1
             _, relation_chain, aggregator_chains, _ = chain
-            # print(relation_chain)
             num_aggregator_chains = len(list(aggregator_chains))
             _, _, _, _, c_num = self.create_example_and_chains(
                 relation_chain, current_vars_per_type)
             nb_tests += num_aggregator_chains * c_num
-        # print()
+        return nb_tests, nb_chains
+
+    def sample_tests(self, nb_tests):
+        """
+        :return: the indices of the tests (out of nb_tests) that are evaluated in a node
+        """
         k_proportion = self.get_absolute_number_tests_from_relative(nb_tests)
         k_absolute = self.max_number_of_evaluated_tests_per_node
         k = min(k_proportion,
                 k_absolute)  # Select the more restrictive criterion
         k = max(k, 1)  # but at least one
         k = min(k, nb_tests)  # but at most all tests
-        return set(random.sample(range(nb_tests), k=k)), nb_tests, nb_chains
+        return set(random.sample(range(nb_tests), k=k))
 
     def generate_next_var_name(self, first_letter):
         key = None
@@ -320,6 +514,11 @@ class DecisionTree(PredictiveModel):
 
     def fit(self, data: Dataset):
         t0 = time.time()
+        if self.progress_callback is not None:
+            self.progress_callback(
+                ProgressEvent(ProgressEvent.tree_started,
+                              self,
+                              nb_examples=len(data.get_target_data())))
         random.seed(self.random_seed)
         self.target_data_stat = data.get_copy_statistics()
         target_relation = data.get_target_relation()  # no examples - ok?
@@ -328,20 +527,8 @@ class DecisionTree(PredictiveModel):
         target_data = data.get_target_data()  # type: List[Datum]
         if BinarySplit.use_memo:
             DecisionTree.populate_dict(target_data)
-        current_vars_per_type = [{}]  # type: List[Dict[str, Set[Variable]]]
-        target_var_names = []
-        self.target_relation_variables = []  # type: List[Variable]
-        for object_type in target_relation.get_types()[:-1]:
-            var_name = self.generate_next_var_name(
-                DecisionTree.get_first_var_letter(object_type, True))
-            assert not var_name.startswith("C")
-            new_var = VariableVariable(var_name, object_type, None)
-            if object_type not in current_vars_per_type[-1]:
-                current_vars_per_type[-1][object_type] = set()
-            current_vars_per_type[-1][object_type].add(new_var)
-            self.target_relation_variables.append(new_var)
-            target_var_names.append(new_var.get_name())
-
+        current_vars_per_type, target_var_names = self.create_target_variables(
+            target_relation)
         self.target_relation_description = "{}, {}".format(
             target_relation.get_name(), target_var_names)
         all_variable_names = set(target_var_names)
@@ -354,14 +541,27 @@ class DecisionTree(PredictiveModel):
             self.java_on()
 
         if self.java_port is not None:
-            send_data(data, self.client, self.wrapper)
-
+            java_bridge.send_data(data, self.client, self.wrapper)
+
+        self.profile = TreeProfile()
+        self.candidate_templates = {}
+        self.atom_test_links = None
+        self.temp_var_name_counts = {}
+        self.get_atom_test_links()
+        self.leaves = []
+        if self.store_leaf_membership:
+            self.training_leaf_ids = np.zeros(len(target_data), dtype=int)
+            self.training_identifiers = [d.identifier for d in target_data]
         # manipulate target data
         self.target_data_induction_preparation(target_data)
-        self.build_helper(target_data, self.root_node, current_vars_per_type,
-                          target_var_names, all_variable_names)
+        self.grow(target_data, current_vars_per_type, target_var_names,
+                  all_variable_names)
         # un-manipulate target data
         self.reverse_target_data_induction_preparation(target_data)
+        # the candidates are only needed during fit (and would be pickled with the tree)
+        self.candidate_templates = {}
+        self.atom_test_links = None
+        self.temp_var_name_counts = {}
 
         for v in self.target_relation_variables:
             assert v.can_vary()
@@ -370,19 +570,44 @@ class DecisionTree(PredictiveModel):
             self.all_variables[v.get_name()] = v
         t1 = time.time()
         self.induce_tree_time = t1 - t0
-        self.print_times()
-        # s = max(1, sum(used_comp_memo))
-        # print("Memo vs. compute: {:.4f} : {:.4f}; all: {}".format(used_comp_memo[0] / s,
-        #                                                           used_comp_memo[1] / s,
-        #                                                           s))
-        # used_comp_memo[0] = 0
-        # used_comp_memo[1] = 0
+        self.profile.set_totals(self.get_times())
+        if DecisionTree.print_times_after_fit:
+            self.print_times()
+        if self.progress_callback is not None:
+            nb_leaves = sum(node['is_leaf'] for node in self.profile.nodes)
+            self.progress_callback(
+                ProgressEvent(ProgressEvent.tree_finished,
+                              self,
+                              nb_nodes=len(self.profile.nodes),
+                              nb_leaves=nb_leaves,
+                              time=self.induce_tree_time))
 
         if self.java_port is not None:
             self.java_off()
 
+    def create_target_variables(self, target_relation: Relation):
+        """
+        Creates the variables of the target relation (all but the last position, which is the target).
+        :return: (current_vars_per_type, target_var_names) where current_vars_per_type = [{type: {var, ...}}]
+        """
+        current_vars_per_type = [{}]  # type: List[Dict[str, Set[Variable]]]
+        target_var_names = []
+        self.target_relation_variables = []  # type: List[Variable]
+        for object_type in target_relation.get_types()[:-1]:
+            var_name = self.generate_next_var_name(
+                DecisionTree.get_first_var_letter(object_type, True))
+            assert not var_name.startswith("C")
+            new_var = VariableVariable(var_name, object_type, None)
+            if object_type not in current_vars_per_type[-1]:
+                current_vars_per_type[-1][object_type] = set()
+            current_vars_per_type[-1][object_type].add(new_var)
+            self.target_relation_variables.append(new_var)
+            target_var_names.append(new_var.get_name())
+        return current_vars_per_type, target_var_names
+
     def java_on(self):
         if not self.is_outer_java:
+            import subprocess
             # open server
             this_dir = os.path.dirname(os.path.abspath(__file__))
             path = os.path.join(this_dir, "core", "speedUp.jar")
@@ -393,8 +618,9 @@ class DecisionTree(PredictiveModel):
                                       shell=True)
             for counter in range(10**8):
                 _ = 21 + 21
-        gateway_parameters = GatewayParameters(port=self.java_port)
-        self.gateway = JavaGateway(gateway_parameters=gateway_parameters)
+        gateway_parameters = java_gateway.GatewayParameters(port=self.java_port)
+        self.gateway = java_gateway.JavaGateway(
+            gateway_parameters=gateway_parameters)
         self.wrapper = self.gateway.entry_point.get_wrapper()
         self.client = self.gateway._gateway_client
 
@@ -410,76 +636,218 @@ class DecisionTree(PredictiveModel):
     def update_allowed_aggregates(self):
         if self.only_existential:
             self.allowed_aggregators = {COUNT.get_name()}
-            print(
-                "Existential tests only ==> The allowed aggregates changed to {}"
-                .format(self.allowed_aggregators))
+            logger.info(
+                "Existential tests only ==> The allowed aggregates changed to %s",
+                self.allowed_aggregators)
+
+    def grow(self, target_data: List[Datum], current_vars_per_type,
+             target_relation_vars, all_variable_names: Set[str]):
+        """
+        Grows the tree from the root node. The nodes that are still to be built are kept in a list
+        (so that the depth of the tree is not limited by the recursion limit) and are built according
+        to growth:
+
+        - depth first: in the pre-order (a node, its positive subtree, its negative subtree),
+        - level wise: all nodes of the same depth together. The nodes that share their candidate tests
+          (the same variables and the same test of the ancestor) are evaluated in batches, so that every
+          candidate is computed once for all their examples (see find_best_splits and batches_of_level).
+        - best first: the best split of every node is found when the node is created, and the node
+          whose split reduces the impurity the most (see split_gain) is split next. Thus, the budget
+          max_number_internal_nodes is spent on the best splits, rather than on the first ones.
+        """
+        root_task = (target_data, self.root_node, current_vars_per_type,
+                     target_relation_vars, all_variable_names,
+                     list(range(len(target_data))))
+        if self.growth == DecisionTree.growth_depth_first:
+            tasks = [root_task]
+            while tasks:
+                tasks += self.build_helper(*tasks.pop())[::-1]
+        elif self.growth == DecisionTree.growth_best_first:
+            frontier = []  # heap of (- gain, order of creation, task, split)
+            order = itertools.count()  # ties: the older node first
+            tasks = [root_task]
+            while tasks or frontier:
+                for task in tasks:
+                    split = self.find_best_splits([task],
+                                                  target_relation_vars)[0]
+                    heapq.heappush(frontier, (-self.split_gain(task, split),
+                                              next(order), task, split))
+                _, _, task, split = heapq.heappop(frontier)
+                tasks = self.create_node(task, split)
+        else:
+            level = [root_task]
+            while level:
+                splits = {}
+                for batch in self.batches_of_level(level):
+                    for task, split in zip(
+                            batch,
+                            self.find_best_splits(batch,
+                                                  target_relation_vars)):
+                        splits[task[1].description] = split
+                next_level = []
+                for task in level:
+                    next_level += self.create_node(task,
+                                                   splits[task[1].description])
+                level = next_level
+
+    @staticmethod
+    def split_gain(task, split):
+        """
+        :return: the reduction of the (weighted) impurity of the node's examples if the node is split,
+          or -inf if no split was found
+        """
+        target_data, current_node = task[:2]
+        best_score = split[0]
+        if not BinarySplit.is_better_than_previous(
+                best_score, BinarySplit.worst_split_score):
+            return -float("inf")
+        return target_data_weight(target_data) * (
+            current_node.get_stats().variability - best_score)
+
+    def batches_of_level(self, level):
+        """
+        Groups the nodes of a level into batches of the nodes with the same candidate tests.
+        The test values do not depend on the node otherwise, unless the constants are chosen from the
+        node's examples. The nodes are not batched if the test values are computed in java.
+        """
+        if self.java_port is not None or self.constant_selection == DecisionTree.constants_examples:
+            return [[task] for task in level]
+        batches = {}
+        for task in level:
+            current_node, current_vars_per_type = task[1], task[2]
+            variables = tuple(
+                tuple(
+                    sorted((t, tuple(sorted(v.get_name() for v in vs)))
+                           for t, vs in d.items()))
+                for d in current_vars_per_type)
+            key = (variables, id(DecisionTree.get_parents_test(current_node)))
+            if key not in batches:
+                batches[key] = []
+            batches[key].append(task)
+        return list(batches.values())
+
+    @staticmethod
+    def get_parents_test(current_node: TreeNode):
+        """
+        :return: the test of the closest ancestor whose positive branch contains the node ([] if none),
+          whose chain of atom tests can be extended in the node
+        """
+        node = current_node
+        while node.parent is not None:
+            if node == node.get_parent().children[0]:
+                return node.get_parent().get_split().get_test()
+            node = node.get_parent()
+        return []
 
     def build_helper(self, target_data: List[Datum], current_node: TreeNode,
                      current_vars_per_type, target_relation_vars,
-                     all_variable_names: Set[str]):
-        # print("Current vars before inducing", current_node.description)
-        # print("cur_ver_per_type, all_names", current_vars_per_type, all_variable_names)
-        print("{}Building node on depth {}".format(
-            "  " * current_node.get_depth(), current_node.get_depth()))
+                     all_variable_names: Set[str], example_indices: List[int]):
+        """
+        Finds the split of the node and creates the node (see create_node).
+        :return: the arguments of build_helper for the children of the node
+        """
+        task = (target_data, current_node, current_vars_per_type,
+                target_relation_vars, all_variable_names, example_indices)
+        split = self.find_best_splits([task], target_relation_vars)[0]
+        return self.create_node(task, split)
+
+    def find_best_splits(self, tasks, target_relation_vars):
+        """
+        Finds the best splits of the nodes that share the candidate tests, see batches_of_level.
+        Every candidate is computed for the examples of all nodes at once, and then evaluated for each node.
+        In the profile, the shared work (enumeration, test values and counters) is recorded on the first node.
+
+        :param tasks: the arguments of build_helper for the nodes
+        :return: [(best score, best configuration, node record), ...], one for each node
+        """
+        node_start = time.time()
+        test_value_start = self.get_test_value_time
+        counters = snapshot_counters()
+        current_vars_per_type = tasks[0][2]
+        for task in tasks:
+            logger.debug("%sBuilding node on depth %d",
+                         "  " * task[1].get_depth(), task[1].get_depth())
         current_var_names = [{
             t: {v.get_name()
                 for v in vs}
             for t, vs in d.items()
         } for d in current_vars_per_type]
-        # print("curr var names", current_var_names)
+        searched = [
+            j for j, task in enumerate(tasks)
+            if self.should_try_find_a_split(task[1], task[0])
+        ]
+        self.prepare_constant_values(
+            [datum for j in searched for datum in tasks[j][0]])
         # find a split
         bs = BinarySplit([], None, None, True, None)
-        best_score = BinarySplit.worst_split_score
-        best_configuration = (None, None, None, None, None, None)
-        if self.should_try_find_a_split(current_node, target_data):
-            parents_test = []
-            node = current_node
-            while node.parent is not None:
-                if node == node.get_parent().children[0]:
-                    parents_test = node.get_parent().get_split().get_test()
-                    break
-                node = node.get_parent()
-            attributes_counting = self.generate_possible_attributes(
-                copy.deepcopy(current_var_names), parents_test,
-                target_relation_vars)
+        best_scores = [BinarySplit.worst_split_score for _ in tasks]
+        best_configurations = [(None, None, None, None, None, None)
+                               for _ in tasks]
+        split_eval_times = [0.0 for _ in tasks]
+        if searched:
+            parents_test = DecisionTree.get_parents_test(tasks[0][1])
+            attributes_counting = self.prune_and_order_chains(
+                self.generate_possible_attributes(
+                    copy.deepcopy(current_var_names), parents_test,
+                    target_relation_vars), False)
             self.reset_temp_var_count()
-            attributes = self.generate_possible_attributes(
-                current_var_names, parents_test, target_relation_vars)
-
+            attributes = self.prune_and_order_chains(
+                self.generate_possible_attributes(current_var_names,
+                                                  parents_test,
+                                                  target_relation_vars), True)
         else:
             attributes_counting = iter([])
             attributes = iter([])
-        chosen_attributes, all_attributes_computed, all_chains_computed = self.chosen_tests(
+        all_attributes_computed, all_chains_computed = self.count_tests(
             attributes_counting, current_vars_per_type)
-        # print("{}Attributes generated: {}".format("  " * current_node.get_depth(), all_attributes_computed))
+        chosen_attributes = [set() for _ in tasks]
+        for j in searched:
+            chosen_attributes[j] = self.sample_tests(all_attributes_computed)
+        # the examples of the nodes (or their samples) are concatenated
+        samples = [
+            self.choose_split_search_sample(tasks[j][1], tasks[j][0])
+            for j in searched
+        ]
+        # for the sampled nodes: heaps of (- score, - order, candidate) of the best candidates
+        best_candidates = [[] for _ in searched]
+        candidate_order = itertools.count()
+        batch_data = []
+        node_bounds = []
+        for k, j in enumerate(searched):
+            node_data = tasks[j][0] if samples[k] is None else samples[k][0]
+            node_bounds.append((len(batch_data),
+                                len(batch_data) + len(node_data)))
+            batch_data += node_data
         all_attributes_counted = 0
         all_chains_counted = 0
         for chain in attributes:
             all_chains_counted += 1
-            # print(".", end="")
-            # if all_chains_counted % 100 == 0:
-            #     print("{}".format("  " * current_node.get_depth()), end="")
             starting_index, relation_chain, aggregator_chains, fresh_vars = chain
-            # print("{}relation chain: {}".format("  " * current_node.get_depth(), relation_chain))
             nb_fresh_vars = len(fresh_vars[0])
             fresh_indices = fresh_vars[1]
-            # print(relation_chain)
             example, rc_modified, c_values, c_var_names, c_num = self.create_example_and_chains(
                 relation_chain, current_vars_per_type)
             a_ch = list(aggregator_chains)
-            # print(a_ch)
             known_unknown = None
             temp_counter = 0
             for c_vs in c_values:
-                filtered_agg_chains = []
-                filtered_output_types = []
-                for i, agg_chain in enumerate(a_ch):
-                    if all_attributes_counted in chosen_attributes:
-                        filtered_agg_chains.append(agg_chain[0])
-                        filtered_output_types.append(agg_chain[1])
+                # the aggregator chains that are evaluated in some node, and their indices for each node
+                filtered_indices = []
+                node_columns = [[] for _ in searched]
+                for i in range(len(a_ch)):
+                    is_chosen = False
+                    for k, j in enumerate(searched):
+                        if all_attributes_counted in chosen_attributes[j]:
+                            node_columns[k].append(len(filtered_indices))
+                            is_chosen = True
+                    if is_chosen:
+                        filtered_indices.append(i)
                     all_attributes_counted += 1
                     temp_counter += 1
-                # print("   csv -->", c_vs)
+                filtered_agg_chains = [a_ch[i][0] for i in filtered_indices]
+                filtered_output_types = [
+                    a_ch[i][1] for i in filtered_indices
+                ]
                 for c_name, c_v in zip(c_var_names, c_vs):
                     example[c_name].set_value(c_v)
                 if BinarySplit.use_memo or known_unknown is None:
@@ -494,15 +862,19 @@ class DecisionTree(PredictiveModel):
 
                 if self.java_port is not None:
                     # do stuff here
-                    send_variables(example, self.client, self.wrapper)
-                    all_test_values = compute_test_values(
-                        target_data, target_relation_vars, rc_modified,
+                    java_bridge.send_variables(example, self.client,
+                                               self.wrapper)
+                    all_test_values = java_bridge.compute_test_values(
+                        batch_data, target_relation_vars, rc_modified,
                         filtered_agg_chains, r_key, a_keys, nb_fresh_vars,
                         fresh_indices, known_unknown, self.client,
                         self.wrapper)
                 else:
+                    DecisionTree.prefetch_first_relation(
+                        example, rc_modified, known_unknown,
+                        target_relation_vars, batch_data)
                     all_test_values = []
-                    for jj, datum in enumerate(target_data):
+                    for datum in batch_data:
                         u0 = time.time()
                         for init_var_name, train_value in zip(
                                 target_relation_vars, datum.get_descriptive()):
@@ -518,33 +890,50 @@ class DecisionTree(PredictiveModel):
                                                known_unknown))
                         u1 = time.time()
                         self.find_values_time += u1 - u0
-                        # if jj % 10 == 0:
-                        #     print(".", end="")
-
-                # n_target_examples = len(target_data)
-                # assert n_target_examples == len(all_test_values1) == len(all_test_values2)
-                # for i, v1, v2 in zip(range(n_target_examples), all_test_values1, all_test_values2):
-                #     if v1 != v2:
-                #         print(i, v1, v2, target_data[i])
-                #         raise ValueError("... :)")
-                # print()
 
                 t1 = time.time()
                 self.get_test_value_time += t1 - t0
-                t0 = time.time()
-                score, configuration = self.evaluate_candidate_splits(
-                    current_node, all_test_values, target_data,
-                    current_vars_per_type[0], filtered_output_types)
-                t1 = time.time()
-                self.split_eval_time += t1 - t0
-                if BinarySplit.is_better_than_previous(score, best_score):
-                    best_score = score
-                    a_chain_ind, comparator, theta, partition, is_variable_free = configuration
-                    best_configuration = (rc_modified,
-                                          filtered_agg_chains[a_chain_ind],
-                                          c_vs, c_var_names, comparator, theta,
-                                          partition, is_variable_free,
-                                          starting_index)
+                for k, j in enumerate(searched):
+                    target_data, current_node = tasks[j][:2]
+                    start, end = node_bounds[k]
+                    columns = node_columns[k]
+                    test_values = all_test_values[start:end]
+                    if samples[k] is not None:
+                        t0 = time.time()
+                        self.score_on_sample(
+                            samples[k], test_values, columns,
+                            best_candidates[k], candidate_order,
+                            current_vars_per_type[0],
+                            (example, rc_modified, c_var_names, c_vs,
+                             filtered_agg_chains, filtered_output_types,
+                             nb_fresh_vars, fresh_indices, starting_index))
+                        t1 = time.time()
+                        self.split_eval_time += t1 - t0
+                        split_eval_times[j] += t1 - t0
+                        continue
+                    output_types = filtered_output_types
+                    if len(columns) < len(filtered_indices):
+                        test_values = [[values[c] for c in columns]
+                                       for values in test_values]
+                        output_types = [
+                            filtered_output_types[c] for c in columns
+                        ]
+                    t0 = time.time()
+                    score, configuration = self.evaluate_candidate_splits(
+                        current_node, test_values, target_data,
+                        current_vars_per_type[0], output_types)
+                    t1 = time.time()
+                    self.split_eval_time += t1 - t0
+                    split_eval_times[j] += t1 - t0
+                    if BinarySplit.is_better_than_previous(
+                            score, best_scores[j]):
+                        best_scores[j] = score
+                        a_chain_ind, comparator, theta, partition, is_variable_free = configuration
+                        best_configurations[j] = (
+                            rc_modified,
+                            filtered_agg_chains[columns[a_chain_ind]], c_vs,
+                            c_var_names, comparator, theta, partition,
+                            is_variable_free, starting_index)
             # unset constants
             for c_name in c_var_names:
                 example[c_name].unset_value()
@@ -553,10 +942,25 @@ class DecisionTree(PredictiveModel):
                 example[init_var_name].unset_value()
             # sanity check
             if temp_counter != c_num * len(a_ch):
-                print(temp_counter, c_num, len(a_ch))
-                print(example, rc_modified, c_values, c_var_names, c_num, a_ch)
-                print(relation_chain)
+                logger.error("%s %s %s", temp_counter, c_num, len(a_ch))
+                logger.error("%s %s %s %s %s %s", example, rc_modified,
+                             c_values, c_var_names, c_num, a_ch)
+                logger.error("%s", relation_chain)
                 raise WrongValueException("Wrong value of counted attributes!")
+        # re-evaluate the best candidates of the sampled nodes on all examples
+        for k, j in enumerate(searched):
+            target_data, current_node = tasks[j][:2]
+            t0 = time.time()
+            for _, _, candidate in sorted(best_candidates[k],
+                                          key=lambda c: -c[1]):
+                # in the order of enumeration
+                score, configuration = self.evaluate_on_all_examples(
+                    candidate, current_node, target_data,
+                    target_relation_vars, current_vars_per_type[0])
+                if BinarySplit.is_better_than_previous(score, best_scores[j]):
+                    best_scores[j] = score
+                    best_configurations[j] = configuration
+            split_eval_times[j] += time.time() - t0
         # sanity check
         if all_attributes_computed != all_attributes_counted or all_chains_computed != all_chains_counted:
             message = "\nPredicted number of attributes: {} Number of attributes counted: {}\n" \
@@ -564,9 +968,80 @@ class DecisionTree(PredictiveModel):
             raise WrongValueException(
                 message.format(all_attributes_computed, all_attributes_counted,
                                all_chains_computed, all_chains_counted))
+        shared_time = time.time() - node_start - sum(split_eval_times)
+        shared_counters = counters_since(counters)
+        results = []
+        for j, task in enumerate(tasks):
+            target_data, current_node = task[:2]
+            is_first = j == 0
+            node_record = {
+                'node': current_node.description,
+                'depth': current_node.get_depth(),
+                'is_leaf': None,  # see create_node
+                'nb_examples': len(target_data),
+                'nb_chains': all_chains_counted if j in searched else 0,
+                'nb_tests': all_attributes_counted if j in searched else 0,
+                'nb_evaluated_tests': len(chosen_attributes[j]),
+                'time':
+                split_eval_times[j] + (shared_time if is_first else 0.0),
+                'test_value_time':
+                (self.get_test_value_time -
+                 test_value_start) if is_first else 0.0,
+                'split_eval_time': split_eval_times[j]
+            }
+            node_record.update({
+                name: value if is_first else 0
+                for name, value in shared_counters.items()
+            })
+            results.append(
+                (best_scores[j], best_configurations[j], node_record))
+        return results
+
+    def score_on_sample(self, sample, test_values, columns, best_candidates,
+                        candidate_order, variables_per_type,
+                        chain_candidates):
+        """
+        Scores the aggregator chains (columns) of a chain of atom tests on the sample of a node,
+        and keeps the approximate_split_top_k best candidates in the heap best_candidates.
+        The candidates are numbered by candidate_order (an iterator), and the earlier ones win the ties.
+        """
+        sample_data, sample_node = sample
+        example, rc_modified, c_var_names, c_vs, filtered_agg_chains, filtered_output_types, nb_fresh_vars, \
+            fresh_indices, starting_index = chain_candidates
+        for c in columns:
+            score, _ = self.evaluate_candidate_splits(
+                sample_node, [[values[c]] for values in test_values],
+                sample_data, variables_per_type, [filtered_output_types[c]])
+            if not BinarySplit.is_better_than_previous(
+                    score, BinarySplit.worst_split_score):
+                continue
+            candidate = (example, rc_modified, c_var_names, c_vs,
+                         filtered_agg_chains[c], filtered_output_types[c],
+                         nb_fresh_vars, fresh_indices, starting_index)
+            heapq.heappush(best_candidates,
+                           (-score, -next(candidate_order), candidate))
+            if len(best_candidates) > self.approximate_split_top_k:
+                heapq.heappop(best_candidates)
+
+    def create_node(self, task, split):
+        """
+        Sets the found split of the node and creates its children, or makes the node a leaf
+        if no split was found (or the budget of internal nodes is used).
+
+        :param task: the arguments of build_helper for the node
+        :param split: (best score, best configuration, node record), see find_best_splits
+        :return: the arguments of build_helper for the children
+        """
+        target_data, current_node, current_vars_per_type, target_relation_vars, all_variable_names, example_indices = task
+        best_score, best_configuration, node_record = split
+        is_split_found = BinarySplit.is_better_than_previous(
+            best_score, BinarySplit.worst_split_score
+        ) and self.current_number_internal_nodes < self.max_number_internal_nodes
+        node_record['is_leaf'] = not is_split_found
+        self.profile.add_node(node_record)
+        children_tasks = []
         # create internal node or leaf
-        if BinarySplit.is_better_than_previous(best_score,
-                                               BinarySplit.worst_split_score):
+        if is_split_found:
             self.current_number_internal_nodes += 1
             r_chain, a_chain, c_vs, c_var_names, comparator, theta, partition, is_variable_free, starting_index = \
                 best_configuration
@@ -589,8 +1064,8 @@ class DecisionTree(PredictiveModel):
                     condition1 = var_name not in all_variable_names
                     condition2 = int(var_name[1:]) < 0
                     if condition1 != condition2:
-                        print(var_name, all_variable_names)
-                        print(r_chain)
+                        logger.error("%s %s", var_name, all_variable_names)
+                        logger.error("%s", r_chain)
                         exit(-12345)
                     if condition1:
                         assert i_relation + 1 >= starting_index
@@ -628,6 +1103,16 @@ class DecisionTree(PredictiveModel):
                              is_variable_free)
             bs.add_fresh_variables(fresh_variables)
             current_node.set_split(bs)
+            if self.progress_callback is not None:
+                self.progress_callback(
+                    ProgressEvent(ProgressEvent.node_split,
+                                  self,
+                                  node=current_node.description,
+                                  depth=current_node.get_depth(),
+                                  nb_examples=len(target_data),
+                                  test=str(bs),
+                                  score=best_score,
+                                  time=node_record['time']))
             # branch frequencies
             nb_examples = target_data_weight(target_data)
             branch_frequencies = [
@@ -649,15 +1134,29 @@ class DecisionTree(PredictiveModel):
                                  current_node.get_depth() + 1)
                 current_node.add_child(child)
                 target_data_child = [target_data[i] for i in part]
+                example_indices_child = [example_indices[i] for i in part]
                 self.initialize_statistics(child, target_data_child)
                 current_variables_child = current_variables_children[i]
                 all_variable_names_child = all_variable_names | fresh_variables_names if i == 0 else all_variable_names
-                self.build_helper(target_data_child, child,
-                                  current_variables_child,
-                                  target_relation_vars,
-                                  all_variable_names_child)
+                children_tasks.append(
+                    (target_data_child, child, current_variables_child,
+                     target_relation_vars, all_variable_names_child,
+                     example_indices_child))
         else:
             current_node.get_stats().create_predictions()
+            if self.progress_callback is not None:
+                self.progress_callback(
+                    ProgressEvent(ProgressEvent.leaf_created,
+                                  self,
+                                  node=current_node.description,
+                                  depth=current_node.get_depth(),
+                                  nb_examples=len(target_data),
+                                  time=node_record['time']))
+            if self.store_leaf_membership:
+                current_node.leaf_id = len(self.leaves)
+                self.leaves.append(current_node)
+                self.training_leaf_ids[example_indices] = current_node.leaf_id
+        return children_tasks
 
     def should_try_find_a_split(self, current_node: TreeNode,
                                 target_data: List[Datum]):
@@ -792,7 +1291,8 @@ class DecisionTree(PredictiveModel):
                 transpose_branches = DecisionTree.should_transpose_branches(
                     statistics)
                 if transpose_branches:
-                    # best_partition = best_partition[::-1]
+                    # the positive branch must hold the examples for which the test is true
+                    best_partition = best_partition[::-1]
                     best_comparator = DOES_NOT_CONTAIN
                 else:
                     best_comparator = CONTAINS
@@ -908,17 +1408,137 @@ class DecisionTree(PredictiveModel):
             var_names_up_to_here = union_of_two_dicts(
                 var_names_up_to_here, current_var_names[start_index - 1])
             test_chain = current_atom_tests_modified[:start_index - 1]
-            for new_tests_chain in self.generate_possible_attributes_helper_all_steps(
-                    1, var_names_up_to_here):
+            for new_tests_chain in self.generate_chains(var_names_up_to_here):
                 created_chain = test_chain + new_tests_chain
                 if is_relation_chain_valid(created_chain):
                     fresh_v, fresh_i = DecisionTree.fresh_in_last_relation(
                         created_chain, target_relation_vars)
-                    aggregator_chains = self.generate_possible_aggregator_chains(
+                    aggregator_chains = self.generate_aggregator_chains(
                         len(created_chain), fresh_v, fresh_i)
                     yield start_index, created_chain, aggregator_chains, (
                         set(fresh_v), fresh_i)
 
+    def generate_chains(self, var_counts_up_to_here: Dict[str, Set[str]]):
+        """
+        Yields the chains of atom tests that start from the given variables, as
+        generate_possible_attributes_helper_all_steps(1, var_counts_up_to_here) does.
+
+        The chains depend on the names of the variables only through their types, first letters and order.
+        Thus, if use_candidate_templates, the variables are renamed to a canonic form and the chains are
+        enumerated only once per canonic signature (and the counter of the temporary variables):
+        the nodes with the same signature only rename the stored template back.
+        """
+        if not DecisionTree.use_candidate_templates:
+            yield from self.generate_possible_attributes_helper_all_steps(
+                1, var_counts_up_to_here)
+            return
+        to_canonic = {}
+        signature = []
+        for var_type in sorted(var_counts_up_to_here):
+            names = sorted(var_counts_up_to_here[var_type])
+            for i, name in enumerate(names):
+                # same first letter and order (also w.r.t. the temporary names such as Y-1)
+                to_canonic[name] = "{}{:06d}_{}".format(name[0], i, var_type)
+            if names:
+                signature.append(
+                    (var_type, tuple(to_canonic[name] for name in names)))
+        key = (tuple(signature), self.temp_var_count)
+        if key not in self.candidate_templates:
+            canonic_counts = {t: set(names) for t, names in signature}
+            chains = list(
+                self.generate_possible_attributes_helper_all_steps(
+                    1, canonic_counts))
+            self.candidate_templates[key] = (chains, self.temp_var_count)
+        chains, self.temp_var_count = self.candidate_templates[key]
+        from_canonic = {c: name for name, c in to_canonic.items()}
+        for chain in chains:
+            yield [(relation_name,
+                    [(from_canonic.get(var_name, var_name), var_type)
+                     for var_name, var_type in var_names_types])
+                   for relation_name, var_names_types in chain]
+
+    def generate_aggregator_chains(self, tests_chain_len, last_fresh_variables,
+                                   last_fresh_indices):
+        """
+        Returns an iterator over the result of generate_possible_aggregator_chains, which depends
+        on the fresh variables only through their types and the positions of the repeated ones,
+        so that it is computed once per signature if use_candidate_templates.
+        """
+        if not DecisionTree.use_candidate_templates:
+            return self.generate_possible_aggregator_chains(
+                tests_chain_len, last_fresh_variables, last_fresh_indices)
+        first_occurrences = {}
+        fresh_signature = tuple(
+            (first_occurrences.setdefault(var_name_type, i), var_name_type[1])
+            for i, var_name_type in enumerate(last_fresh_variables))
+        key = (tests_chain_len, fresh_signature, tuple(last_fresh_indices))
+        if key not in self.candidate_templates:
+            self.candidate_templates[key] = list(
+                self.generate_possible_aggregator_chains(
+                    tests_chain_len, last_fresh_variables,
+                    last_fresh_indices))
+        return iter(self.candidate_templates[key])
+
+    def estimate_chain_cost(self, tests_chain):
+        """
+        Estimates the number of tuples that are visited when the chain is evaluated for a single example,
+        multiplied by the number of the combinations of the constant values.
+        The first relation is reached from the example, so its mean degree is used. The next ones are
+        reached through joins, which favour the keys with high degrees, so the size-biased degree is used.
+
+        :param tests_chain: [(rel1, var_name_types1), ...], var_name_types1 = [('Y2', 'Person'), ...]
+        :return: estimated cost
+        """
+        known_names = set()
+        fan_out = 1.0
+        cost = 0.0
+        nb_constant_values = 1
+        for i, (relation_name, var_names_types) in enumerate(tests_chain):
+            relation = self.descriptive_data[relation_name]
+            known_positions = []
+            for j, (var_name, _) in enumerate(var_names_types):
+                if var_name[0] in "XC" or var_name in known_names:
+                    known_positions.append(j)
+                if var_name[0] == "C":
+                    nb_constant_values *= len(
+                        self.get_constant_values(relation_name, j))
+            _, mean_degree, size_biased_degree = relation.get_degree_statistics(
+                known_positions)
+            fan_out *= mean_degree if i == 0 else size_biased_degree
+            cost += fan_out
+            known_names.update(var_name for var_name, _ in var_names_types)
+        return cost * nb_constant_values
+
+    def prune_and_order_chains(self, chains, log_skipped):
+        """
+        Skips the chains whose estimated cost exceeds max_chain_cost and, if order_chains_by_cost,
+        yields the others from the cheapest to the most expensive one (ties keep the original order).
+        Chains are passed through lazily if neither of the two options is used.
+        """
+        use_budget = self.max_chain_cost < float("inf")
+        if not (use_budget or self.order_chains_by_cost):
+            yield from chains
+            return
+        kept = []
+        nb_skipped = 0
+        for chain in chains:
+            cost = self.estimate_chain_cost(chain[1])
+            if cost > self.max_chain_cost:
+                nb_skipped += 1
+                if log_skipped:
+                    logger.debug("Skipped chain %s: estimated cost %.1f",
+                                 chain[1], cost)
+            else:
+                kept.append((cost, chain))
+        if log_skipped and nb_skipped:
+            logger.info(
+                "Skipped %d of %d chains with estimated cost above %s",
+                nb_skipped, nb_skipped + len(kept), self.max_chain_cost)
+        if self.order_chains_by_cost:
+            kept.sort(key=lambda cost_chain: cost_chain[0])
+        for _, chain in kept:
+            yield chain
+
     @staticmethod
     def fresh_in_last_relation(tests_chain, target_relation_vars):
         # compute the last fresh variable(s)
@@ -1100,15 +1720,33 @@ class DecisionTree(PredictiveModel):
             a: r
             for r, a in enumerate(last_fresh_indices)
         }
-        yield from generator_chains_helper(
-            last_step_helper(nb_fresh, last_super_type), last_super_type,
-            last_types, tests_chain_len - 1)
+        for a_chain, a_type in generator_chains_helper(
+                last_step_helper(nb_fresh, last_super_type), last_super_type,
+                last_types, tests_chain_len - 1):
+            if self.fast_aggregators:
+                a_chain = [get_fast_aggregator(a) for a in a_chain]
+            yield a_chain, a_type
 
     def generate_possible_attributes_helper_all_steps(
-            self, depth, var_counts_up_to_here: Dict[str, Set[str]]):
+            self, depth, var_counts_up_to_here: Dict[str, Set[str]],
+            prefix=None):
+        """
+        Yields the chains prefix + [head] + tail, where the head is an atom test on the given variables.
+
+        If prune_unlinked_chains, the heads that cannot be linked to the last test of the prefix
+        (see get_atom_test_links) are not generated, and the chains for which is_relation_chain_valid
+        fails are neither yielded nor extended. The counter of the temporary variables is advanced
+        as if they were, so that the names (and the order) of the other chains do not change.
+        """
+        prefix = [] if prefix is None else prefix
+        prune = DecisionTree.prune_unlinked_chains and prefix
+        previous_relation = prefix[-1][0] if prune else None
         for head in self.generate_possible_attributes_helper_one_step(
-                var_counts_up_to_here):
-            yield [head]
+                var_counts_up_to_here, previous_relation, depth):
+            chain = prefix + [head]
+            is_valid = not prune or is_relation_chain_valid(chain)
+            if is_valid:
+                yield chain
             if depth < self.max_number_atom_tests:
                 # update counts
                 _, var_names_types = head
@@ -1119,14 +1757,103 @@ class DecisionTree(PredictiveModel):
                     fresh_dict[var_type].add(var_name)
                 new_counts = union_of_two_dicts(var_counts_up_to_here,
                                                 fresh_dict)
-                for tail in self.generate_possible_attributes_helper_all_steps(
-                        depth + 1, new_counts):
-                    yield [head] + tail
+                if is_valid:
+                    yield from self.generate_possible_attributes_helper_all_steps(
+                        depth + 1, new_counts, chain)
+                else:
+                    self.temp_var_count -= self.count_temp_var_names(
+                        depth + 1, new_counts)
+
+    def get_atom_test_links(self):
+        """
+        The type compatibility graph of the atom tests: {relation name: [atom tests that can follow it]}.
+        An atom test can follow a relation if some of its non-constant positions has a type of some position
+        of the relation, since otherwise the two cannot share a variable (is_relation_chain_valid).
+        The graph is computed in fit (or at the first call).
+        """
+        if self.atom_test_links is None:
+            relation_types = {}
+            for relation_name, _, var_types in self.allowed_atom_tests:
+                relation_types[relation_name] = set(var_types)
+            self.atom_test_links = {}
+            for relation_name, types in relation_types.items():
+                self.atom_test_links[relation_name] = set()
+                for rel_spec, counts in self.allowed_atom_tests.items():
+                    for o_type, (ind_old, ind_new, _) in counts.items():
+                        if o_type in types and (ind_old or ind_new):
+                            self.atom_test_links[relation_name].add(rel_spec)
+        return self.atom_test_links
+
+    def count_temp_var_names(self, depth, var_counts_up_to_here):
+        """
+        The number of temporary variable names that
+        generate_possible_attributes_helper_all_steps(depth, var_counts_up_to_here) creates without pruning.
+        The number depends only on the numbers of variables of each type, and it is memoized.
+        """
+        sizes = tuple(
+            sorted((t, len(names)) for t, names in var_counts_up_to_here.items()
+                   if names))
+        key = (depth, sizes)
+        if key not in self.temp_var_name_counts:
+            self.temp_var_name_counts[key] = sum(
+                self.count_temp_var_names_atom_test(rel_spec, depth, sizes)
+                for rel_spec in self.allowed_atom_tests)
+        return self.temp_var_name_counts[key]
+
+    def count_temp_var_names_atom_test(self, rel_spec, depth, sizes):
+        """
+        As count_temp_var_names, but only for the chains whose first test is the given atom test.
+        """
+        key = (rel_spec, depth, sizes)
+        if key not in self.temp_var_name_counts:
+            counts = self.allowed_atom_tests[rel_spec]
+            o_types = sorted(counts.keys())
+            present = {
+                t: {"{}{}".format(t, i)
+                    for i in range(size)}
+                for t, size in sizes
+            }
+            total = 0
+            for _, configuration in generate_variable_configurations(
+                    present, counts, o_types):
+                new_sizes = dict(sizes)
+                for type_config, o_type in zip(configuration, o_types):
+                    relative_counts_new = type_config[1][1]
+                    nb_constants = len(counts[o_type][2])
+                    total += max(relative_counts_new, default=0) + nb_constants
+                    new_sizes[o_type] = new_sizes.get(o_type, 0) + len(
+                        set(relative_counts_new)) + nb_constants
+                if depth < self.max_number_atom_tests:
+                    total += self.count_temp_var_names(
+                        depth + 1, {
+                            t: range(size)
+                            for t, size in new_sizes.items()
+                        })
+            self.temp_var_name_counts[key] = total
+        return self.temp_var_name_counts[key]
 
     def generate_possible_attributes_helper_one_step(self,
-                                                     var_counts_up_to_here):
+                                                     var_counts_up_to_here,
+                                                     previous_relation=None,
+                                                     depth=1):
+        """
+        Yields the atom tests on the given variables. If the name of the previous relation in the chain
+        is given, only the atom tests that can be linked to it are generated, see get_atom_test_links.
+        """
+        links = None
+        if previous_relation is not None:
+            links = self.get_atom_test_links()[previous_relation]
         for rel_spec in sorted(self.allowed_atom_tests):
             counts = self.allowed_atom_tests[rel_spec]
+            if links is not None and rel_spec not in links:
+                # none of these could be linked: skip their variable names
+                self.temp_var_count -= self.count_temp_var_names_atom_test(
+                    rel_spec, depth,
+                    tuple(
+                        sorted((t, len(names))
+                               for t, names in var_counts_up_to_here.items()
+                               if names)))
+                continue
             relation_name, var_specifications, var_types = rel_spec
             arity = len(var_specifications)
             o_types = sorted(counts.keys())
@@ -1160,17 +1887,58 @@ class DecisionTree(PredictiveModel):
                 var_names_types = list(zip(variable_names, var_types))
                 yield relation_name, var_names_types
 
+    def prepare_constant_values(self, target_data: List[Datum]):
+        """
+        Resets the constant values of the current node. For the constant selection 'examples',
+        the values of the target variables in the node's examples are also collected.
+        """
+        self.constant_values = {}
+        self.node_example_values = {}
+        if self.constant_selection == DecisionTree.constants_examples:
+            for i, v in enumerate(self.target_relation_variables):
+                if v.value_type not in self.node_example_values:
+                    self.node_example_values[v.value_type] = set()
+                self.node_example_values[v.value_type].update(
+                    datum.get_descriptive()[i] for datum in target_data)
+
+    def get_constant_values(self, relation_name, position):
+        """
+        Values that are tried for the constant on the given position of the relation:
+        at most max_number_constants of them, chosen according to constant_selection:
+
+        - frequent: the most frequent values in the relation,
+        - quantiles: evenly spaced quantiles for numeric positions (the most frequent values otherwise),
+        - examples: the most frequent values in the tuples that contain the values of the target variables
+          of the node's examples.
+        """
+        key = (relation_name, position)
+        if key not in self.constant_values:
+            relation = self.descriptive_data[relation_name]
+            k = self.max_number_constants
+            if self.constant_selection == DecisionTree.constants_examples:
+                counts = relation.count_values(position,
+                                               self.node_example_values)
+                values = select_most_frequent(counts, k)
+            elif relation.get_nb_all_values(position) <= k:
+                values = relation.get_all_values(position)
+            elif self.constant_selection == DecisionTree.constants_quantiles and \
+                    Relation.is_numeric_type(relation.get_types()[position]):
+                values = relation.get_quantile_values(position, k)
+            else:
+                values = relation.get_most_frequent_values(position, k)
+            self.constant_values[key] = values
+        return self.constant_values[key]
+
     def create_example_and_chains(self, relations, current_vars):
         def const_value_generator(c_name):
             r_name, position = constants[c_name]
-            yield from self.descriptive_data[r_name].get_all_values(position)
+            yield from self.get_constant_values(r_name, position)
 
         def num_const_values():
             product = 1
             for c_name in constant_var_names:
                 r_name, position = constants[c_name]
-                product *= self.descriptive_data[r_name].get_nb_all_values(
-                    position)
+                product *= len(self.get_constant_values(r_name, position))
             return product
 
         relation_chain = []
@@ -1235,6 +2003,71 @@ class DecisionTree(PredictiveModel):
     def predict_all(self, ds: List[Datum], is_for_ensemble=False):
         return [self.predict(d, is_for_ensemble) for d in ds]
 
+    def get_leaves(self) -> List[TreeNode]:
+        """
+        :return: the leaves, ordered by their ids (available if the tree stores leaf membership)
+        """
+        return self.leaves
+
+    def get_training_leaf_ids(self):
+        """
+        :return: numpy array whose i-th element is the id of the leaf that the i-th training example reached
+          during fit, or None if the tree does not store leaf membership
+        """
+        return self.training_leaf_ids
+
+    def get_training_examples(self):
+        """
+        Groups the training examples by their leaves (computed from the training leaf ids).
+        :return: list whose i-th element is the list of the indices (in the training target data) of
+          the examples that reached the leaf with id i during fit, or None if the tree does not store
+          leaf membership
+        """
+        if self.training_leaf_ids is None:
+            return None
+        order = np.argsort(self.training_leaf_ids, kind="stable")
+        leaf_sizes = np.bincount(self.training_leaf_ids,
+                                 minlength=len(self.leaves))
+        return [
+            examples.tolist()
+            for examples in np.split(order, np.cumsum(leaf_sizes)[:-1])
+        ]
+
+    def forget_leaf_membership(self):
+        """
+        Drops the leaf membership of the training examples (once it is not needed anymore),
+        so that it is not kept (and pickled) with the fitted tree. The leaves keep their ids.
+        """
+        self.training_leaf_ids = None
+        self.training_identifiers = None
+
+    def get_training_identifiers(self):
+        """
+        :return: identifiers of the training examples (in the order of the training target data),
+          or None if the tree does not store leaf membership
+        """
+        return self.training_identifiers
+
+    def predict_training(self, is_for_ensemble=False):
+        """
+        Predictions for the training examples, computed from the leaf membership without traversing the tree.
+        :param is_for_ensemble: see predict
+        :return: list of predictions, in the order of the training target data
+        """
+        if self.training_leaf_ids is None:
+            raise ValueError("Training predictions need a tree that was fitted "
+                             "with store_leaf_membership=True.")
+        if is_for_ensemble:
+            leaf_predictions = [
+                leaf.get_stats().get_prediction_for_ensemble()
+                for leaf in self.leaves
+            ]
+        else:
+            leaf_predictions = [
+                leaf.get_stats().get_prediction() for leaf in self.leaves
+            ]
+        return [leaf_predictions[i] for i in self.training_leaf_ids]
+
     def target_data_induction_preparation(self, target_data: List[Datum]):
         if self.class_weights is None:
             return None
@@ -1254,6 +2087,34 @@ class DecisionTree(PredictiveModel):
             if datum.identifier not in TEST_VALUE_MEMO:
                 TEST_VALUE_MEMO[datum.identifier] = {}
 
+    @staticmethod
+    def prefetch_first_relation(example, relation_chain, known_unknown,
+                                target_relation_vars, data: List[Datum]):
+        """
+        Announces the lookups of the first relation of the chain for all the examples
+        (see Relation.prefetch), so that a relation in a database can answer them in a few queries.
+        The known values of the first relation are the values of the target variables and the constants.
+        """
+        relation, var_names = relation_chain[0]
+        known = known_unknown[0][0]
+        if not relation.supports_prefetch or not known:
+            return
+        target_positions = {
+            name: i
+            for i, name in enumerate(target_relation_vars)
+        }
+        constants = {
+            i: example[var_names[i]].get_value()
+            for i in known if var_names[i] not in target_positions
+        }
+        keys = set()
+        for datum in data:
+            values = datum.get_descriptive()
+            keys.add(
+                tuple(constants[i] if i in constants else
+                      values[target_positions[var_names[i]]] for i in known))
+        relation.prefetch(known, keys)
+
     @staticmethod
     def test_values_memo_keys(example: Dict[str, Variable],
                               relation_chain: List[Tuple[Relation, List[str]]],
@@ -0,0 +1,265 @@
+"""
+A prediction server: the model and the descriptive data are loaded once, and then the batches of
+examples are predicted over HTTP, on the local host by default:
+
+    python -m re3py.serve --model forest.re3py --s_file data.s --data_file data.txt --port 8765
+
+The model is a file of dump_model (see learners.model_format) or of dump_to_bin. The requests and
+the responses are json:
+
+- POST /predict {"examples": [[x1, x2, ...], ...]}: the descriptive parts of the target tuples,
+  e.g., [["p1"], ["p2"]] for the examples label(p1, ?) and label(p2, ?).
+  Response: {"predictions": [...]}
+- POST /facts {"add": ["friend(p1, p2)", ...], "remove": ["friend(p1, p3)", ...]}: adds and
+  removes the facts of the descriptive relations (both lists are optional).
+  Response: {"added": the number of the facts that were not known, "removed": ...}
+- GET /stats: the latencies of the recent batches (see LatencyProfile.summary)
+
+The latency percentiles are also sent to the progress callback (ProgressEvent.batch_predicted) after
+every batch.
+"""
+from typing import Dict, List
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import argparse
+import json
+import logging
+import time
+from .data.data_and_statistics import Dataset, Datum
+from .learners.predictive_model import PredictiveModel, bind_relations
+from .utilities.profiling import LatencyProfile
+from .utilities.progress import ProgressEvent, ProgressCallback
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionServer:
+    """
+    Predicts the batches of examples with a model whose relations are the ones of the dataset,
+    so that the facts that are added to (or removed from) the dataset are seen by the following
+    predictions.
+    The requests are answered one at a time (see make_http_server).
+    """
+    def __init__(self,
+                 model: PredictiveModel,
+                 data: Dataset,
+                 progress_callback: ProgressCallback = None,
+                 latency_window=10000):
+        """
+        :param model: a fitted model that uses the relations of the data (see load_served_model)
+        :param data: the dataset with the descriptive relations
+        :param progress_callback: receives a ProgressEvent after every batch
+        :param latency_window: the number of the recent batches whose latencies are summarized
+        """
+        self.model = model
+        self.data = data
+        self.progress_callback = progress_callback
+        self.latencies = LatencyProfile(latency_window)
+        self.nb_descriptive_values = data.get_target_relation().arity - 1
+        self.nb_predicted = 0
+
+    def predict_batch(self, examples: List[List]):
+        """
+        :param examples: the descriptive parts of the target tuples, e.g., [["p1"], ["p2"]]
+        :return: the list of predictions
+        """
+        t0 = time.perf_counter()
+        batch = []
+        for example in examples:
+            if not isinstance(example, list) or len(
+                    example) != self.nb_descriptive_values:
+                raise ValueError(
+                    "An example must be a list of {} values, but is {}".format(
+                        self.nb_descriptive_values, example))
+            batch.append(
+                Datum(tuple(str(v) for v in example), None, 1,
+                      self.nb_predicted + len(batch)))
+        predictions = self.model.predict_all(batch)
+        self.nb_predicted += len(batch)
+        latency = time.perf_counter() - t0
+        self.latencies.add(latency)
+        if self.progress_callback is not None:
+            p50, p99 = self.latencies.quantiles(0.5, 0.99)
+            self.progress_callback(
+                ProgressEvent(ProgressEvent.batch_predicted,
+                              self,
+                              nb_examples=len(batch),
+                              time=latency,
+                              p50=p50,
+                              p99=p99))
+        return predictions
+
+    def update_facts(self, added: List[str], removed: List[str]):
+        """
+        Adds and removes the facts of the descriptive relations (see Dataset.add_facts).
+        :param added: e.g., ["friend(p1, p2)"]
+        :param removed: e.g., ["friend(p1, p3)"]
+        :return: (the number of the added facts that were not known, the number of the removed facts)
+        """
+        nb_added = sum(self.data.add_facts(added).values())
+        nb_removed = sum(self.data.remove_facts(removed).values())
+        return nb_added, nb_removed
+
+    def get_statistics(self):
+        statistics = self.latencies.summary()
+        statistics['examples'] = self.nb_predicted
+        return statistics
+
+    def handle(self, method, path, request):
+        """
+        Answers a request (see the module documentation).
+        :param method: GET or POST
+        :param path: e.g., /predict
+        :param request: the decoded json body of the request (None for GET)
+        :return: (http status, json response)
+        """
+        try:
+            if method == "GET" and path == "/stats":
+                return 200, self.get_statistics()
+            elif method == "POST" and path == "/predict":
+                predictions = self.predict_batch(
+                    PredictionServer.get_field(request, "examples"))
+                return 200, {
+                    'predictions':
+                    [PredictionServer.to_json_value(p) for p in predictions]
+                }
+            elif method == "POST" and path == "/facts":
+                nb_added, nb_removed = self.update_facts(
+                    PredictionServer.get_field(request, "add", True, str),
+                    PredictionServer.get_field(request, "remove", True, str))
+                return 200, {'added': nb_added, 'removed': nb_removed}
+            return 404, {'error': "Unknown request {} {}".format(method, path)}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:  # the server keeps serving the other requests
+            logger.exception("Failed to answer %s %s", method, path)
+            return 500, {'error': "{}: {}".format(type(e).__name__, e)}
+
+    @staticmethod
+    def get_field(request, field, is_optional=False, item_type=None):
+        """
+        :param request: the decoded json body of the request
+        :param field: the name of the field, whose value must be a list
+        :param is_optional: if True, a missing field is an empty list
+        :param item_type: if not None, the type of every item of the list, e.g., str
+        :return: the value of the field
+        """
+        if not isinstance(request, dict):
+            raise ValueError("The request must be a json object.")
+        if is_optional and field not in request:
+            return []
+        if not isinstance(request.get(field), list):
+            raise ValueError(
+                "The field {} of the request must be a list.".format(field))
+        if item_type is not None:
+            for item in request[field]:
+                if not isinstance(item, item_type):
+                    raise ValueError("The items of the field {} must be of "
+                                     "type {}, but {} is not.".format(
+                                         field, item_type.__name__,
+                                         json.dumps(item)))
+        return request[field]
+
+    @staticmethod
+    def to_json_value(value):
+        if hasattr(value, "tolist"):  # numpy arrays and scalars
+            return value.tolist()
+        elif isinstance(value, (list, tuple)):
+            return [PredictionServer.to_json_value(v) for v in value]
+        return value
+
+
+def load_served_model(model_file, data: Dataset):
+    """
+    Loads the model and binds it to the relations of the data.
+    :param model_file: a file of dump_model or of PredictiveModel.dump_to_bin
+    :param data: the dataset with the descriptive relations
+    :return: the model
+    """
+    # model_format needs numpy, which is only imported for the compact models
+    from .learners.model_format import MAGIC, load_model
+    with open(model_file, "rb") as f:
+        is_compact = f.read(len(MAGIC)) == MAGIC
+    if is_compact:
+        return load_model(model_file, data)
+    return bind_relations(PredictiveModel.load(model_file),
+                          data.get_descriptive_data())
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    prediction_server = None  # type: PredictionServer
+
+    def do_GET(self):
+        self.answer(*self.prediction_server.handle("GET", self.path, None))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError:
+            self.answer(400, {'error': "The body is not json."})
+            return
+        self.answer(*self.prediction_server.handle("POST", self.path, request))
+
+    def answer(self, status, response: Dict):
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, message_format, *args):
+        logger.debug(message_format, *args)
+
+
+def make_http_server(prediction_server: PredictionServer,
+                     host="127.0.0.1",
+                     port=8765):
+    """
+    :return: HTTPServer (call serve_forever) that answers the requests one at a time
+    """
+    handler = type("RequestHandler", (_RequestHandler, ),
+                   {'prediction_server': prediction_server})
+    return HTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serves the predictions of a re3py model over HTTP.")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--s_file", required=True)
+    parser.add_argument("--data_file", required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--log_every",
+                        type=int,
+                        default=1000,
+                        help="log the latencies after every log_every batches")
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    def log_latencies(event: ProgressEvent):
+        if event.source.latencies.nb_requests % arguments.log_every == 0:
+            logger.info("%d batches: p50 %.4fs, p99 %.4fs",
+                        event.source.latencies.nb_requests, event['p50'],
+                        event['p99'])
+
+    t0 = time.perf_counter()
+    data = Dataset(arguments.s_file, arguments.data_file)
+    model = load_served_model(arguments.model, data)
+    logger.info("Loaded the model and the data in %.2fs",
+                time.perf_counter() - t0)
+    http_server = make_http_server(
+        PredictionServer(model, data, progress_callback=log_latencies),
+        arguments.host, arguments.port)
+    logger.info("Serving on http://%s:%d", arguments.host, arguments.port)
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+
+
+if __name__ == "__main__":
+    main()
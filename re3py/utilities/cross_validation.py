@@ -64,11 +64,13 @@ def create_folds(data: Dataset,
             data_file=data.data_file,
             descriptive_relations=data.get_descriptive_data(),
             target_data=training_testing_target[0],
-            statistics=data.get_copy_statistics())
+            statistics=data.get_copy_statistics(),
+            catalog=data.catalog)
         testing_data = Dataset(
             settings=data.settings,
             data_file=data.data_file,
             descriptive_relations=data.get_descriptive_data(),
             target_data=training_testing_target[1],
-            statistics=data.get_copy_statistics())
+            statistics=data.get_copy_statistics(),
+            catalog=data.catalog)
         yield training_data, testing_data
@@ -0,0 +1,41 @@
+import importlib
+
+
+class LazyModule:
+    """
+    A module that is imported on the first access to one of its attributes, e.g.,
+
+    np = LazyModule("numpy")
+
+    at the top of a module, instead of import numpy as np. This keeps the dependencies that only
+    some code paths need (numpy, the Java bridge, the rankings) out of the import of re3py.
+    """
+    def __init__(self, name: str, package=None):
+        """
+        :param name: the name of the module, relative to the package if it starts with a dot
+        :param package: the package for the relative names, i.e., __package__ of the importing module
+        """
+        self.__dict__['_name'] = name
+        self.__dict__['_package'] = package
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__['_module'] = importlib.import_module(
+                self._name, self._package)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return "LazyModule({}, loaded={})".format(self._name, self.is_loaded())
+
+    def is_loaded(self):
+        return self._module is not None
@@ -0,0 +1,204 @@
+from typing import Dict, List, Union
+from collections import deque
+import csv
+import json
+import math
+from .lazy_import import LazyModule
+
+np = LazyModule("numpy")
+
+# counters that are updated during the computation of the test values
+PROFILE_COUNTERS = {
+    'memo_hits': 0,
+    'memo_misses': 0,
+    'joins': 0,
+    'join_size': 0,
+    'max_join_size': 0
+}
+
+
+def add_to_counters(memo_hits: int, memo_misses: int, join_sizes: List[int]):
+    """
+    Adds the counts of a single computation of the test values (BinarySplit.get_test_values)
+    to the counters.
+    :param memo_hits: the number of the test values that were memoized
+    :param memo_misses: the number of the test values that were computed
+    :param join_sizes: the number of the related tuples of each join
+    """
+    PROFILE_COUNTERS['memo_hits'] += memo_hits
+    PROFILE_COUNTERS['memo_misses'] += memo_misses
+    if join_sizes:
+        PROFILE_COUNTERS['joins'] += len(join_sizes)
+        PROFILE_COUNTERS['join_size'] += sum(join_sizes)
+        PROFILE_COUNTERS['max_join_size'] = max(
+            PROFILE_COUNTERS['max_join_size'], max(join_sizes))
+
+
+def snapshot_counters():
+    """
+    Starts a new measurement: the maximal join size is reset.
+    :return: the current values of the counters
+    """
+    PROFILE_COUNTERS['max_join_size'] = 0
+    return dict(PROFILE_COUNTERS)
+
+
+def counters_since(snapshot: Dict[str, int]):
+    """
+    :param snapshot: the result of snapshot_counters
+    :return: the increase of the counters since the snapshot, and the maximal join size
+    """
+    difference = {
+        name: PROFILE_COUNTERS[name] - snapshot[name]
+        for name in PROFILE_COUNTERS
+    }
+    difference['max_join_size'] = PROFILE_COUNTERS['max_join_size']
+    return difference
+
+
+class TreeProfile:
+    """
+    Profiling records of a single tree: one record per node and the totals.
+    """
+    def __init__(self):
+        self.nodes = []  # type: List[Dict[str, Union[str, int, float]]]
+        self.totals = {}  # type: Dict[str, Union[int, float]]
+
+    def add_node(self, record: Dict[str, Union[str, int, float]]):
+        self.nodes.append(record)
+
+    def set_totals(self, totals: Dict[str, Union[int, float]]):
+        self.totals = totals
+
+    def get_time(self):
+        return self.totals.get('induce', 0.0)
+
+    def to_dict(self):
+        return {
+            'totals': self.totals,
+            'nodes': self.nodes
+        }
+
+
+class LatencyProfile:
+    """
+    The latencies (in seconds) of the last window_size requests, e.g., the batches of a
+    PredictionServer, and their quantiles.
+    """
+    def __init__(self, window_size=10000):
+        if window_size < 1:
+            raise ValueError(
+                "window_size must be positive, but is {}".format(window_size))
+        self.latencies = deque(maxlen=window_size)
+        self.nb_requests = 0
+        self.ordered = None  # the sorted latencies, until the next one is added
+
+    def add(self, latency: float):
+        self.latencies.append(latency)
+        self.nb_requests += 1
+        self.ordered = None
+
+    def quantile(self, q):
+        """
+        :param q: the quantile, e.g., 0.99
+        :return: the smallest latency that is at least as large as the fraction q of the latencies
+          (nearest rank), or 0.0 if there are none
+        """
+        return self.quantiles(q)[0]
+
+    def quantiles(self, *qs):
+        """
+        The same as quantile, for several quantiles at once: the latencies are sorted once.
+        :param qs: the quantiles, e.g., 0.5, 0.99
+        :return: list of the latencies, one for each quantile
+        """
+        if not self.latencies:
+            return [0.0 for _ in qs]
+        if self.ordered is None:
+            self.ordered = sorted(self.latencies)
+        n = len(self.ordered)
+        return [
+            self.ordered[min(n, max(1, math.ceil(q * n))) - 1] for q in qs
+        ]
+
+    def summary(self):
+        n = len(self.latencies)
+        p50, p90, p99 = self.quantiles(0.5, 0.9, 0.99)
+        return {
+            'requests': self.nb_requests,
+            'mean': sum(self.latencies) / max(1, n),
+            'p50': p50,
+            'p90': p90,
+            'p99': p99,
+            'max': max(self.latencies, default=0.0)
+        }
+
+
+class ProfilingReport:
+    """
+    Profiling records of a tree or of the trees of an ensemble.
+    """
+    # the columns of the csv export
+    node_fields = [
+        'tree', 'node', 'depth', 'is_leaf', 'nb_examples', 'nb_chains',
+        'nb_tests', 'nb_evaluated_tests', 'time', 'test_value_time',
+        'split_eval_time', 'memo_hits', 'memo_misses', 'joins', 'join_size',
+        'max_join_size'
+    ]
+
+    def __init__(self, tree_profiles: List[TreeProfile]):
+        self.tree_profiles = tree_profiles
+
+    def __str__(self):
+        lines = ["{: <18}: {}".format(name, value)
+                 for name, value in self.summary().items()]
+        return "\n".join(lines)
+
+    def get_tree_times(self):
+        return [profile.get_time() for profile in self.tree_profiles]
+
+    def tree_time_histogram(self, nb_bins=10):
+        """
+        :return: (counts, bin edges) of the times of tree induction
+        """
+        counts, edges = np.histogram(self.get_tree_times(), bins=nb_bins)
+        return counts.tolist(), edges.tolist()
+
+    def summary(self):
+        totals = {}
+        for profile in self.tree_profiles:
+            for name, value in profile.totals.items():
+                totals[name] = totals.get(name, 0) + value
+        nodes = [node for p in self.tree_profiles for node in p.nodes]
+        memo_lookups = sum(n['memo_hits'] + n['memo_misses'] for n in nodes)
+        joins = sum(n['joins'] for n in nodes)
+        summary = {'trees': len(self.tree_profiles), 'nodes': len(nodes)}
+        summary.update(totals)
+        summary['memo_hit_rate'] = sum(
+            n['memo_hits'] for n in nodes) / max(1, memo_lookups)
+        summary['mean_join_size'] = sum(n['join_size']
+                                        for n in nodes) / max(1, joins)
+        summary['max_join_size'] = max([n['max_join_size'] for n in nodes],
+                                       default=0)
+        return summary
+
+    def to_dict(self):
+        return {
+            'summary': self.summary(),
+            'trees': [profile.to_dict() for profile in self.tree_profiles]
+        }
+
+    def to_json(self, file_name):
+        with open(file_name, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def to_csv(self, file_name):
+        """
+        Writes one row per node.
+        """
+        with open(file_name, "w", newline="") as f:
+            writer = csv.DictWriter(f, ProfilingReport.node_fields)
+            writer.writeheader()
+            for i, profile in enumerate(self.tree_profiles):
+                for node in profile.nodes:
+                    writer.writerow(dict(node, tree=i))
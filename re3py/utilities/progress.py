@@ -0,0 +1,61 @@
+from typing import Callable, List, Union
+import time
+
+
+class ProgressEvent:
+    """
+    A structured event that the learners send to their progress callbacks.
+    The details depend on the kind of the event:
+
+    - tree started: nb_examples
+    - node split: node, depth, nb_examples, test, score, time
+    - leaf created: node, depth, nb_examples, time
+    - tree finished: nb_nodes, nb_leaves, time
+    - iteration started: iteration (and class, for the class trees of multiclass boosting)
+    - iteration finished: iteration, time (and validation_loss, for boosting with validation data)
+    - batch predicted: nb_examples, time, p50, p99 (the latencies of the recent batches of a
+      PredictionServer)
+
+    where time is the time (in seconds) spent on the node/tree/iteration/batch.
+    """
+    tree_started = "tree started"
+    node_split = "node split"
+    leaf_created = "leaf created"
+    tree_finished = "tree finished"
+    iteration_started = "iteration started"
+    iteration_finished = "iteration finished"
+    batch_predicted = "batch predicted"
+
+    def __init__(self, kind: str, source, **details):
+        """
+        :param kind: one of the kinds above
+        :param source: the model that sent the event
+        :param details: the fields of the event
+        """
+        self.kind = kind
+        self.source = source
+        self.details = details
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        return "ProgressEvent({}, {}, {})".format(
+            self.kind, self.source.__class__.__name__, self.details)
+
+    def __getitem__(self, item):
+        return self.details[item]
+
+
+ProgressCallback = Union[None, Callable[[ProgressEvent], None]]
+
+
+class ProgressRecorder:
+    """
+    A progress callback that keeps the events, optionally only those of the given kinds.
+    """
+    def __init__(self, kinds=None):
+        self.kinds = None if kinds is None else set(kinds)
+        self.events = []  # type: List[ProgressEvent]
+
+    def __call__(self, event: ProgressEvent):
+        if self.kinds is None or event.kind in self.kinds:
+            self.events.append(event)
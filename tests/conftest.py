@@ -0,0 +1,165 @@
+## the toy dataset and the tree parameters that are shared by the tests
+#
+# A test gets the files of the dataset from the fixture toy_dataset (or the loaded dataset from
+# toy_data). The dataset is described by toy_dataset_parameters (see write_dataset), which a test
+# module overrides, or a test parametrizes, e.g.,
+#
+# @pytest.mark.parametrize("toy_dataset_parameters", [{'nb_examples': 30}])
+
+import pytest
+from re3py.data.data_and_statistics import Dataset
+from re3py.learners.core.heuristic import HeuristicGini, HeuristicVariance
+from re3py.learners.core.tree_node_split import TEST_VALUE_MEMO
+from re3py.learners.tree import DecisionTree
+
+COLORS = ["red", "green", "blue"]
+RELATIONS = {
+    # name: (declaration, aggregate, atom test)
+    'age': ("age(Person, numeric)", "mean", "age(old, new)"),
+    'color': ("color(Person, nominalColor)", "mode", "color(old, c)"),
+    'friend': ("friend(Person, Person)", "count", "friend(old, new)")
+}
+
+
+def default_label(i):
+    return "xy"[i * 7 % 11 < 5]
+
+
+def default_friends(i, nb_examples):
+    return [(3 * i + 1) % nb_examples]
+
+
+def write_dataset(directory,
+                  nb_examples=40,
+                  relations=("age", "color", "friend"),
+                  label=default_label,
+                  friends=default_friends,
+                  target_type="nominal",
+                  atom_tests=None):
+    """
+    Writes the files of a toy dataset: the persons p0, p1, ... have an age, a color and friends,
+    and the target relation label gives their labels.
+
+    :param directory: the directory of the files (pathlib.Path)
+    :param nb_examples: the number of the persons
+    :param relations: the descriptive relations, some of age, color and friend
+    :param label: i -> the label of the person pi
+    :param friends: (i, nb_examples) -> the indices of the friends of the person pi
+    :param target_type: nominal or numeric
+    :param atom_tests: None or {relation: atom test} that replaces the atom tests of RELATIONS,
+      e.g., {'color': "color(old, new)"}
+    :return: (the s file, the descriptive data file, the target data file)
+    """
+    atom_tests = {} if atom_tests is None else atom_tests
+    s_file = directory / "toy.s"
+    descriptive = directory / "toy_descriptive.txt"
+    target = directory / "toy_target.txt"
+    s_file.write_text(
+        "[Relations]\nlabel(Person, {})\n{}\n"
+        "[Aggregates]\n{}\n"
+        "[AtomTests]\n{}\n".format(
+            target_type, "\n".join(RELATIONS[r][0] for r in relations),
+            "\n".join(sorted(RELATIONS[r][1] for r in relations)),
+            "\n".join(atom_tests.get(r, RELATIONS[r][2]) for r in relations)))
+    facts = ["// the toy facts"]
+    labels = ["// the labels"]
+    for i in range(nb_examples):
+        if "age" in relations:
+            facts.append("age(p{}, {})".format(i, 10 + 7 * i % 50))
+        if "color" in relations:
+            facts.append("color(p{}, {})".format(i, COLORS[i * i % 3]))
+        if "friend" in relations:
+            for j in friends(i, nb_examples):
+                facts.append("friend(p{}, p{})".format(i, j))
+        labels.append("label(p{}, {})".format(i, label(i)))
+    descriptive.write_text("\n".join(facts) + "\n")
+    target.write_text("\n".join(labels) + "\n")
+    return str(s_file), str(descriptive), str(target)
+
+
+def get_tree_parameters(data: Dataset, **changes):
+    """
+    :param data: a toy dataset
+    :param changes: the parameters that differ from the shared ones, e.g., max_depth=4
+    :return: the parameters of the trees that use all the atom tests and aggregates of the data
+    """
+    is_numeric = data.get_target_relation().get_types()[-1] == "numeric"
+    parameters = {
+        'heuristic': HeuristicVariance() if is_numeric else HeuristicGini(),
+        'max_number_atom_tests': 2,
+        'allowed_atom_tests': data.settings.get_atom_tests_structured(),
+        'allowed_aggregators': data.settings.get_aggregates(),
+        'max_depth': 3
+    }
+    parameters.update(changes)
+    return parameters
+
+
+def fit_model(model, *datasets):
+    """
+    Fits the model (e.g., model.fit(training, validation)) without the test values that
+    were memoized for the other datasets.
+    :return: the model
+    """
+    TEST_VALUE_MEMO.clear()
+    try:
+        model.fit(*datasets)
+    finally:
+        TEST_VALUE_MEMO.clear()
+    return model
+
+
+@pytest.fixture(autouse=True)
+def clear_test_value_memo():
+    """
+    The memoized test values of a test are not seen by the next one (see fit_model).
+    """
+    yield
+    TEST_VALUE_MEMO.clear()
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {}
+
+
+@pytest.fixture
+def toy_dataset(tmp_path, toy_dataset_parameters):
+    """
+    :return: (the s file, the descriptive data file, the target data file), see write_dataset
+    """
+    return write_dataset(tmp_path, **toy_dataset_parameters)
+
+
+@pytest.fixture
+def toy_data(toy_dataset):
+    return Dataset(*toy_dataset)
+
+
+@pytest.fixture
+def tree_parameters():
+    """
+    :return: get_tree_parameters, e.g., DecisionTree(**tree_parameters(data, max_depth=4))
+    """
+    return get_tree_parameters
+
+
+@pytest.fixture
+def fit():
+    """
+    :return: fit_model, e.g., tree = fit(DecisionTree(...), data)
+    """
+    return fit_model
+
+
+@pytest.fixture
+def fit_tree(toy_data):
+    """
+    :return: a function that fits a DecisionTree to toy_data, e.g., fit_tree(max_depth=4),
+      where the arguments change the shared parameters (see get_tree_parameters)
+    """
+    def fit_toy_tree(**changes):
+        parameters = get_tree_parameters(toy_data, **changes)
+        return fit_model(DecisionTree(**parameters), toy_data)
+
+    return fit_toy_tree
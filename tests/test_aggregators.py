@@ -0,0 +1,81 @@
+## parity of the performance-tier aggregators with the reference ones
+
+import random
+from re3py.learners.core.aggregators import *
+from re3py.learners.core.segments import Segments
+
+import pytest
+
+
+def random_groups(seed, nb_groups, max_size, values):
+    r = random.Random(seed)
+    return [[r.choice(values) for _ in range(r.randint(0, max_size))]
+            for _ in range(nb_groups)]
+
+
+numeric_values = [0.5 * i for i in range(-20, 21)] + [3, 7, 11]
+nominal_values = ["a", "b", "c", "d", "e"]
+numeric_pairs = [(COUNT, FastCount()), (COUNT_UNIQUE, FastCountUnique()),
+                 (MIN, FastMin()), (MAX, FastMax()), (MEAN, FastMean()),
+                 (SUM, FastSum())]
+# small groups stay in python, large ones go through numpy
+group_sizes = [5, 50]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("max_size", group_sizes)
+@pytest.mark.parametrize("reference, fast", numeric_pairs)
+def test_numeric_parity(seed, max_size, reference, fast):
+    ls = random_groups(seed, 40, max_size, numeric_values)
+    assert fast.get_name() == reference.get_name()
+    assert fast.aggregate(ls) == pytest.approx(reference.aggregate(ls))
+    for a_list in ls:
+        assert fast.aggregate_flat(a_list) == pytest.approx(
+            reference.aggregate_flat(a_list))
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("max_size", group_sizes)
+def test_mode_parity(seed, max_size):
+    ls = random_groups(seed, 40, max_size, nominal_values)
+    ls.append(["b", "a", "b", "a"])  # ties are resolved alphabetically
+    fast = FastMode()
+    assert fast.aggregate(ls) == MODE.aggregate(ls)
+    assert fast.aggregate_flat(["b", "a", "b", "a"]) == "a"
+    assert fast.aggregate_flat([]) == MODE_OF_EMPTY_LIST
+
+
+def test_fast_counterparts():
+    for a in FAST_AGGREGATORS:
+        assert get_fast_aggregator(a) is a
+    projection = Project1(MEAN)
+    fast_projection = get_fast_aggregator(projection)
+    assert isinstance(fast_projection.aggregator, FastMean)
+    assert fast_projection.get_name() == projection.get_name()
+    assert get_fast_aggregator(FLATTEN) is FLATTEN
+    assert get_fast_aggregator(PROJECT) is PROJECT
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+@pytest.mark.parametrize("max_size", group_sizes)
+def test_segments_parity(seed, max_size):
+    ls = random_groups(seed, 40, max_size, numeric_values)
+    segments = Segments.from_lists(ls)
+    assert segments.groups() == ls
+    for reference, fast in numeric_pairs:
+        expected = reference.aggregate(ls)
+        assert reference.aggregate_segments(segments) == pytest.approx(
+            expected)
+        assert fast.aggregate_segments(segments) == pytest.approx(expected)
+    assert FLATTEN.aggregate_segments(segments) == FLATTEN.aggregate(ls)
+    assert sorted(FLATTEN_UNIQUE.aggregate_segments(segments)) == sorted(
+        FLATTEN_UNIQUE.aggregate(ls))
+
+
+def test_segments_projection():
+    ls = [[(1, 2.0), (3, 4.0)], [], [(5, 6.0)]]
+    segments = Segments.from_lists(ls)
+    for inner in [MEAN, FastMean(), FLATTEN]:
+        projection = Project1(inner)
+        assert projection.aggregate_segments(segments) == projection.aggregate(
+            ls)
@@ -0,0 +1,55 @@
+## approximate split search on a sample of the node's examples
+
+from re3py.learners.tree import DecisionTree
+
+import pytest
+
+
+def xyz_label(i):
+    return "xyz"[i * 7 % 13 % 3]
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {'nb_examples': 120, 'label': xyz_label}
+
+
+def test_sample_size():
+    tree = DecisionTree(approximate_split_search=True,
+                        approximate_split_tolerance=0.05,
+                        approximate_split_confidence=0.95)
+    assert tree.get_split_search_sample_size() == 738
+    with pytest.raises(ValueError):
+        DecisionTree(approximate_split_search=True,
+                     approximate_split_confidence=1.0)
+    with pytest.raises(ValueError):
+        DecisionTree(approximate_split_search=True, approximate_split_top_k=0)
+
+
+def test_all_candidates_re_evaluated(fit_tree):
+    # if every candidate is re-evaluated, the tree is the same as with the exact search
+    exact = fit_tree()
+    approximate = fit_tree(approximate_split_search=True,
+                           approximate_split_tolerance=0.3,
+                           approximate_split_top_k=10**6)
+    assert approximate.get_split_search_sample_size() * 2 < 120
+    assert str(approximate) == str(exact)
+
+
+def test_top_candidates_re_evaluated(fit_tree):
+    exact = fit_tree(max_number_internal_nodes=1)
+    approximate = fit_tree(max_number_internal_nodes=1,
+                           approximate_split_search=True,
+                           approximate_split_tolerance=0.3,
+                           approximate_split_top_k=3)
+    # the split is chosen on all examples, so it cannot be better than the exact one
+    root = approximate.root_node
+    assert not root.is_leaf()
+    sizes = [child.get_stats().get_total_number_examples()
+             for child in root.get_children()]
+    assert sum(sizes) == 120
+    exact_children = exact.root_node.get_children()
+    assert approximate.heuristic.evaluate_split(
+        root.get_stats(), [c.get_stats() for c in root.get_children()]
+    ) >= exact.heuristic.evaluate_split(
+        exact.root_node.get_stats(), [c.get_stats() for c in exact_children])
@@ -0,0 +1,167 @@
+## vectorized gradient boosting
+
+from math import exp, log
+from re3py.data.data_and_statistics import *
+from re3py.learners.boosting import *
+
+from conftest import write_dataset
+
+import numpy as np
+import pytest
+
+
+def cycled_labels(classes, nb_examples):
+    return {
+        'nb_examples': nb_examples,
+        'label': lambda i: classes[i * 7 % len(classes)]
+    }
+
+
+def test_binary_gradients():
+    ts = np.array([1.0, -1.0, 1.0, -1.0])
+    ps = np.array([0.3, 0.2, -500.0, 500.0])
+    expected = []
+    for t, p in zip(ts, ps):
+        try:
+            expected.append(2 * t / (1 + exp(2 * t * p)))
+        except OverflowError:
+            expected.append(t * 10**-10)
+    task = GradientBoostingBinaryClassification
+    assert task.minus_partial_derivative_friedman(
+        ts, ps) == pytest.approx(expected)
+    assert task.loss_friedman(ts[:2], ps[:2]) == pytest.approx(
+        (log(1 + exp(-0.6)) + log(1 + exp(0.4))) / 2)
+
+
+def test_multiclass_gradients():
+    ts = np.array([[1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    ps = np.array([[0.5, -1.0, 2.0], [1000.0, 1000.0, 1000.0]])
+    task = GradientBoostingMulticlassClassification
+    gradients = task.minus_partial_derivative_friedman(ts, ps)
+    normalizer = exp(0.5) + exp(-1.0) + exp(2.0)
+    assert gradients[0] == pytest.approx(
+        [1 - exp(0.5) / normalizer, -exp(-1.0) / normalizer,
+         -exp(2.0) / normalizer])
+    assert gradients[1] == pytest.approx([-1 / 3, -1 / 3, 2 / 3])
+    assert task.minus_partial_derivative(ts, ps) == pytest.approx(ts - ps)
+    assert task.loss_friedman(ts[:1], ps[:1]) == pytest.approx(
+        log(normalizer) - 0.5)
+
+
+@pytest.mark.parametrize(
+    "toy_dataset_parameters",
+    [cycled_labels("xy", 30), cycled_labels("xyz", 30)])
+@pytest.mark.parametrize("chosen_examples", [1.0, 0.7])
+def test_leaf_lookup_updates(toy_data, tree_parameters, fit, chosen_examples):
+    updates = []
+
+    def checked_update(tree, current_predictions, target_data,
+                       chosen_indices=None):
+        expected = current_predictions + np.array(tree.predict_all(target_data))
+        original_update(tree, current_predictions, target_data, chosen_indices)
+        updates.append(np.abs(current_predictions - expected).max())
+
+    original_update = GradientBoosting.update_current_predictions
+    GradientBoosting.update_current_predictions = staticmethod(checked_update)
+    try:
+        fit(
+            GradientBoosting(3,
+                             chosen_examples=chosen_examples,
+                             **tree_parameters(toy_data)), toy_data)
+    finally:
+        GradientBoosting.update_current_predictions = staticmethod(
+            original_update)
+    assert updates and max(updates) < 10**-10
+
+
+@pytest.mark.parametrize("toy_dataset_parameters",
+                         [cycled_labels("xyz", 30)])
+def test_parallel_class_trees(toy_data, tree_parameters, fit):
+    data = toy_data
+    models = []
+    for nb_processes in [1, 3]:
+        models.append(
+            fit(
+                GradientBoosting(2,
+                                 chosen_examples=0.8,
+                                 nb_processes=nb_processes,
+                                 **tree_parameters(data)), data))
+    serial, parallel = [[str(tree) for trees in m.trees_per_class
+                         for tree in trees] for m in models]
+    assert serial == parallel
+    relation = models[1].trees_per_class[1][0].root_node.split.test[0][0]
+    assert relation is data.get_descriptive_data()[relation.get_name()]
+    assert [models[0].predict(d) for d in data] == [
+        models[1].predict(d) for d in data
+    ]
+
+
+@pytest.mark.parametrize("classes, toy_dataset_parameters",
+                         [(classes, cycled_labels(classes, 40))
+                          for classes in ["xy", "xyz"]])
+@pytest.mark.parametrize("friedman", [False, True])
+def test_early_stopping(toy_data, monkeypatch, tree_parameters, fit, classes,
+                        friedman):
+    monkeypatch.setattr(GradientBoosting, "friedman", friedman)
+    data = toy_data
+    target_data = data.get_target_data()
+    parts = []
+    for part in [target_data[:25], target_data[25:]]:
+        parts.append(
+            Dataset(settings=data.settings,
+                    data_file=data.data_file,
+                    descriptive_relations=data.get_descriptive_data(),
+                    target_data=part,
+                    statistics=data.get_copy_statistics(),
+                    catalog=data.catalog))
+    training, validation = parts
+    model = fit(
+        GradientBoosting(10,
+                         shrinkage=0.5,
+                         patience=2,
+                         **tree_parameters(data)), training, validation)
+    losses = model.validation_losses
+    best = int(np.argmin(losses))
+    assert len(losses) == 11 or len(losses) - 1 - best == 2
+    assert model.nb_trees == best
+    # the incrementally computed loss of the best iteration
+    targets = model.encode_validation_targets(validation)
+    if len(classes) == 2:
+        assert len(model.trees) == best + 1
+        predictions = np.sum([
+            tree.predict_all(validation.get_target_data())
+            for tree in model.trees
+        ], axis=0)
+    else:
+        assert len(model.trees_per_class) == best + 1
+        predictions = np.sum([[
+            tree.predict_all(validation.get_target_data()) for tree in trees
+        ] for trees in model.trees_per_class], axis=0).T
+    if friedman:
+        loss = model.task.loss_friedman
+    else:
+        loss = model.task.loss
+    assert loss(targets, predictions) == pytest.approx(losses[best])
+    assert model.get_task_function("loss") == loss
+
+
+def test_no_leaf_membership_after_fit(tmp_path, tree_parameters, fit):
+    sizes = []
+    for nb_examples in [30, 120]:
+        # the labels are given by the colors, so the trees do not depend on the number of examples
+        directory = tmp_path / str(nb_examples)
+        directory.mkdir()
+        data = Dataset(*write_dataset(directory,
+                                      nb_examples=nb_examples,
+                                      relations=("color", ),
+                                      label=lambda i: "xy"[i * i % 3]))
+        model = fit(GradientBoosting(3, **tree_parameters(data)), data)
+        assert 'store_leaf_membership' not in model.tree_parameters
+        for tree in model.trees[1:]:
+            assert tree.get_training_leaf_ids() is None
+            assert tree.get_training_identifiers() is None
+            assert tree.get_training_examples() is None
+        sizes.append(
+            len(dumps_sharing_relations(model, data.get_descriptive_data())))
+    # only the numbers in the trees and their profiles differ
+    assert abs(sizes[1] - sizes[0]) < 100
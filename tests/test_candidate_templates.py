@@ -0,0 +1,65 @@
+## candidate templates, reused by the nodes with the same variable signature
+
+from re3py.learners.tree import DecisionTree, is_relation_chain_valid
+
+import pytest
+
+
+@pytest.mark.parametrize("longest_atom_test_chain", [1, 4])
+def test_templates_do_not_change_the_tree(fit_tree, longest_atom_test_chain):
+    trees = []
+    try:
+        for use_templates in [False, True]:
+            DecisionTree.use_candidate_templates = use_templates
+            trees.append(
+                fit_tree(longest_atom_test_chain=longest_atom_test_chain,
+                         max_depth=4))
+    finally:
+        DecisionTree.use_candidate_templates = True
+    without_templates, with_templates = trees
+    assert str(without_templates) == str(with_templates)
+    assert [n['nb_tests'] for n in without_templates.profile.nodes
+            ] == [n['nb_tests'] for n in with_templates.profile.nodes]
+    # the templates are not kept after fit
+    for tree in trees:
+        assert tree.candidate_templates == {}
+        assert tree.temp_var_name_counts == {}
+        assert tree.atom_test_links is None
+
+
+def test_chains_are_renamed(toy_data):
+    data = toy_data
+    tree = DecisionTree(allowed_atom_tests=data.settings.
+                        get_atom_tests_structured(),
+                        max_number_atom_tests=2)
+    chains = []
+    for names in [{"X0", "Y3"}, {"X0", "Y7"}]:
+        tree.reset_temp_var_count()
+        chains.append(list(tree.generate_chains({"Person": names})))
+    assert len(tree.candidate_templates) == 1
+    renamed = [[(r, [(n.replace("Y7", "Y3"), t) for n, t in vs])
+                for r, vs in chain] for chain in chains[1]]
+    assert renamed == chains[0]
+    assert any("Y7" in str(chain) for chain in chains[1])
+
+
+@pytest.mark.parametrize("max_number_atom_tests", [2, 3])
+def test_unlinked_chains_are_pruned(toy_data, max_number_atom_tests):
+    data = toy_data
+    results = []
+    try:
+        for prune in [False, True]:
+            DecisionTree.prune_unlinked_chains = prune
+            tree = DecisionTree(allowed_atom_tests=data.settings.
+                                get_atom_tests_structured(),
+                                max_number_atom_tests=max_number_atom_tests)
+            chains = list(
+                tree.generate_possible_attributes_helper_all_steps(
+                    1, {"Person": {"X0"}}))
+            results.append((chains, tree.temp_var_count))
+    finally:
+        DecisionTree.prune_unlinked_chains = True
+    (all_chains, count), (pruned_chains, pruned_count) = results
+    assert pruned_count == count
+    assert pruned_chains == [c for c in all_chains if is_relation_chain_valid(c)]
+    assert len(pruned_chains) < len(all_chains)
@@ -0,0 +1,49 @@
+## statistics catalog of the descriptive relations
+
+import os
+import pytest
+from re3py.data.data_and_statistics import *
+from re3py.data.catalog import StatisticsCatalog
+
+
+def three_friends(i, nb_examples):
+    return [[1, 2], [2], [0]][i]
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {
+        'nb_examples': 3,
+        'relations': ("age", "friend"),
+        'friends': three_friends
+    }
+
+
+def test_catalog_statistics(toy_data):
+    d = toy_data
+    catalog = d.get_catalog()
+    friend = catalog.get_relation_statistics("friend")
+    assert friend.get_nb_tuples() == 4
+    assert friend.get_nb_distinct(0) == 3
+    assert friend.get_frequent_values(0)[0] == ["p0", 2]
+    # degrees of the first position: p0 -> 2, p1 -> 1, p2 -> 1
+    assert friend.get_degree_histogram([0]) == [[1, 2], [2, 1]]
+    assert friend.get_degree_statistics([0]) == (3, 4 / 3, 6 / 4)
+    age = catalog.get_relation_statistics("age").get_numeric_summary(1)
+    assert (age['min'], age['max']) == (10.0, 24.0)
+    assert catalog.get_domain("Person") == ["p0", "p1", "p2"]
+    assert d.get_descriptive_data()["friend"].get_nb_all_values(1) == 3
+
+
+def test_catalog_persistence(toy_dataset):
+    files = toy_dataset
+    d = Dataset(*files)
+    catalog_file = StatisticsCatalog.get_catalog_file(d.data_file)
+    assert not os.path.exists(catalog_file)
+    d = Dataset(*files, persist_catalog=True)
+    loaded = StatisticsCatalog.load(catalog_file)
+    assert loaded.source == d.get_catalog().source
+    assert loaded.domains == d.get_catalog().domains
+    d2 = Dataset(*files)
+    friend = d2.get_descriptive_data()["friend"]
+    assert friend.get_degree_statistics([1]) == (3, 4 / 3, 6 / 4)
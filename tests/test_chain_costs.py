@@ -0,0 +1,70 @@
+## the degree-aware costs of the relation chains
+
+from re3py.learners.tree import DecisionTree
+
+import logging
+import pytest
+
+
+def get_skewed_friends(i, nb_examples):
+    # the first four persons are friends of everybody
+    return list(range(nb_examples)) if i < 4 else [(3 * i + 1) % nb_examples]
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {'friends': get_skewed_friends}
+
+
+def get_chains(tree: DecisionTree):
+    tree.reset_temp_var_count()
+    return list(
+        tree.generate_possible_attributes([{"Person": {"X0"}}], [], ["X0"]))
+
+
+def get_cost(tree: DecisionTree, chain):
+    return tree.estimate_chain_cost(chain[1])
+
+
+@pytest.mark.parametrize("max_chain_cost", [None, "10", 0, -1.0])
+def test_wrong_max_chain_cost(max_chain_cost):
+    with pytest.raises(ValueError):
+        DecisionTree(max_chain_cost=max_chain_cost)
+
+
+def test_skewed_degrees(toy_data):
+    # 4 * 40 + 36 tuples, 40 keys, and the sum of the squared degrees is 4 * 40**2 + 36
+    assert toy_data.get_descriptive_data()["friend"].get_degree_statistics(
+        [0]) == pytest.approx((40, 196 / 40, 6436 / 196))
+
+
+def test_chains_are_ordered_by_cost(fit_tree):
+    tree = fit_tree(order_chains_by_cost=True, max_depth=2)
+    chains = get_chains(tree)
+    ordered = list(tree.prune_and_order_chains(iter(chains), False))
+    assert ordered == sorted(chains, key=lambda c: get_cost(tree, c))
+    assert ordered != chains
+    # two steps through the skewed relation: the mean degree, then the size-biased one
+    friends_of_friends = ordered[-1][1]
+    assert [r for r, _ in friends_of_friends] == ["friend", "friend"]
+    assert get_cost(tree, ordered[-1]) == pytest.approx(4.9 * (1 + 6436 / 196))
+
+
+def test_expensive_chains_are_skipped(fit_tree, caplog):
+    tree = fit_tree(max_chain_cost=30, max_depth=2)
+    chains = get_chains(tree)
+    costs = [get_cost(tree, c) for c in chains]
+    nb_skipped = sum(cost > 30 for cost in costs)
+    assert nb_skipped == 3
+    caplog.set_level(logging.DEBUG, logger="re3py.learners.tree")
+    kept = list(tree.prune_and_order_chains(iter(chains), True))
+    # the budget alone keeps the original order
+    assert kept == [c for c, cost in zip(chains, costs) if cost <= 30]
+    messages = [(r.levelno, r.getMessage()) for r in caplog.records]
+    assert (logging.INFO,
+            "Skipped 3 of {} chains with estimated cost above 30".format(
+                len(chains))) in messages
+    assert sum(m.startswith("Skipped chain") for _, m in messages) == 3
+    caplog.clear()
+    assert list(tree.prune_and_order_chains(iter(chains), False)) == kept
+    assert not caplog.records
@@ -0,0 +1,106 @@
+## the constant values of the atom tests: the most frequent ones, quantiles or from the node's examples
+
+from collections import Counter
+from re3py.data.catalog import RelationStatistics
+from re3py.data.relation import Relation
+from re3py.learners.tree import DecisionTree
+
+import pytest
+
+
+@pytest.fixture
+def level():
+    """
+    The value v (1 <= v <= 8) is the level of v persons, and the value 9 of 8 persons,
+    so that 8 and 9 are tied.
+    """
+    tuples = set()
+    for v in range(1, 10):
+        for j in range(min(v, 8)):
+            tuples.add(("p{}_{}".format(v, j), v))
+    return Relation("level", tuples, None, ["Person", "numeric"])
+
+
+def get_constant_values(relation, constant_selection, max_number_constants,
+                        node_example_values=None):
+    tree = DecisionTree(constant_selection=constant_selection,
+                        max_number_constants=max_number_constants)
+    tree.descriptive_data = {relation.get_name(): relation}
+    tree.node_example_values = node_example_values
+    return tree.get_constant_values(relation.get_name(), 1)
+
+
+def test_count_values(level):
+    assert level.count_values(1) == Counter(
+        {v: min(v, 8)
+         for v in range(1, 10)})
+    related = {"Person": {"p9_0", "p9_1", "p1_0"}, "numeric": {5}}
+    assert level.count_values(1, related) == Counter({9: 2, 1: 1})
+    assert level.count_values(1, {"City": {"p9_0"}}) == Counter()
+
+
+@pytest.mark.parametrize("nb_frequent_values", [100, 2])
+def test_most_frequent_values(level, monkeypatch, nb_frequent_values):
+    # with 2, the values are counted again instead of being taken from the statistics
+    monkeypatch.setattr(RelationStatistics, "nb_frequent_values",
+                        nb_frequent_values)
+    # ties are resolved by the values
+    assert level.get_most_frequent_values(1, 1) == [8]
+    assert level.get_most_frequent_values(1, 3) == [7, 8, 9]
+    assert level.get_most_frequent_values(1, 20) == list(range(1, 10))
+
+
+def test_quantile_values(level):
+    # 44 sorted values: the positions 0, 14, 29 and 43 for k = 4
+    assert level.get_quantile_values(1, 4) == [1, 5, 8, 9]
+    assert level.get_quantile_values(1, 1) == [7]
+    assert level.get_quantile_values(1, 0) == []
+    # each value once, however many quantiles
+    assert level.get_quantile_values(1, 200) == list(range(1, 10))
+
+
+@pytest.mark.parametrize(
+    "constant_selection, expected",
+    [(DecisionTree.constants_frequent, [[8], [7, 8, 9], list(range(1, 10))]),
+     (DecisionTree.constants_quantiles, [[7], [1, 7, 9], list(range(1, 10))]),
+     (DecisionTree.constants_examples, [[2], [1, 2, 3], [1, 2, 3, 4]])])
+def test_constant_selection(level, constant_selection, expected):
+    # the examples are related to the levels 1, 2, 2, 3 and 4
+    examples = {"Person": {"p1_0", "p2_0", "p2_1", "p3_0", "p4_0"}}
+    # at most max_number_constants values, all of them if there are not more
+    assert [
+        get_constant_values(level, constant_selection, k, examples)
+        for k in [1, 3, 9]
+    ] == expected
+
+
+def test_nominal_quantiles_are_frequent():
+    colors = Relation("color", {("p{}".format(i), "rgb"[i % 5 // 2])
+                                for i in range(10)}, None,
+                      ["Person", "nominalColor"])
+    # r: 4 times, g: 4 times, b: 2 times
+    assert get_constant_values(colors, DecisionTree.constants_quantiles,
+                               2) == ["g", "r"]
+
+
+@pytest.mark.parametrize("constant_selection",
+                         DecisionTree.allowed_constant_selections)
+@pytest.mark.parametrize("max_number_constants", [1, 2])
+def test_counted_tests_are_evaluated(fit_tree, monkeypatch,
+                                     constant_selection, max_number_constants):
+    counted = []
+    original_count_tests = DecisionTree.count_tests
+
+    def recorded_count_tests(tree, tests_generator, current_vars_per_type):
+        counts = original_count_tests(tree, tests_generator,
+                                      current_vars_per_type)
+        counted.append(counts[0])
+        return counts
+
+    monkeypatch.setattr(DecisionTree, "count_tests", recorded_count_tests)
+    tree = fit_tree(constant_selection=constant_selection,
+                    max_number_constants=max_number_constants)
+    searched = [n for n in tree.profile.nodes if n['nb_tests'] > 0]
+    assert searched
+    assert [n['nb_tests'] for n in searched] == [c for c in counted if c > 0]
+    assert all(n['nb_evaluated_tests'] == n['nb_tests'] for n in searched)
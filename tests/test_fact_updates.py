@@ -0,0 +1,135 @@
+## adding and removing facts keeps the indices, the statistics and the caches up to date
+
+import pytest
+from re3py.data.data_and_statistics import *
+from re3py.data.sqlite_relation import SQLiteRelation
+from re3py.learners.core.tree_node_split import TEST_VALUE_MEMO, forget_test_values
+from re3py.learners.core.variables import VariableVariable
+from re3py.learners.tree import DecisionTree
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {'relations': ("age", "friend")}
+
+
+def lookup(relation, values):
+    variables = [
+        VariableVariable("X{}".format(i), t, None)
+        for i, t in enumerate(relation.get_types())
+    ]
+    known = []
+    for i, value in enumerate(values):
+        if value is not None:
+            variables[i].set_value(value)
+            known.append(i)
+    return sorted(relation.get_all(variables, known))
+
+
+def test_relation_updates():
+    tuples = {("a", "b"), ("a", "c"), ("b", "c")}
+    relation = Relation("friend", set(tuples), None, ["Person", "Person"])
+    # the index is built from the given tuples
+    assert lookup(relation, ["a", None]) == [("a", "b"), ("a", "c")]
+    assert relation.get_nb_all_values(1) == 2
+    assert relation.get_quantile_values(0, 3) == ["a", "b"]
+    assert relation.add_tuples([("c", "a"), ("a", "b"), ("c", "a")]) == [
+        ("c", "a")
+    ]
+    assert lookup(relation, [None, "a"]) == [("c", "a")]
+    assert relation.get_nb_all_values(1) == 3
+    assert relation.get_all_values(0) == ["a", "b", "c"]
+    assert relation.get_quantile_values(0, 3) == ["a", "b", "c"]
+    assert relation.remove_tuples([("a", "b"), ("b", "a"), ("b", "c")]) == [
+        ("a", "b"), ("b", "c")
+    ]
+    assert lookup(relation, ["a", None]) == [("a", "c")]
+    assert lookup(relation, ["b", None]) == []
+    assert "b" not in relation.all_tuples_by_subsets["10"]
+    assert relation.get_all_values(0) == ["a", "c"]
+    assert relation.get_quantile_values(0, 3) == ["a", "c"]
+    assert relation.get_statistics().get_nb_tuples() == 2
+    # the loader keeps the repeated facts in the index (as it always did), add_tuples does not
+    relation.add_parsed_tuple(("a", "c"))
+    assert lookup(relation, ["a", None]) == [("a", "c"), ("a", "c")]
+    assert relation.add_tuples([("a", "c")]) == []
+    assert lookup(relation, ["a", None]) == [("a", "c"), ("a", "c")]
+    assert relation.remove_tuples([("a", "c")]) == [("a", "c")]
+    assert lookup(relation, ["a", None]) == []
+    assert lookup(relation, [None, "c"]) == []
+
+
+def test_batch_removal():
+    tuples = {("hub", "p{}".format(i)) for i in range(100)}
+    relation = Relation("friend", set(tuples), None, ["Person", "Person"])
+    removed = [("hub", "p{}".format(i)) for i in range(0, 100, 2)]
+    assert relation.remove_tuples(removed + [("hub", "q")]) == removed
+    assert lookup(relation, ["hub", None]) == sorted(tuples - set(removed))
+    assert lookup(relation, [None, "p0"]) == []
+    assert lookup(relation, [None, "p1"]) == [("hub", "p1")]
+    assert len(relation.all_tuples_by_subsets["01"]) == 50
+
+
+def test_dataset_facts(toy_data):
+    data = toy_data
+    catalog = data.get_catalog()
+    assert catalog.get_domain_size("Person") == 40
+    assert data.add_facts(
+        ["friend(p0, q0)", "friend(p0, p1)", "age(q0, 20)"]) == {
+            "friend": 1,
+            "age": 1
+        }
+    assert data.get_catalog() is not catalog
+    assert data.get_catalog().get_domain_size("Person") == 41
+    friend = data.get_descriptive_data()["friend"]
+    assert lookup(friend, ["p0", None]) == [("p0", "p1"), ("p0", "q0")]
+    assert data.remove_facts(["friend(p0, q0)", "friend(p0, p2)"]) == {
+        "friend": 1
+    }
+    assert lookup(friend, ["p0", None]) == [("p0", "p1")]
+    for fact in ["enemy(p0, p1)", "friend(p0)", "friend"]:
+        with pytest.raises(ValueError):
+            data.add_facts([fact])
+
+
+def test_memoized_test_values(toy_data, tree_parameters):
+    data = toy_data
+    TEST_VALUE_MEMO.clear()
+    try:
+        tree = DecisionTree(**tree_parameters(data, max_depth=2))
+        tree.fit(data)
+        relation_keys = [
+            key for values_per_chain in TEST_VALUE_MEMO.values()
+            for key in values_per_chain
+        ]
+        with_age = [
+            key for key in relation_keys
+            if any(part[0] == "age" for part in key)
+        ]
+        assert 0 < len(with_age) < len(relation_keys)
+        data.add_facts(["age(q0, 20)"])
+        remaining = [
+            key for values_per_chain in TEST_VALUE_MEMO.values()
+            for key in values_per_chain
+        ]
+        assert len(remaining) == len(relation_keys) - len(with_age)
+        assert not any(part[0] == "age" for key in remaining for part in key)
+        assert forget_test_values({"friend"}) == len(remaining)
+    finally:
+        TEST_VALUE_MEMO.clear()
+
+
+def test_sqlite_cache(tmp_path):
+    relation = SQLiteRelation("friend", str(tmp_path / "friend.sqlite"),
+                              ["Person", "Person"])
+    relation.add_tuples([("a", "b"), ("a", "c"), ("b", "c")])
+    assert lookup(relation, ["a", None]) == [("a", "b"), ("a", "c")]
+    assert lookup(relation, ["b", None]) == [("b", "c")]
+    assert lookup(relation, [None, "c"]) == [("a", "c"), ("b", "c")]
+    assert relation.remove_tuples([("a", "c"), ("c", "a")]) == [("a", "c")]
+    # only the lookups with the removed tuple are forgotten
+    assert set(relation.cache) == {((0, ), ("b", ))}
+    assert lookup(relation, ["a", None]) == [("a", "b")]
+    assert relation.add_tuples([("b", "a"), ("a", "b")]) == [("b", "a")]
+    assert lookup(relation, ["b", None]) == [("b", "a"), ("b", "c")]
+    assert relation.get_nb_tuples() == 3
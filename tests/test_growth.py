@@ -0,0 +1,105 @@
+## growth strategies of the trees
+
+import re
+from re3py.learners.tree import DecisionTree
+
+import pytest
+
+
+def xyz_label(i):
+    return "xyz"[i * 7 % 13 % 3]
+
+
+def weak_young_label(i):
+    # weak signal for the young, strong for the old
+    if 10 + 7 * i % 50 < 30:
+        return "xy"[i % 2]
+    return "z" if i * i % 3 == 0 else "x"
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {'nb_examples': 60, 'label': xyz_label}
+
+
+def renumbered(tree):
+    """
+    The tree as a string, where the variables are renumbered in the order of appearance
+    (the names depend on the order in which the nodes are created).
+    """
+    names = {}
+    return re.sub(r"Y\d+",
+                  lambda match: names.setdefault(match.group(0),
+                                                 "V{}".format(len(names))),
+                  str(tree))
+
+
+def test_wrong_growth():
+    with pytest.raises(ValueError):
+        DecisionTree(growth="sideways")
+
+
+def test_level_wise_growth(toy_data, fit_tree):
+    depth_first = fit_tree(max_depth=4)
+    level_wise = fit_tree(max_depth=4,
+                          growth=DecisionTree.growth_level_wise)
+    assert renumbered(level_wise) == renumbered(depth_first)
+    target_data = toy_data.get_target_data()
+    assert level_wise.predict_all(target_data) == depth_first.predict_all(
+        target_data)
+    depths = [node['depth'] for node in level_wise.profile.nodes]
+    assert depths == sorted(depths)
+    assert sorted(n['node'] for n in level_wise.profile.nodes) == sorted(
+        n.description for n in level_wise)
+    assert len(level_wise.profile.nodes) == len(depth_first.profile.nodes)
+
+
+def test_level_wise_budget(fit_tree):
+    tree = fit_tree(max_number_internal_nodes=2,
+                    growth=DecisionTree.growth_level_wise)
+    internal = [node for node in tree if not node.is_leaf()]
+    assert len(internal) == 2
+    # the root and one of its children
+    root_depth = DecisionTree.root_node_depth
+    assert sorted(node.get_depth()
+                  for node in internal) == [root_depth, root_depth + 1]
+
+
+def test_best_first_growth(fit_tree):
+    depth_first = fit_tree(max_depth=4)
+    best_first = fit_tree(max_depth=4,
+                          growth=DecisionTree.growth_best_first)
+    assert renumbered(best_first) == renumbered(depth_first)
+
+
+@pytest.mark.parametrize("toy_dataset_parameters", [{
+    'nb_examples': 60,
+    'label': weak_young_label
+}])
+def test_best_first_budget(toy_data, fit_tree):
+    full_tree = fit_tree(max_depth=3)
+
+    def gain(node):
+        if node.is_leaf():
+            return -float("inf")
+        stats = [node.get_stats()
+                 ] + [child.get_stats() for child in node.get_children()]
+        weighted = [s.get_total_number_examples() * s.variability for s in stats]
+        return weighted[0] - sum(weighted[1:])
+
+    children = full_tree.root_node.get_children()
+    assert gain(children[1]) > gain(children[0]) > -float("inf")
+    target_data = toy_data.get_target_data()
+    accuracies = []
+    for growth in [DecisionTree.growth_depth_first,
+                   DecisionTree.growth_best_first]:
+        tree = fit_tree(max_depth=3,
+                        max_number_internal_nodes=2,
+                        growth=growth)
+        assert sum(not node.is_leaf() for node in tree) == 2
+        accuracies.append(
+            sum(p == d.get_target()
+                for p, d in zip(tree.predict_all(target_data), target_data)))
+    # depth first splits the first child, best first the better one
+    assert [c.is_leaf() for c in tree.root_node.get_children()] == [True, False]
+    assert accuracies[1] > accuracies[0]
@@ -0,0 +1,39 @@
+## numpy, the Java bridge and the rankings are imported when they are used
+
+import os
+import subprocess
+import sys
+from re3py.utilities.lazy_import import LazyModule
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_modules(code, modules):
+    code = ("import sys\n{}\n"
+            "print(' '.join(m for m in {} if m in sys.modules))").format(
+                code, modules)
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+    return output.decode().split()
+
+
+def test_predict_only_imports():
+    heavy = [
+        "numpy", "py4j", "re3py.learners.core.communicate_with_java",
+        "re3py.ranking.ensemble_ranking", "concurrent.futures"
+    ]
+    code = ("import re3py.learners.tree\n"
+            "import re3py.learners.random_forest\n"
+            "import re3py.learners.boosting")
+    assert loaded_modules(code, heavy) == []
+    assert loaded_modules("import re3py.serve", heavy) == []
+    assert loaded_modules(
+        code + "\nre3py.learners.tree.np.zeros(1)", heavy) == ["numpy"]
+
+
+def test_lazy_module():
+    module = LazyModule(".lazy_import", "re3py.utilities")
+    assert not module.is_loaded()
+    assert module.LazyModule is LazyModule
+    assert module.is_loaded()
+    json_module = LazyModule("json")
+    assert json_module.loads("[1]") == [1]
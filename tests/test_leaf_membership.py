@@ -0,0 +1,54 @@
+## leaf membership of the training examples
+
+from re3py.learners.tree import DecisionTree
+from re3py.learners.random_forest import RandomForest
+
+import pytest
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {'nb_examples': 30, 'relations': ("age", "color")}
+
+
+@pytest.fixture
+def leaf_tree_parameters(toy_data, tree_parameters):
+    return tree_parameters(toy_data, max_depth=4, store_leaf_membership=True)
+
+
+def test_tree_leaf_membership(toy_data, leaf_tree_parameters, fit):
+    data = toy_data
+    tree = fit(DecisionTree(**leaf_tree_parameters), data)
+    leaf_ids = tree.get_training_leaf_ids()
+    assert len(leaf_ids) == len(data.get_target_data())
+    leaves = tree.get_leaves()
+    assert leaves == [node for node in tree if node.is_leaf()]
+    training_examples = tree.get_training_examples()
+    assert len(training_examples) == len(leaves)
+    for leaf_id, leaf in enumerate(leaves):
+        assert leaf.leaf_id == leaf_id
+        assert training_examples[leaf_id] == [
+            i for i, j in enumerate(leaf_ids) if j == leaf_id
+        ]
+    assert tree.predict_training() == tree.predict_all(data.get_target_data())
+
+
+def test_tree_without_leaf_membership(toy_data, leaf_tree_parameters, fit):
+    leaf_tree_parameters['store_leaf_membership'] = False
+    tree = fit(DecisionTree(**leaf_tree_parameters), toy_data)
+    assert tree.get_training_leaf_ids() is None
+    assert tree.get_training_examples() is None
+    with pytest.raises(ValueError):
+        tree.predict_training()
+
+
+def test_forest_training_predictions(toy_data, leaf_tree_parameters, fit):
+    data = toy_data
+    forest = fit(RandomForest(5, **leaf_tree_parameters), data)
+    target_data = data.get_target_data()
+    assert forest.predict_training(data) == [
+        forest.predict(d) for d in target_data
+    ]
+    out_of_bag = forest.predict_training(data, out_of_bag=True)
+    assert len(out_of_bag) == len(target_data)
+    assert any(p is not None for p in out_of_bag)
@@ -0,0 +1,70 @@
+## compact model format: the structure of the trees without the data
+
+import os
+import pytest
+from re3py.data.data_and_statistics import *
+from re3py.learners.boosting import GradientBoosting
+from re3py.learners.model_format import dump_model, load_model
+from re3py.learners.random_forest import RandomForest
+
+
+def numeric_label(i):
+    return (10 + 7 * i % 50) / 10 + (i % 3)
+
+
+@pytest.mark.parametrize("toy_dataset_parameters", [{}, {
+    'label': numeric_label,
+    'target_type': "numeric"
+}])
+def test_tree(tmp_path, toy_dataset, fit_tree):
+    files = toy_dataset
+    tree = fit_tree()
+    model_file = str(tmp_path / "tree.re3py")
+    dump_model(tree, model_file)
+    tree.dump_to_bin(str(tmp_path / "tree.bin"))
+    assert os.path.getsize(model_file) < os.path.getsize(
+        str(tmp_path / "tree.bin"))
+    # a fresh dataset: the relations are bound at load time
+    other_data = Dataset(*files)
+    loaded = load_model(model_file, other_data)
+    assert str(loaded) == str(tree)
+    target_data = other_data.get_target_data()
+    assert loaded.predict_all(target_data) == tree.predict_all(target_data)
+    for node in loaded:
+        if not node.is_leaf():
+            for relation, _, _ in node.get_split().get_test():
+                assert other_data.get_descriptive_data()[
+                    relation.get_name()] is relation
+
+
+def test_ensembles(tmp_path, toy_data, tree_parameters, fit):
+    data = toy_data
+    parameters = tree_parameters(data)
+    forest = fit(RandomForest(4, **parameters), data)
+    boosting = fit(GradientBoosting(4, **parameters), data)
+    target_data = data.get_target_data()
+    for name, model in [("forest", forest), ("boosting", boosting)]:
+        model_file = str(tmp_path / "{}.re3py".format(name))
+        dump_model(model, model_file)
+        loaded = load_model(model_file, data)
+        assert type(loaded) == type(model)
+        assert [loaded.predict(d) for d in target_data
+                ] == [model.predict(d) for d in target_data]
+
+
+def test_wrong_files(tmp_path, toy_dataset, toy_data, fit_tree):
+    target = toy_dataset[2]
+    data = toy_data
+    tree = fit_tree()
+    model_file = str(tmp_path / "tree.re3py")
+    dump_model(tree, model_file)
+    relations = dict(data.get_descriptive_data())
+    for name in ["age", "color", "friend"]:
+        relations.pop(name)
+    other = Dataset(settings=data.settings,
+                    descriptive_relations=relations,
+                    target_data=data.get_target_data())
+    with pytest.raises(ValueError):
+        load_model(model_file, other)
+    with pytest.raises(ValueError):
+        load_model(target, data)
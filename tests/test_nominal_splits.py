@@ -0,0 +1,29 @@
+## the nominal splits: the examples go to the branch that predict sends them to
+
+from re3py.learners.core.comparators import DOES_NOT_CONTAIN
+
+import pytest
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    # the red persons (14 of 40) are x: the best split is 'not red', and the red persons are
+    # in its negative branch
+    return {
+        'relations': ("color", ),
+        'label': lambda i: "xy"[i % 3 != 0],
+        'atom_tests': {
+            'color': "color(old, new)"
+        }
+    }
+
+
+def test_transposed_nominal_split(toy_data, fit_tree):
+    tree = fit_tree(max_depth=2)
+    assert tree.root_node.get_split().comparator == DOES_NOT_CONTAIN
+    target_data = toy_data.get_target_data()
+    for child, branch_size in zip(tree.root_node.get_children(), [26, 14]):
+        assert child.get_stats().get_total_number_examples() == branch_size
+    assert tree.predict_all(target_data) == [
+        d.get_target() for d in target_data
+    ]
@@ -0,0 +1,69 @@
+## profiling report of the tree induction
+
+import csv
+import json
+import pytest
+from re3py.learners.random_forest import RandomForest
+from re3py.utilities.profiling import LatencyProfile, add_to_counters, counters_since, snapshot_counters
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {'nb_examples': 30, 'relations': ("age", "friend")}
+
+
+def test_tree_profile(tmp_path, capsys, fit_tree):
+    tree = fit_tree()
+    assert "induce" not in capsys.readouterr().out
+    report = tree.get_profiling_report()
+    nodes = report.tree_profiles[0].nodes
+    assert [n['node'] for n in nodes] == [n.description for n in tree]
+    assert nodes[0]['nb_examples'] == 30
+    assert nodes[0]['nb_tests'] > 0 and nodes[0]['joins'] > 0
+    summary = report.summary()
+    assert summary['nodes'] == len(nodes)
+    assert 0.0 <= summary['memo_hit_rate'] <= 1.0
+    report.to_json(str(tmp_path / "profile.json"))
+    with open(str(tmp_path / "profile.json")) as f:
+        assert json.load(f)['summary']['trees'] == 1
+    report.to_csv(str(tmp_path / "profile.csv"))
+    with open(str(tmp_path / "profile.csv")) as f:
+        assert len(list(csv.DictReader(f))) == len(nodes)
+
+
+def test_forest_profile(toy_data, tree_parameters, fit):
+    forest = fit(RandomForest(3, **tree_parameters(toy_data)), toy_data)
+    report = forest.get_profiling_report()
+    assert len(report.get_tree_times()) == 3
+    counts, edges = report.tree_time_histogram(2)
+    assert sum(counts) == 3 and len(edges) == 3
+
+
+def test_counters():
+    snapshot = snapshot_counters()
+    add_to_counters(2, 1, [3, 0, 5])
+    add_to_counters(0, 0, [])
+    assert counters_since(snapshot) == {
+        'memo_hits': 2,
+        'memo_misses': 1,
+        'joins': 3,
+        'join_size': 8,
+        'max_join_size': 5
+    }
+
+
+def test_latency_quantiles():
+    latencies = LatencyProfile(window_size=10)
+    assert latencies.quantiles(0.5, 0.99) == [0.0, 0.0]
+    for latency in [0.9, 0.1, 0.5, 0.3, 0.7]:
+        latencies.add(latency)
+    assert latencies.quantiles(0.5, 0.9, 0.99) == [0.5, 0.9, 0.9]
+    assert latencies.quantile(0.2) == 0.1
+    # sorted once until the next latency is added
+    ordered = latencies.ordered
+    assert latencies.summary()['p50'] == 0.5
+    assert latencies.ordered is ordered
+    for _ in range(10):
+        latencies.add(2.0)
+    assert latencies.quantiles(0.1, 1.0) == [2.0, 2.0]
+    assert latencies.summary()['requests'] == 15
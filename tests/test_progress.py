@@ -0,0 +1,56 @@
+## progress callbacks and logging instead of printing
+
+import pickle
+import pytest
+from re3py.learners.random_forest import RandomForest
+from re3py.learners.boosting import GradientBoosting
+from re3py.utilities.progress import ProgressEvent, ProgressRecorder
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {
+        'nb_examples': 30,
+        'relations': ("age", ),
+        'label': lambda i: "xyz"[i * 7 % 11 % 3]
+    }
+
+
+def test_forest_events(toy_data, tree_parameters, fit, capsys):
+    recorder = ProgressRecorder()
+    forest = fit(
+        RandomForest(2,
+                     progress_callback=recorder,
+                     **tree_parameters(toy_data)), toy_data)
+    assert capsys.readouterr().out == ""
+    kinds = [e.kind for e in recorder.events]
+    assert kinds[:2] == [
+        ProgressEvent.iteration_started, ProgressEvent.tree_started
+    ]
+    assert kinds.count(ProgressEvent.tree_finished) == 2
+    assert kinds[-1] == ProgressEvent.iteration_finished
+    splits = [e for e in recorder.events if e.kind == ProgressEvent.node_split]
+    leaves = [
+        e for e in recorder.events if e.kind == ProgressEvent.leaf_created
+    ]
+    assert len(leaves) == len(splits) + 2
+    assert splits[0]['node'] == "root" and splits[0]['nb_examples'] > 0
+    # callbacks are not pickled
+    loaded = pickle.loads(pickle.dumps(forest))
+    assert loaded.progress_callback is None
+    assert loaded.trees[0].progress_callback is None
+
+
+def test_boosting_events(toy_data, tree_parameters, fit):
+    events = []
+    model = fit(
+        GradientBoosting(2,
+                         nb_processes=2,
+                         progress_callback=lambda e: events.append(e),
+                         **tree_parameters(toy_data)), toy_data, toy_data)
+    finished = [
+        e for e in events if e.kind == ProgressEvent.iteration_finished
+    ]
+    assert [e['iteration'] for e in finished] == [0, 1]
+    assert all('validation_loss' in e.details for e in finished)
+    pickle.dumps(model)
@@ -0,0 +1,86 @@
+## one file per relation, read only when the relation is used
+
+import os
+import pickle
+from re3py.data.data_and_statistics import *
+from re3py.learners.tree import DecisionTree
+
+
+def test_shards_are_loaded_on_demand(tmp_path, toy_dataset, tree_parameters,
+                                     fit):
+    s_file, descriptive, target = toy_dataset
+    shards = str(tmp_path / "shards")
+    counts = Dataset.write_relation_shards(descriptive, shards)
+    assert counts == {"age": 40, "color": 40, "friend": 40}
+    assert sorted(os.listdir(shards)) == [
+        "age.txt", "color.txt", "friend.txt"
+    ]
+
+    full = Dataset(s_file, descriptive, target)
+    sharded = Dataset(s_file, shards, target)
+    relations = sharded.get_descriptive_data()
+    assert all(isinstance(r, LazyRelation) for r in relations.values())
+    assert not any(r.loaded for r in relations.values())
+    assert sharded.statistics.get_total_number_examples() == 40
+
+    atom_tests = full.settings.get_atom_tests_structured()
+    atom_tests = {
+        key: value
+        for key, value in atom_tests.items() if key[0] in ["age", "friend"]
+    }
+    tree_full, tree_sharded = [
+        fit(
+            DecisionTree(
+                **tree_parameters(data, allowed_atom_tests=atom_tests)), data)
+        for data in [full, sharded]
+    ]
+    assert str(tree_sharded) == str(tree_full)
+    assert tree_sharded.predict_all(
+        sharded.get_target_data()) == tree_full.predict_all(
+            full.get_target_data())
+    assert [name for name, r in sorted(relations.items())
+            if r.loaded] == ["age", "friend"]
+    for name in ["age", "friend"]:
+        assert relations[name].all_tuples == full.get_descriptive_data(
+        )[name].all_tuples
+    # replicates share the relations
+    replicate = sharded.bootstrap_replicate()
+    assert replicate.get_descriptive_data() is relations
+    assert not relations["color"].loaded
+
+
+def test_lazy_relation(tmp_path):
+    shard = tmp_path / "friend.txt"
+    shard.write_text("friend(a, b)\nfriend(a, c) // comment\n")
+    relation = LazyRelation("friend", str(shard), ["Person", "Person"])
+    assert not relation.is_empty()
+    copy = pickle.loads(pickle.dumps(relation))
+    assert not relation.loaded
+    assert relation.get_nb_tuples() == 2
+    assert relation.loaded
+    assert sorted(relation.all_tuples_by_subsets["10"][("a", )]) == [
+        ("a", "b"), ("a", "c")
+    ]
+    assert copy.all_tuples == relation.all_tuples
+    missing = LazyRelation("friend", str(tmp_path / "missing.txt"),
+                           ["Person", "Person"])
+    assert missing.is_empty()
+    assert missing.get_nb_tuples() == 0
+
+
+def test_catalog_of_lazy_relations(tmp_path, toy_dataset):
+    s_file, descriptive, target = toy_dataset
+    shards = str(tmp_path / "shards")
+    Dataset.write_relation_shards(descriptive, shards)
+    catalog = Dataset(s_file, descriptive).get_catalog()
+    relations = Dataset(s_file, shards).get_descriptive_data()
+    # the relations are not loaded to count their tuples
+    assert catalog.matches(relations.values())
+    assert not any(r.is_loaded() for r in relations.values())
+    friend = relations["friend"]
+    assert friend.get_nb_tuples() == 40
+    assert catalog.matches(relations.values())
+    assert friend.remove_tuples([("p0", "p1")]) == [("p0", "p1")]
+    assert not catalog.matches(relations.values())
+    assert [name for name, r in sorted(relations.items())
+            if r.is_loaded()] == ["friend"]
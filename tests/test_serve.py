@@ -0,0 +1,119 @@
+## prediction server: the model and the data are loaded once
+
+import json
+import threading
+import urllib.request
+import pytest
+from re3py.data.data_and_statistics import *
+from re3py.learners.model_format import dump_model
+from re3py.learners.random_forest import RandomForest
+from re3py.learners.tree import DecisionTree
+from re3py.serve import PredictionServer, load_served_model, make_http_server
+from re3py.utilities.progress import ProgressEvent, ProgressRecorder
+
+
+def friends_by_residue(i, nb_examples):
+    return [(i + j + 1) % nb_examples for j in range(i % 4)]
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {
+        'relations': ("friend", ),
+        'friends': friends_by_residue,
+        'label': lambda i: "xy"[i % 4 < 2]
+    }
+
+
+@pytest.fixture
+def served_tree_parameters(toy_data, tree_parameters):
+    return tree_parameters(toy_data, max_number_atom_tests=1, max_depth=2)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_load_and_add_facts(tmp_path, toy_dataset, toy_data,
+                            served_tree_parameters, fit, compact):
+    s_file, descriptive, _ = toy_dataset
+    data = toy_data
+    tree = fit(DecisionTree(**served_tree_parameters), data)
+    model_file = str(tmp_path / "tree.model")
+    if compact:
+        dump_model(tree, model_file)
+    else:
+        tree.dump_to_bin(model_file)
+    served_data = Dataset(s_file, descriptive)
+    recorder = ProgressRecorder()
+    server = PredictionServer(load_served_model(model_file, served_data),
+                              served_data,
+                              progress_callback=recorder)
+    examples = [["p{}".format(i)] for i in range(40)]
+    assert server.predict_batch(examples) == [
+        "xy"[i % 4 < 2] for i in range(40)
+    ]
+    assert [e.kind for e in recorder.events] == [ProgressEvent.batch_predicted]
+    assert recorder.events[0]['nb_examples'] == 40
+    assert recorder.events[0]['p99'] == recorder.events[0]['time']
+    # p0 has no friends: three of them make it an x
+    facts = ["friend(p0, p{})".format(i) for i in [5, 6, 7, 7]]
+    assert server.update_facts(facts, []) == (3, 0)
+    assert server.update_facts(facts, []) == (0, 0)
+    assert server.predict_batch([["p0"]]) == ["x"]
+    assert server.handle("POST", "/facts", {"remove": facts}) == (200, {
+        'added': 0,
+        'removed': 3
+    })
+    assert server.predict_batch([["p0"]]) == ["y"]
+    assert tree.predict_all(data.get_target_data()[:1]) == ["y"]
+    statistics = server.get_statistics()
+    assert statistics['requests'] == 3
+    assert statistics['examples'] == 42
+
+
+def test_requests(toy_data, served_tree_parameters, fit):
+    data = toy_data
+    forest = fit(RandomForest(3, **served_tree_parameters), data)
+    server = PredictionServer(forest, data)
+    status, response = server.handle("POST", "/predict",
+                                     {"examples": [["p1"], ["p2"]]})
+    assert status == 200
+    assert response['predictions'] == forest.predict_all(
+        data.get_target_data()[1:3])
+    for path, request in [("/predict", {"examples": [["p1", "p2"]]}),
+                          ("/predict", {"rows": []}),
+                          ("/facts", {"add": ["enemy(p1, p2)"]}),
+                          ("/facts", {"add": ["friend(p1)"]}),
+                          ("/facts", ["friend(p1, p2)"]),
+                          ("/facts", {"add": [5]}),
+                          ("/facts", {"remove": [["friend(p1, p2)"]]})]:
+        assert server.handle("POST", path, request)[0] == 400
+    assert server.handle("GET", "/model", None)[0] == 404
+
+    def fail(examples):
+        raise RuntimeError("failed")
+
+    server.predict_batch = fail
+    status, response = server.handle("POST", "/predict",
+                                     {"examples": [["p1"]]})
+    assert status == 500
+    assert response['error'] == "RuntimeError: failed"
+
+
+def test_http(toy_data, served_tree_parameters, fit):
+    tree = fit(DecisionTree(**served_tree_parameters), toy_data)
+    http_server = make_http_server(PredictionServer(tree, toy_data), port=0)
+    thread = threading.Thread(target=http_server.serve_forever)
+    thread.start()
+    url = "http://127.0.0.1:{}".format(http_server.server_address[1])
+    try:
+        request = urllib.request.Request(
+            url + "/predict",
+            data=json.dumps({"examples": [["p1"], ["p3"]]}).encode("utf-8"),
+            method="POST")
+        with urllib.request.urlopen(request) as response:
+            assert json.loads(response.read()) == {"predictions": ["y", "x"]}
+        with urllib.request.urlopen(url + "/stats") as response:
+            assert json.loads(response.read())['requests'] == 1
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+        thread.join()
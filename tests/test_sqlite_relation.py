@@ -0,0 +1,113 @@
+## relations whose tuples are stored in a SQLite database
+
+import pickle
+import pytest
+from re3py.data.data_and_statistics import *
+from re3py.data.sqlite_relation import SQLiteRelation, write_relation_database
+from re3py.learners.core.variables import VariableVariable
+from re3py.learners.tree import DecisionTree
+
+
+def two_friends(i, nb_examples):
+    return [(3 * i + 1) % nb_examples, (i * i + 2) % nb_examples]
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {'friends': two_friends}
+
+
+@pytest.fixture
+def toy_database(tmp_path, toy_dataset):
+    s_file, descriptive, _ = toy_dataset
+    database = str(tmp_path / "toy.sqlite")
+    write_relation_database(descriptive, database,
+                            Dataset(s_file).get_descriptive_data())
+    return database
+
+
+def test_lookups_match_the_memory(toy_dataset, toy_database):
+    s_file, descriptive, _ = toy_dataset
+    database = toy_database
+    in_memory = Dataset(s_file, descriptive).get_descriptive_data()["friend"]
+    relation = SQLiteRelation("friend", database, ["Person", "Person"],
+                              cache_size=10)
+    assert relation.get_nb_tuples() == in_memory.get_nb_tuples() == 80
+    assert sorted(relation.all_tuples) == sorted(in_memory.all_tuples)
+    assert ("p0", "p1") in relation.all_tuples
+    assert ("p1", "p0") not in relation.all_tuples
+    variables = [VariableVariable("X0", "Person", None),
+                 VariableVariable("X1", "Person", None)]
+    for known in [[0], [1], [0, 1]]:
+        for a in range(40):
+            for i in known:
+                variables[i].set_value("p{}".format((a + i) % 40))
+            assert sorted(relation.get_all(variables, known)) == sorted(
+                in_memory.get_all(variables, known))
+    assert len(relation.cache) == 10
+    for position in [0, 1]:
+        assert relation.get_all_values(position) == in_memory.get_all_values(
+            position)
+        assert relation.count_values(position) == in_memory.count_values(
+            position)
+        related = {"Person": {"p1", "p2"}}
+        assert relation.count_values(position,
+                                     related) == in_memory.count_values(
+                                         position, related)
+    assert relation.get_degree_histograms(
+    ) == in_memory.get_degree_histograms()
+    copy = pickle.loads(pickle.dumps(relation))
+    assert copy.get_nb_tuples() == 80
+
+
+def test_prefetch(toy_database):
+    relation = SQLiteRelation("friend", toy_database, ["Person", "Person"])
+    keys = [("p{}".format(i), ) for i in range(30)] + [("nobody", )]
+    relation.prefetch([0], keys)
+    assert len(relation.cache) == 31
+    assert relation.cache[((0, ), ("nobody", ))] == []
+    variables = [VariableVariable("X0", "Person", None),
+                 VariableVariable("X1", "Person", None)]
+    variables[0].set_value("p3")
+    expected = [("p3", "p10"), ("p3", "p11")]
+    assert relation.get_all(variables, [0]) == expected
+    # pairs of known values
+    relation.prefetch([0, 1], [("p3", "p10"), ("p3", "p12")])
+    assert relation.cache[((0, 1), ("p3", "p10"))] == [("p3", "p10")]
+    assert relation.cache[((0, 1), ("p3", "p12"))] == []
+
+
+def test_quantile_values(toy_dataset, toy_database):
+    s_file, descriptive, _ = toy_dataset
+    in_memory = Dataset(s_file, descriptive).get_descriptive_data()["friend"]
+    relation = SQLiteRelation("friend", toy_database, ["Person", "Person"])
+    queries = []
+    relation.execute("SELECT 1")  # connects
+    relation.connection.set_trace_callback(queries.append)
+    for k in [1, 3, 10]:
+        assert relation.get_quantile_values(
+            1, k) == in_memory.get_quantile_values(1, k)
+    # the table is counted once, and the quantiles are read from the index of the position
+    assert sum("COUNT(*)" in q for q in queries) == 1
+    plan = relation.execute(
+        "EXPLAIN QUERY PLAN SELECT c1 FROM friend ORDER BY c1 LIMIT 1 OFFSET 5"
+    ).fetchall()
+    assert "INDEX" in str(plan) and "TEMP B-TREE" not in str(plan)
+    assert relation.add_tuples([("p0", "q0")]) == [("p0", "q0")]
+    assert relation.get_nb_tuples() == 81
+    assert sum("COUNT(*)" in q for q in queries) == 2
+
+
+def test_tree_on_database(toy_dataset, toy_database, tree_parameters, fit):
+    s_file, descriptive, target = toy_dataset
+    trees = []
+    for data_file in [descriptive, toy_database]:
+        data = Dataset(s_file, data_file, target)
+        trees.append((fit(DecisionTree(**tree_parameters(data)), data), data))
+    (tree_memory, data_memory), (tree_database, data_database) = trees
+    assert all(
+        isinstance(r, SQLiteRelation)
+        for r in data_database.get_descriptive_data().values())
+    assert str(tree_database) == str(tree_memory)
+    assert tree_database.predict_all(data_database.get_target_data(
+    )) == tree_memory.predict_all(data_memory.get_target_data())
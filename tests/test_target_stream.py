@@ -0,0 +1,90 @@
+## streaming the target examples: chunks and samples, read while the file is read
+
+from re3py.data.data_and_statistics import *
+from re3py.eval.evaluation import Accuracy
+from re3py.learners.tree import DecisionTree
+
+import pytest
+
+
+@pytest.fixture
+def toy_dataset_parameters():
+    return {
+        'nb_examples': 80,
+        'relations': ("age", "friend"),
+        'label': lambda i: "x" if i % 4 == 0 else "y"
+    }
+
+
+def as_tuples(data):
+    return [(d.get_descriptive(), d.get_target(), d.get_weight(), d.identifier)
+            for d in data]
+
+
+def test_stream_is_the_target_data(toy_data):
+    data = toy_data
+    stream = data.get_target_stream()
+    assert as_tuples(stream) == as_tuples(data.get_target_data())
+    chunks = list(stream.chunks(30))
+    assert [len(chunk) for chunk in chunks] == [30, 30, 20]
+    assert as_tuples(d for chunk in chunks
+                     for d in chunk) == as_tuples(data.get_target_data())
+    with pytest.raises(ValueError):
+        next(stream.chunks(0))
+
+
+def test_reservoir_sample(toy_dataset):
+    files = toy_dataset
+    stream = Dataset(*files).get_target_stream()
+    sample = stream.reservoir_sample(20, random_seed=1)
+    assert len(sample) == 20
+    identifiers = [d.identifier for d in sample]
+    assert identifiers == sorted(set(identifiers))
+    assert as_tuples(sample) == as_tuples(
+        stream.reservoir_sample(20, random_seed=1))
+    assert as_tuples(sample) != as_tuples(
+        stream.reservoir_sample(20, random_seed=2))
+    assert len(stream.reservoir_sample(1000)) == 80
+    sampled = Dataset(*files, target_sample_size=20, sample_random_seed=1)
+    assert as_tuples(sampled) == as_tuples(sample)
+    assert sampled.statistics.get_total_number_examples() == 20
+
+
+def test_stratified_sample(toy_dataset):
+    files = toy_dataset
+    stream = Dataset(*files).get_target_stream()
+
+    def class_counts(sample):
+        counts = {}
+        for d in sample:
+            counts[d.get_target()] = counts.get(d.get_target(), 0) + 1
+        return counts
+
+    assert class_counts(stream.stratified_sample(20)) == {"x": 5, "y": 15}
+    assert class_counts(stream.stratified_sample(
+        6, per_class=True)) == {"x": 6, "y": 6}
+    assert class_counts(
+        stream.stratified_sample({"x": 2}, per_class=True)) == {"x": 2}
+    sampled = Dataset(*files, target_sample_size=20, stratified_sample=True)
+    assert class_counts(sampled) == {"x": 5, "y": 15}
+
+
+def test_chunked_prediction_and_evaluation(toy_data, tree_parameters, fit):
+    data = toy_data
+    sample = data.with_target_data(data.get_target_stream().reservoir_sample(
+        40, random_seed=3))
+    assert sample.get_descriptive_data() is data.get_descriptive_data()
+    tree = fit(DecisionTree(**tree_parameters(data)), sample)
+    all_predictions = tree.predict_all(data.get_target_data())
+    chunked = Accuracy(["x", "y"])
+    predictions = []
+    for chunk, chunk_predictions in tree.predict_chunks(
+            data.get_target_stream().chunks(25)):
+        chunked.add_examples(chunk, chunk_predictions)
+        predictions += chunk_predictions
+    assert predictions == all_predictions
+    at_once = Accuracy(["x", "y"])
+    at_once.add_many([d.get_target() for d in data], all_predictions)
+    chunked.evaluate()
+    at_once.evaluate()
+    assert chunked.get_measure_value() == at_once.get_measure_value()